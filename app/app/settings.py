@@ -37,12 +37,15 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
-    'core',
-    'user',
-    'order',
+    'core.apps.CoreConfig',
+    'user.apps.UserConfig',
+    'order.apps.OrderConfig',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.AsyncViewsMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -85,6 +89,34 @@ DATABASES = {
     }
 }
 
+# Read replicas of the primary, as comma separated hosts sharing its name
+# and credentials. Tests read them as mirrors of the primary.
+replica_aliases = []
+for index, host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1
+):
+    replica_aliases.append('replica{}'.format(index))
+    DATABASES[replica_aliases[-1]] = dict(
+        DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'}
+    )
+
+# Local setup without Postgres: a primary and a replica as two SQLite files
+# in DB_SQLITE_DIR. Nothing replicates, copy the primary file to refresh
+# the replica. Route reads to it with DB_READ_REPLICAS=replica.
+if os.environ.get('DB_SQLITE_DIR'):
+    DATABASES = {
+        alias: {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(os.environ['DB_SQLITE_DIR'],
+                                 alias + '.sqlite3'),
+            'TEST': {'NAME': os.path.join(os.environ['DB_SQLITE_DIR'],
+                                          'test_' + alias + '.sqlite3')},
+        }
+        for alias in ('default', 'replica')
+    }
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -112,8 +144,6 @@ TIME_ZONE = 'UTC'
 
 USE_I18N = True
 
-USE_L10N = True
-
 USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
@@ -121,3 +151,109 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 AUTH_USER_MODEL = 'core.User'
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+# Cache of authenticated tokens, see user.authentication. Set CACHE_ALIAS
+# to a shared entry of CACHES to share the cache between workers.
+TOKEN_AUTH_CACHE = {
+    'CACHE_ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS'),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    'MAX_SIZE': 10000,
+}
+
+# Successful order and line item creations sent with an Idempotency-Key
+# header are replayed to retries of the same user for TTL seconds, see
+# core.idempotency. Point CACHE_ALIAS to a shared entry of CACHES to
+# collapse retries reaching different workers.
+IDEMPOTENCY_KEYS = {
+    'CACHE_ALIAS': os.environ.get('IDEMPOTENCY_CACHE_ALIAS', 'default'),
+    'TTL': int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)),
+}
+
+# Pub/sub waking order status subscribers, see order.pubsub. Unset, it is
+# order.pubsub.PostgresBroker on Postgres, which wakes the subscribers of
+# every process. order.pubsub.LocalBroker, the default elsewhere, only
+# wakes those of the publishing process, so it needs a single process.
+ORDER_STATUS_BROKER = os.environ.get('ORDER_STATUS_BROKER')
+
+# Seconds before the in-memory price catalog is reloaded, see core.pricing
+PRICE_CATALOG_TTL = int(os.environ.get('PRICE_CATALOG_TTL', 60))
+
+# Delivered and returned orders are moved to the archive tables this many
+# days after they were placed, see core.archive.
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 30))
+
+# Per-request Server-Timing header and timing log lines, see
+# core.middleware. Requests are sampled at SAMPLE_RATE, and the ones
+# slower than SLOW_REQUEST_MS are always logged.
+REQUEST_TIMING = {
+    'ENABLED': os.environ.get('REQUEST_TIMING', '0') == '1',
+    'SAMPLE_RATE': float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', 1.0)),
+    'SLOW_REQUEST_MS': int(os.environ.get('REQUEST_TIMING_SLOW_MS', 500)),
+    'HEADER': True,
+}
+
+# Directory shared by the worker processes of a preforking server to
+# aggregate metrics, see core.metrics. Empty it when the server starts.
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+
+# Safe requests of the order and user views read from one of REPLICAS,
+# aliases of DATABASES, see core.routers. A client that wrote reads from
+# the primary for STICKY_SECONDS; set CACHE_ALIAS to a cache shared between
+# workers for token clients to stay pinned on every worker.
+REPLICA_ROUTING = {
+    'REPLICAS': list(filter(None, os.environ.get(
+        'DB_READ_REPLICAS', ','.join(replica_aliases)
+    ).split(','))),
+    'APPS': ('order', 'user'),
+    'STICKY_SECONDS': int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 10)),
+    'CACHE_ALIAS': 'default',
+}
+
+# Threads running the blocking work of the async views served under ASGI,
+# see core.concurrency.
+ASYNC_THREAD_POOL_SIZE = int(os.environ.get('ASYNC_THREAD_POOL_SIZE', 8))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'order.pagination.NewestFirstCursorPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 50)),
+    # JSON with orjson when installed, see core.renderers
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': ['core.throttling.TokenBucketThrottle'],
+    # Requests per client and view `throttle_scope`, see core.throttling
+    'DEFAULT_THROTTLE_RATES': {
+        'orders': os.environ.get('THROTTLE_RATE_ORDERS', '50/s'),
+        'order_status': os.environ.get('THROTTLE_RATE_ORDER_STATUS', '20/s'),
+        'token': os.environ.get('THROTTLE_RATE_TOKEN', '20/min'),
+        'user': os.environ.get('THROTTLE_RATE_USER', '10/s'),
+    },
+}
+
+# Throttle buckets are kept in process unless CACHE_ALIAS points to a
+# shared entry of CACHES, see core.throttling.
+THROTTLE_STORE = {
+    'CACHE_ALIAS': os.environ.get('THROTTLE_CACHE_ALIAS'),
+}
@@ -25,6 +25,13 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class PriceAdmin(admin.ModelAdmin):
+    ordering = ['-version', 'flavour', 'size']
+    list_display = ['version', 'flavour', 'size', 'amount']
+    list_filter = ['version']
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Detail)
 admin.site.register(models.Order)
+admin.site.register(models.Price, PriceAdmin)
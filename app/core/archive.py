@@ -0,0 +1,124 @@
+"""
+Moving final orders out of the live tables.
+
+Delivered and returned orders never change again, yet every kitchen and
+driver query of the live orders pays for them. `archive_orders` moves
+the old ones with their line items, keeping their ids, to ArchivedOrder
+and ArchivedDetail, one transaction per chunk. Sales rollups are left
+alone: archived orders still count.
+
+On Postgres, migration 0012 partitions the archived orders by status,
+then by month of creation. The monthly partitions are created as orders
+are archived into them.
+"""
+from datetime import timezone
+
+from django.db import connection, transaction
+
+from core.constants import ORDER_FINAL_STATUSES
+
+CHUNK_SIZE = 1000
+
+
+def status_partition(table, status):
+    return '{}_s{}'.format(table, status)
+
+
+def month_partition(table, status, month):
+    return '{}_{:%Y%m}'.format(status_partition(table, status), month)
+
+
+def is_partitioned(table):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p '
+            'JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s',
+            [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def _month_start(timestamp):
+    return timestamp.astimezone(timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def create_month_partitions(table, orders):
+    """Create the monthly partitions the orders are about to go to"""
+    quote = connection.ops.quote_name
+    months = {(order.status, _month_start(order.created_at))
+              for order in orders}
+    with connection.cursor() as cursor:
+        for status, month in sorted(months):
+            following = (month.replace(year=month.year + 1, month=1)
+                         if month.month == 12
+                         else month.replace(month=month.month + 1))
+            cursor.execute(
+                'CREATE TABLE IF NOT EXISTS {} PARTITION OF {} '
+                'FOR VALUES FROM (%s) TO (%s)'.format(
+                    quote(month_partition(table, status, month)),
+                    quote(status_partition(table, status))
+                ),
+                [month, following]
+            )
+
+
+def _copy(model, instance, **extra):
+    """Return an instance of `model` with the column values of `instance`"""
+    return model(**dict({
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    }, **extra))
+
+
+def archive_chunk(before, chunk_size=CHUNK_SIZE, partitioned=False):
+    """
+    Move up to `chunk_size` final orders placed before `before`, oldest
+    ids first, with their line items. Orders locked by another archiver
+    are skipped. Return the number of orders and line items moved.
+    """
+    from core.models import ArchivedDetail, ArchivedOrder, Detail, Order
+
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        orders = list(Order.objects.select_for_update(
+            skip_locked=skip_locked
+        ).filter(
+            status__in=ORDER_FINAL_STATUSES, created_at__lt=before
+        ).order_by('id')[:chunk_size])
+        if not orders:
+            return 0, 0
+        order_ids = [order.id for order in orders]
+        details = list(Detail.objects.select_for_update().filter(
+            order_id__in=order_ids
+        ).order_by('id'))
+
+        if partitioned:
+            create_month_partitions(ArchivedOrder._meta.db_table, orders)
+        ArchivedOrder.objects.bulk_create(
+            [_copy(ArchivedOrder, order) for order in orders]
+        )
+        ArchivedDetail.objects.bulk_create(
+            [_copy(ArchivedDetail, detail) for detail in details]
+        )
+        Detail.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(id__in=order_ids).delete()
+    return len(orders), len(details)
+
+
+def archive_orders(before, chunk_size=CHUNK_SIZE):
+    """
+    Move every final order placed before `before` to the archive.
+    Yield the number of orders and line items moved by each chunk.
+    """
+    from core.models import ArchivedOrder
+
+    partitioned = is_partitioned(ArchivedOrder._meta.db_table)
+    while True:
+        orders, details = archive_chunk(before, chunk_size, partitioned)
+        if not orders:
+            return
+        yield orders, details
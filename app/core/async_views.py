@@ -0,0 +1,102 @@
+"""
+Async versions of hot read endpoints, served in their place by
+AsyncViewsMiddleware when running under ASGI.
+
+An async view answers the JSON GETs it was written for on the event
+loop, and hands every other request (writes, the browsable API) to the
+DRF view it replaces, run in the bounded pool of core.concurrency.
+Responses match the DRF view's, errors included.
+"""
+import functools
+
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+
+from rest_framework.exceptions import APIException, AuthenticationFailed, \
+    NotAuthenticated, NotFound, Throttled
+
+from core.concurrency import run_sync
+from core.renderers import FastJSONRenderer
+from user.authentication import CachedTokenAuthentication
+
+
+def accepts_json(request):
+    """Whether DRF would pick its JSON renderer for the request"""
+    return ('text/html' not in request.headers.get('Accept', '') and
+            'format' not in request.GET)
+
+
+def json_response(data, status=200):
+    response = HttpResponse(FastJSONRenderer().render(data), status=status,
+                            content_type='application/json')
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def error_response(exc):
+    """Render an API exception like DRF's exception handler"""
+    response = json_response({'detail': exc.detail}, exc.status_code)
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        response['WWW-Authenticate'] = CachedTokenAuthentication.keyword
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+def check_throttles(request, view):
+    """Throttle the request like the DRF view class `view` would"""
+    waits = [
+        throttle.wait() for throttle in (
+            throttle_class() for throttle_class in view.throttle_classes
+        ) if not throttle.allow_request(request, view)
+    ]
+    waits = [wait for wait in waits if wait is not None]
+    if waits:
+        raise Throttled(max(waits))
+
+
+def render_view(view, request, *args, **kwargs):
+    """Call a sync view and render its response, in the calling thread"""
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def async_api_view(fallback, throttle=True):
+    """
+    Serve authenticated JSON GETs with the decorated coroutine, and
+    every other request with the DRF view `fallback`.
+
+    The coroutine is called with the request, its user already set
+    from the token cache and the throttles of `fallback` checked, and
+    may raise API exceptions or Http404. Coroutines that answer by
+    running `fallback`, which checks its throttles itself, pass
+    `throttle=False` so a request takes a single token. The view is
+    registered as the `async_view` of `fallback`.
+    """
+    def decorator(read):
+        @csrf_exempt
+        @functools.wraps(read)
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET' or not accepts_json(request):
+                return await run_sync(render_view, fallback, request,
+                                      *args, **kwargs)
+            try:
+                credentials = await CachedTokenAuthentication() \
+                    .aauthenticate(request)
+                if credentials is None:
+                    raise NotAuthenticated()
+                request.user, request.auth = credentials
+                if throttle:
+                    # Shared throttle stores are caches, which block
+                    await run_sync(check_throttles, request, fallback.cls)
+                return await read(request, *args, **kwargs)
+            except Http404 as exc:
+                return error_response(NotFound(*exc.args))
+            except APIException as exc:
+                return error_response(exc)
+        fallback.async_view = view
+        return view
+    return decorator
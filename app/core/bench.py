@@ -0,0 +1,497 @@
+"""
+Synthetic API load for `manage.py bench`.
+
+Users, tokens, details and orders are seeded in bulk, then each worker
+replays a weighted mix of API calls for its own share of the users,
+either through the in-process test client or against a running server.
+
+`manage.py bench_connections` instead holds many client connections
+open at once against the WSGI and the ASGI handler, to compare how many
+each serves.
+"""
+import asyncio
+import binascii
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.constants import ORDER_STATUS_TRANSITIONS
+from core.models import Detail, Order
+from core.rollups import apply_sales, order_sales
+
+PASSWORD = 'bench-pass'
+EMAIL_DOMAIN = 'bench.invalid'
+OPERATIONS = ('create', 'list', 'details', 'token', 'poll', 'update')
+READ_OPERATIONS = ('poll', 'list', 'profile')
+HOST = 'localhost'
+
+
+class Account(object):
+    """A seeded user together with the orders a worker plays with"""
+
+    def __init__(self, email, token, orders):
+        self.email = email
+        self.token = token
+        self.orders = orders
+
+
+def seed(run_id, users, orders, details, batch_size=1000):
+    """
+    Create `users` users with a token, `orders` orders with two line
+    items and `details` unassigned details each. Return the accounts.
+    """
+    User = get_user_model()
+    prefix = 'bench-{}-'.format(run_id)
+    password = make_password(PASSWORD)
+    User.objects.bulk_create([
+        User(email='{}{}@{}'.format(prefix, i, EMAIL_DOMAIN),
+             name='bench', password=password)
+        for i in range(users)
+    ], batch_size=batch_size)
+    user_ids = dict(User.objects.filter(
+        email__startswith=prefix
+    ).values_list('id', 'email'))
+    tokens = {
+        user_id: binascii.hexlify(os.urandom(20)).decode()
+        for user_id in user_ids
+    }
+    Token.objects.bulk_create([
+        Token(user_id=user_id, key=key) for user_id, key in tokens.items()
+    ], batch_size=batch_size)
+
+    Order.objects.bulk_create([
+        Order(user_id=user_id, name='bench', phone='0000000000',
+              address='bench')
+        for user_id in user_ids
+        for _ in range(orders)
+    ], batch_size=batch_size)
+    user_orders = defaultdict(dict)
+    for order_id, user_id, status in Order.objects.filter(
+        user_id__in=user_ids
+    ).values_list('id', 'user_id', 'status'):
+        user_orders[user_id][order_id] = status
+    Detail.objects.bulk_create([
+        Detail(order_id=order_id, user_id=user_id,
+               flavour=1 + (order_id + i) % 3, size=1 + i)
+        for user_id, statuses in user_orders.items()
+        for order_id in statuses
+        for i in range(2)
+    ] + [
+        Detail(user_id=user_id) for user_id in user_ids
+        for _ in range(details)
+    ], batch_size=batch_size)
+    # Counted like orders placed through the API, as cleanup() takes
+    # every order of the run back out of the rollups
+    apply_sales(order_sales([
+        order_id for statuses in user_orders.values()
+        for order_id in statuses
+    ]))
+
+    return [
+        Account(email, tokens[user_id], user_orders[user_id])
+        for user_id, email in sorted(user_ids.items())
+    ]
+
+
+def unthrottled():
+    """
+    Lift the throttle rates of the in-process API for a run, which
+    measures what the API serves rather than what clients may send
+    """
+    return override_settings(REST_FRAMEWORK=dict(
+        settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={}
+    ))
+
+
+def cleanup(run_id):
+    """Delete everything seeded or created by a run"""
+    users = get_user_model().objects.filter(
+        email__startswith='bench-{}-'.format(run_id)
+    )
+    order_ids = list(Order.objects.filter(user__in=users).values_list(
+        'id', flat=True
+    ))
+    apply_sales(order_sales(order_ids), -1)
+    users.delete()
+
+
+class ClientTarget(object):
+    """Send requests through the in-process test client"""
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {}
+        if token:
+            headers['HTTP_AUTHORIZATION'] = 'Token ' + token
+        if method == 'GET':
+            send = self.client.get
+            kwargs = {'data': data}
+        else:
+            send = getattr(self.client, method.lower())
+            kwargs = {'data': json.dumps(data),
+                      'content_type': 'application/json'}
+        with CaptureQueriesContext(connection) as queries:
+            response = send(path, **kwargs, **headers)
+        return response.status_code, response.content, len(queries)
+
+
+class ServerTarget(object):
+    """Send requests to a running server over HTTP"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Accept': 'application/json'}
+        body = None
+        if token:
+            headers['Authorization'] = 'Token ' + token
+        if method != 'GET':
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.base_url + path, body,
+                                         headers, method=method)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.read(), None
+        except urllib.error.HTTPError as error:
+            return error.code, error.read(), None
+
+
+class Worker(object):
+    """Replay a weighted mix of operations for a share of the accounts"""
+
+    def __init__(self, target, accounts, mix, seed):
+        self.target = target
+        self.accounts = accounts
+        self.operations = sorted(mix)
+        self.weights = [mix[operation] for operation in self.operations]
+        self.random = random.Random(seed)
+
+    def _create(self, account):
+        items = [
+            {'flavour': self.random.randint(1, 3),
+             'size': self.random.randint(1, 3),
+             'quantity': self.random.randint(1, 2)}
+            for _ in range(self.random.randint(1, 3))
+        ]
+        result = self.target.request('POST', reverse('order:order-list'), {
+            'name': 'bench', 'phone': '0000000000', 'address': 'bench',
+            'items': items,
+        }, account.token)
+        if result[0] == 201:
+            order = json.loads(result[1].decode())
+            account.orders[order['id']] = order['status']
+        return result
+
+    def _list(self, account):
+        return self.target.request('GET', reverse('order:order-list'),
+                                   token=account.token)
+
+    def _details(self, account):
+        return self.target.request('GET', reverse('order:detail-list'),
+                                   token=account.token)
+
+    def _token(self, account):
+        return self.target.request('POST', reverse('user:token'), {
+            'email': account.email, 'password': PASSWORD
+        })
+
+    def _poll(self, account):
+        order_id = self.random.choice(list(account.orders))
+        return self.target.request(
+            'GET',
+            reverse('order:retrieve-update-order-status', args=[order_id]),
+            token=account.token
+        )
+
+    def _open_orders(self, account):
+        return [(order_id, status)
+                for order_id, status in account.orders.items()
+                if ORDER_STATUS_TRANSITIONS[status]]
+
+    def _update(self, account):
+        order_id, status = self.random.choice(self._open_orders(account))
+        status = self.random.choice(ORDER_STATUS_TRANSITIONS[status])
+        result = self.target.request(
+            'PUT',
+            reverse('order:retrieve-update-order-status', args=[order_id]),
+            {'status': status}, account.token
+        )
+        if result[0] == 200:
+            account.orders[order_id] = status
+        return result
+
+    def run(self, count):
+        """Send `count` requests, return `(operation, status, seconds,
+        queries)` samples"""
+        samples = []
+        while len(samples) < count:
+            operation = self.random.choices(self.operations,
+                                            self.weights)[0]
+            account = self.random.choice(self.accounts)
+            if (operation == 'poll' and not account.orders or
+                    operation == 'update' and
+                    not self._open_orders(account)):
+                # Give the account something to work on, off the clock
+                self._create(account)
+            start = time.perf_counter()
+            try:
+                result = getattr(self, '_' + operation)(account)
+            except Exception:
+                result = ('error', b'', None)
+            samples.append((operation, result[0],
+                            time.perf_counter() - start, result[2]))
+        return samples
+
+
+def run_worker(url, accounts, mix, seed, count):
+    """Run one worker in its own thread or process"""
+    target = ServerTarget(url) if url else ClientTarget()
+    try:
+        return Worker(target, accounts, mix, seed).run(count)
+    finally:
+        connection.close()
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    rank = max(int(math.ceil(percent / 100.0 * len(values))), 1)
+    return values[rank - 1]
+
+
+def summarize(samples):
+    """Return the count, errors, throttled requests, latency
+    percentiles in milliseconds and mean queries of samples"""
+    latencies = sorted(seconds * 1000 for _, _, seconds, _ in samples)
+    queries = [count for _, _, _, count in samples if count is not None]
+    throttled = sum(1 for _, status, _, _ in samples if status == 429)
+    errors = sum(
+        1 for _, status, _, _ in samples
+        if status == 'error' or status >= 400
+    ) - throttled
+    return {
+        'count': len(samples),
+        'errors': errors,
+        'throttled': throttled,
+        'statuses': dict(sorted(
+            (str(status), sum(1 for s in samples if s[1] == status))
+            for status in {s[1] for s in samples}
+        )),
+        'latency_ms': {
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+        },
+        'queries_per_request': (
+            sum(queries) / len(queries) if queries else None
+        ),
+    }
+
+
+def report(samples, elapsed):
+    """Summarize samples overall and per operation"""
+    by_operation = defaultdict(list)
+    for sample in samples:
+        by_operation[sample[0]].append(sample)
+    return dict(
+        summarize(samples),
+        elapsed_s=elapsed,
+        throughput_rps=len(samples) / elapsed if elapsed else None,
+        operations={
+            operation: summarize(operation_samples)
+            for operation, operation_samples in sorted(by_operation.items())
+        }
+    )
+
+
+def read_path(operation, account, rng):
+    """Return the path of one of the reads served by async views"""
+    if operation == 'poll':
+        return reverse('order:retrieve-update-order-status',
+                       args=[rng.choice(sorted(account.orders))])
+    if operation == 'list':
+        return reverse('order:order-list')
+    return reverse('user:me')
+
+
+def wsgi_request(application, path, token):
+    """Send a GET through a WSGI application, return its status code"""
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'HTTP_ACCEPT': 'application/json',
+        'HTTP_AUTHORIZATION': 'Token ' + token,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    statuses = []
+    body = application(
+        environ, lambda status, headers: statuses.append(status)
+    )
+    try:
+        b''.join(body)
+    finally:
+        body.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_request(application, path, token):
+    """Send a GET through an ASGI application, return its status code"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [
+            (b'host', HOST.encode()),
+            (b'accept', b'application/json'),
+            (b'authorization', 'Token {}'.format(token).encode()),
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': (HOST, 80),
+    }
+    messages, finished, received = [], asyncio.Event(), []
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {'type': 'http.request', 'body': b'',
+                    'more_body': False}
+        # The client stays connected until the response is sent
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    try:
+        await application(scope, receive, send)
+    finally:
+        finished.set()
+    return messages[0]['status']
+
+
+def run_wsgi_connections(accounts, operation, connections, requests,
+                         client_delay, threads, seed):
+    """
+    Serve `connections` clients with `threads` WSGI worker threads, as a
+    threaded WSGI server would. A worker is held for the whole time it
+    takes a slow client to send its request.
+    """
+    application = WSGIHandler()
+    start = time.perf_counter()
+
+    def serve(index):
+        rng = random.Random(seed + index)
+        account = accounts[index % len(accounts)]
+        samples, ready = [], start
+        try:
+            for _ in range(requests):
+                time.sleep(client_delay)
+                try:
+                    status = wsgi_request(
+                        application, read_path(operation, account, rng),
+                        account.token
+                    )
+                except Exception:
+                    status = 'error'
+                now = time.perf_counter()
+                samples.append((operation, status, now - ready, None))
+                ready = now
+        finally:
+            connection.close()
+        return samples
+
+    with ThreadPoolExecutor(threads) as executor:
+        samples = [sample
+                   for connection_samples
+                   in executor.map(serve, range(connections))
+                   for sample in connection_samples]
+    return samples, time.perf_counter() - start
+
+
+def run_asgi_connections(accounts, operation, connections, requests,
+                         client_delay, seed):
+    """
+    Serve `connections` clients concurrently on one event loop, as an
+    ASGI server would. Waiting for a slow client holds no thread.
+    """
+    application = ASGIHandler()
+
+    async def serve(index, start):
+        rng = random.Random(seed + index)
+        account = accounts[index % len(accounts)]
+        samples, ready = [], start
+        for _ in range(requests):
+            await asyncio.sleep(client_delay)
+            try:
+                status = await asgi_request(
+                    application, read_path(operation, account, rng),
+                    account.token
+                )
+            except Exception:
+                status = 'error'
+            now = time.perf_counter()
+            samples.append((operation, status, now - ready, None))
+            ready = now
+        return samples
+
+    async def serve_all():
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            serve(index, start) for index in range(connections)
+        ])
+        return ([sample for samples in results for sample in samples],
+                time.perf_counter() - start)
+
+    return asyncio.run(serve_all())
+
+
+def capacity_report(samples, elapsed):
+    return dict(
+        summarize(samples),
+        elapsed_s=elapsed,
+        throughput_rps=len(samples) / elapsed if elapsed else None,
+    )
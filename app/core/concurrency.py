@@ -0,0 +1,54 @@
+"""
+A bounded thread pool for the blocking work of async views.
+
+Async views run on the event loop, where a blocking call stalls every
+other connection. What cannot be awaited is run in this pool instead,
+which also caps how many requests hold a database connection at once:
+the loop keeps accepting connections while at most
+`ASYNC_THREAD_POOL_SIZE` of them reach the database.
+"""
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the pool, sized by the `ASYNC_THREAD_POOL_SIZE` setting"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                getattr(settings, 'ASYNC_THREAD_POOL_SIZE', 8),
+                thread_name_prefix='async-offload'
+            )
+    return _executor
+
+
+def _with_connections(func):
+    """Drop stale connections around a job, like a request would"""
+    @functools.wraps(func)
+    def job(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return job
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Run `func` in the pool and return its result. Context variables,
+    such as the timings of the current request, are carried over.
+    """
+    return await sync_to_async(
+        _with_connections(func), thread_sensitive=False,
+        executor=get_executor()
+    )(*args, **kwargs)
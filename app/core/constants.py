@@ -29,3 +29,31 @@ ORDER_STATUS = (
     (DELIVERED, u'Delivered'),
     (RETURNED, u'Returned')
 )
+
+# Statuses an order may move to from each status. Delivered and returned
+# orders are final.
+ORDER_STATUS_TRANSITIONS = {
+    RECEIVED: (IN_PROCESS,),
+    IN_PROCESS: (OUT_FOR_DELIVERY,),
+    OUT_FOR_DELIVERY: (DELIVERED, RETURNED),
+    DELIVERED: (),
+    RETURNED: (),
+}
+
+# Final statuses, orders in them may be archived
+ORDER_FINAL_STATUSES = tuple(
+    status for status, targets in ORDER_STATUS_TRANSITIONS.items()
+    if not targets
+)
+
+# Statuses an order must be in to move to each status
+ORDER_STATUS_PREDECESSORS = {
+    status: tuple(
+        source for source, targets in ORDER_STATUS_TRANSITIONS.items()
+        if status in targets
+    )
+    for status, _ in ORDER_STATUS
+}
+
+# Orders can only be edited before they leave the kitchen
+ORDER_EDITABLE_STATUSES = (RECEIVED, IN_PROCESS)
@@ -0,0 +1,100 @@
+"""
+Idempotency keys.
+
+Clients retrying a creation send the same `Idempotency-Key` header. The
+first request with a key claims it in a Django cache; the response it
+succeeds with is stored there for `TTL` seconds and handed back to the
+retries of the same user, which run neither validation nor writes.
+
+A retry arriving while the first request is still running waits up to
+`WAIT_SECONDS` for its response. A claim whose request died is
+forgotten after `LOCK_SECONDS`.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+DEFAULT_IDEMPOTENCY_KEYS = {
+    'CACHE_ALIAS': 'default',
+    'TTL': 24 * 60 * 60,
+    'LOCK_SECONDS': 60,
+    'WAIT_SECONDS': 10,
+    'POLL_SECONDS': 0.05,
+}
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def get_config():
+    return dict(DEFAULT_IDEMPOTENCY_KEYS,
+                **getattr(settings, 'IDEMPOTENCY_KEYS', {}))
+
+
+def request_fingerprint(request):
+    """Hash what a retry must repeat: the method, path and data"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    return hashlib.sha256(json.dumps(
+        [request.method, request.path, data], sort_keys=True,
+        cls=DjangoJSONEncoder
+    ).encode()).hexdigest()
+
+
+class IdempotencyKeys(object):
+    """Claims of idempotency keys and the responses they got"""
+    prefix = 'idempotency:'
+
+    def __init__(self, config=None):
+        config = config or get_config()
+        self.cache = caches[config['CACHE_ALIAS']]
+        self.ttl = config['TTL']
+        self.lock_seconds = config['LOCK_SECONDS']
+        self.wait_seconds = config['WAIT_SECONDS']
+        self.poll_seconds = config['POLL_SECONDS']
+
+    def cache_key(self, *scope):
+        """Key of a scoped idempotency key, safe for any cache backend"""
+        return self.prefix + hashlib.sha256(
+            ':'.join(str(part) for part in scope).encode()
+        ).hexdigest()
+
+    def claim(self, key, fingerprint):
+        """
+        Claim `key` and return None, or return the entry of the request
+        that holds it: its `fingerprint` and, once it succeeded, its
+        `response`. Waits for a request holding the same fingerprint to
+        finish, up to `WAIT_SECONDS`.
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            if self.cache.add(key, {'fingerprint': fingerprint},
+                              self.lock_seconds):
+                return None
+            entry = self.cache.get(key)
+            if entry is None:
+                continue
+            if 'response' in entry or entry['fingerprint'] != fingerprint \
+                    or time.monotonic() >= deadline:
+                return entry
+            time.sleep(self.poll_seconds)
+
+    def save(self, key, fingerprint, response):
+        """Store the successful response of the request holding `key`"""
+        self.cache.set(key, {
+            'fingerprint': fingerprint,
+            'response': {
+                'status': response.status_code,
+                'data': response.data,
+                'headers': dict(response.items()),
+            },
+        }, self.ttl)
+
+    def release(self, key):
+        """Let the next request with `key` run, after a failure"""
+        self.cache.delete(key)
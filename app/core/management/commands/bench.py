@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from core import bench
+
+DEFAULT_MIX = 'create=2,list=3,details=1,token=1,poll=3,update=1'
+
+
+def mix(value):
+    try:
+        weights = {
+            operation.strip(): float(weight)
+            for operation, weight in (
+                part.split('=') for part in value.split(',')
+            )
+        }
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            '{!r} is not a list of operation=weight'.format(value)
+        )
+    unknown = set(weights) - set(bench.OPERATIONS)
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            'Unknown operations {}, choose from {}'.format(
+                ', '.join(sorted(unknown)), ', '.join(bench.OPERATIONS)
+            )
+        )
+    if not any(weight > 0 for weight in weights.values()):
+        raise argparse.ArgumentTypeError('Give at least one weight')
+    return weights
+
+
+class Command(BaseCommand):
+    """Django command to measure what the API sustains"""
+    help = ('Seed synthetic users, tokens, details and orders, replay a '
+            'mix of API calls and report throughput, latency percentiles '
+            'and queries per request as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--orders', type=int, default=10,
+                            help='Orders seeded per user')
+        parser.add_argument('--details', type=int, default=5,
+                            help='Unassigned details seeded per user')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--mode', choices=('thread', 'process'),
+                            default='thread')
+        parser.add_argument('--mix', type=mix, default=mix(DEFAULT_MIX),
+                            help='Weights of {} (default: {})'.format(
+                                ', '.join(bench.OPERATIONS), DEFAULT_MIX
+                            ))
+        parser.add_argument('--url',
+                            help='Base URL of a running server, instead '
+                                 'of the in-process test client')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded data')
+        parser.add_argument('--output', type=argparse.FileType('w'),
+                            help='File to write the report to')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if not 0 < workers <= options['users']:
+            raise CommandError('Give between 1 and --users workers.')
+
+        run_id = uuid.uuid4().hex[:8]
+        accounts = bench.seed(run_id, options['users'], options['orders'],
+                              options['details'])
+        # A running server throttles as it is configured to
+        throttling = contextlib.nullcontext() if options['url'] \
+            else bench.unthrottled()
+        try:
+            with throttling:
+                start = time.perf_counter()
+                samples = self._run(accounts, options)
+                elapsed = time.perf_counter() - start
+        finally:
+            if not options['keep']:
+                bench.cleanup(run_id)
+
+        result = {
+            'run': {
+                'id': run_id,
+                'database': connection.vendor,
+                'target': options['url'] or 'client',
+                'mode': options['mode'],
+                'workers': workers,
+                'users': options['users'],
+                'orders': options['orders'],
+                'details': options['details'],
+                'requests': options['requests'],
+                'mix': options['mix'],
+                'seed': options['seed'],
+            },
+        }
+        result.update(bench.report(samples, elapsed))
+
+        output = json.dumps(result, indent=2)
+        if options['output']:
+            with options['output'] as out:
+                out.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def _run(self, accounts, options):
+        """Split the accounts and requests between the workers"""
+        workers = options['workers']
+        per_worker, extra = divmod(options['requests'], workers)
+        jobs = [
+            (options['url'], accounts[i::workers], options['mix'],
+             options['seed'] + i, per_worker + (i < extra))
+            for i in range(workers)
+        ]
+        if workers == 1 and options['mode'] == 'thread':
+            url, accounts, weights, seed, count = jobs[0]
+            target = (bench.ServerTarget(url) if url
+                      else bench.ClientTarget())
+            return bench.Worker(target, accounts, weights, seed).run(count)
+
+        if options['mode'] == 'process':
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context('fork')
+            )
+        else:
+            executor = ThreadPoolExecutor(workers)
+        with executor:
+            futures = [executor.submit(bench.run_worker, *job)
+                       for job in jobs]
+            return [sample for future in futures
+                    for sample in future.result()]
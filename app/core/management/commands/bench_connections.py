@@ -0,0 +1,122 @@
+import argparse
+import json
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import bench
+
+HANDLERS = ('wsgi', 'asgi')
+
+
+def counts(value):
+    try:
+        values = [int(part) for part in value.split(',')]
+    except ValueError:
+        values = []
+    if not values or min(values) < 1:
+        raise argparse.ArgumentTypeError(
+            '{!r} is not a list of positive numbers'.format(value)
+        )
+    return values
+
+
+class Command(BaseCommand):
+    """Django command to compare the connections WSGI and ASGI sustain"""
+    help = ('Hold an increasing number of slow client connections open '
+            'against the in-process WSGI and ASGI handlers, each client '
+            'sending a few reads, and report throughput and latency '
+            'percentiles per level as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--orders', type=int, default=5,
+                            help='Orders seeded per user')
+        parser.add_argument('--connections', type=counts,
+                            default=counts('10,50,200'),
+                            help='Comma separated numbers of concurrent '
+                                 'connections to try')
+        parser.add_argument('--requests', type=int, default=3,
+                            help='Requests sent on each connection')
+        parser.add_argument('--client-delay', type=float, default=50,
+                            help='Milliseconds a client takes to send '
+                                 'each request')
+        parser.add_argument('--threads', type=int,
+                            help='WSGI worker threads (default: '
+                                 'ASYNC_THREAD_POOL_SIZE, the threads '
+                                 'the async views may use)')
+        parser.add_argument('--operation', choices=bench.READ_OPERATIONS,
+                            default='poll')
+        parser.add_argument('--handlers', default=','.join(HANDLERS),
+                            help='Comma separated handlers to compare')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded data')
+        parser.add_argument('--output', type=argparse.FileType('w'),
+                            help='File to write the report to')
+
+    def handle(self, *args, **options):
+        handlers = [handler.strip()
+                    for handler in options['handlers'].split(',')]
+        if set(handlers) - set(HANDLERS):
+            raise CommandError('Choose handlers among {}.'.format(
+                ', '.join(HANDLERS)
+            ))
+        if options['users'] < 1 or options['orders'] < 1:
+            raise CommandError('Give at least one user and one order.')
+        threads = options['threads'] or settings.ASYNC_THREAD_POOL_SIZE
+        delay = options['client_delay'] / 1000.0
+
+        run_id = uuid.uuid4().hex[:8]
+        accounts = bench.seed(run_id, options['users'], options['orders'],
+                              0)
+        results = []
+        try:
+            with bench.unthrottled():
+                for count in options['connections']:
+                    for handler in handlers:
+                        results.append(dict(
+                            handler=handler, connections=count,
+                            **bench.capacity_report(*self.connect(
+                                handler, accounts, count, delay, threads,
+                                options
+                            ))
+                        ))
+        finally:
+            if not options['keep']:
+                bench.cleanup(run_id)
+
+        output = json.dumps({
+            'run': {
+                'id': run_id,
+                'database': connection.vendor,
+                'operation': options['operation'],
+                'users': options['users'],
+                'orders': options['orders'],
+                'requests': options['requests'],
+                'client_delay_ms': options['client_delay'],
+                'wsgi_threads': threads,
+                'async_pool_size': settings.ASYNC_THREAD_POOL_SIZE,
+                'seed': options['seed'],
+            },
+            'results': results,
+        }, indent=2)
+        if options['output']:
+            with options['output'] as out:
+                out.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def connect(self, handler, accounts, count, delay, threads, options):
+        """Return the samples and wall time of `count` connections"""
+        if handler == 'wsgi':
+            return bench.run_wsgi_connections(
+                accounts, options['operation'], count, options['requests'],
+                delay, threads, options['seed']
+            )
+        return bench.run_asgi_connections(
+            accounts, options['operation'], count, options['requests'],
+            delay, options['seed']
+        )
@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from core.throttling import DEFAULTS, LocalBucketStore, SharedBucketStore, \
+    TokenBucketThrottle
+
+
+def time_checks(check, keys, checks, threads):
+    """
+    Run `checks` calls of `check(key)` over the keys, split between
+    threads, and return the wall time in seconds
+    """
+    per_thread = checks // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def run(offset):
+        barrier.wait()
+        for index in range(offset, offset + per_thread):
+            check(keys[index % len(keys)])
+
+    workers = [threading.Thread(target=run, args=(index * per_thread,))
+               for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    """Django command to measure the cost of a throttle check"""
+    help = ('Time token bucket checks against the in-process store and, '
+            'with --cache, a shared Django cache, both on their own and '
+            'through the DRF throttle, and report the cost per check as '
+            'JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=200000)
+        parser.add_argument('--clients', type=int, default=1000,
+                            help='Distinct clients checked in turn')
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument('--shards', type=int, default=DEFAULTS['SHARDS'])
+        parser.add_argument('--cache',
+                            help='Alias of a Django cache to time as the '
+                                 'shared store')
+
+    def handle(self, *args, **options):
+        if min(options['checks'], options['clients'], options['threads'],
+               options['shards']) < 1:
+            raise CommandError('Give positive numbers.')
+        checks, threads = options['checks'], options['threads']
+        keys = ['orders:token:{:040d}'.format(index)
+                for index in range(options['clients'])]
+        # High enough that every check takes a token
+        rate, capacity = float(checks), checks
+
+        stores = {'local': LocalBucketStore(options['shards'],
+                                            DEFAULTS['MAX_SIZE'])}
+        if options['cache']:
+            stores['cache'] = SharedBucketStore(options['cache'])
+
+        results = []
+        for name, store in stores.items():
+            elapsed = time_checks(
+                lambda key: store.take(key, rate, capacity),
+                keys, checks, threads
+            )
+            results.append(self.result(name, 'store', checks, threads,
+                                       elapsed))
+
+        # The whole check of a DRF view, against the configured store
+        class Throttle(TokenBucketThrottle):
+            def get_rate(self, scope):
+                return '{}/s'.format(checks)
+
+        view = SimpleNamespace(throttle_scope='bench')
+        meta = RequestFactory().get('/').META
+        requests = [SimpleNamespace(auth=SimpleNamespace(key=key),
+                                    user=None, META=meta)
+                    for key in keys]
+        elapsed = time_checks(
+            lambda request: Throttle().allow_request(request, view),
+            requests, checks, threads
+        )
+        results.append(self.result('configured', 'throttle', checks,
+                                   threads, elapsed))
+
+        self.stdout.write(json.dumps({
+            'run': {
+                'checks': checks,
+                'clients': options['clients'],
+                'threads': threads,
+                'shards': options['shards'],
+            },
+            'results': results,
+        }, indent=2))
+
+    def result(self, store, level, checks, threads, elapsed):
+        done = checks // threads * threads
+        return {
+            'store': store,
+            'level': level,
+            'checks_per_second': done / elapsed,
+            'us_per_check': elapsed / done * 1e6,
+        }
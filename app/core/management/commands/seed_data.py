@@ -0,0 +1,248 @@
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core import constants
+from core.models import Detail, Order
+from core.pricing import catalog
+
+BATCH_SIZE = 5000
+NAMES = ('Mahsa', 'Sara', 'Ali', 'Reza', 'Maryam', 'Omid', 'Nika', 'Arash')
+
+# Status of the seeded orders and how many transitions led to it
+STATUS_WEIGHTS = (
+    (constants.RECEIVED, 0, 5),
+    (constants.IN_PROCESS, 1, 5),
+    (constants.OUT_FOR_DELIVERY, 2, 10),
+    (constants.DELIVERED, 3, 75),
+    (constants.RETURNED, 3, 5),
+)
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk inserts set auto_now and auto_now_add fields"""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class SeedPlan(object):
+    """
+    Everything a worker needs to seed a range of users or orders on
+    its own.
+
+    User and order ids are allocated up front from the number of users
+    and orders, so ranges can be inserted in any order or in parallel.
+    The same seed always gives the same rows, with timestamps relative
+    to the time of the run.
+    """
+
+    def __init__(self, users, orders, details, seed, days, password,
+                 user_base, order_base, now, batch_size):
+        self.users = users
+        self.orders = orders
+        self.details = details
+        self.seed = seed
+        self.days = days
+        self.password = password
+        self.user_base = user_base
+        self.order_base = order_base
+        self.now = now
+        self.batch_size = batch_size
+
+    def orders_before(self, index):
+        """Return the number of orders of the users before `index`"""
+        per_user, extra = divmod(self.orders, self.users)
+        return index * per_user + min(index, extra)
+
+    def user_of(self, offset):
+        """Return the index of the user placing the order at `offset`"""
+        per_user, extra = divmod(self.orders, self.users)
+        first = extra * (per_user + 1)
+        if offset < first:
+            return offset // (per_user + 1)
+        return extra + (offset - first) // per_user
+
+    def chunks(self, count):
+        """Split `count` users or orders in ranges of the batch size"""
+        return [(start, min(start + self.batch_size, count))
+                for start in range(0, count, self.batch_size)]
+
+
+def seed_users(plan, start, stop):
+    """Insert the users `start` to `stop` and their unassigned details"""
+    users, details = [], []
+    for index in range(start, stop):
+        # One generator per user, so batches and processes do not matter
+        rng = random.Random('{}:{}'.format(plan.seed, index))
+        user_id = plan.user_base + index
+        users.append(get_user_model()(
+            id=user_id,
+            email='user{}@seed.invalid'.format(user_id),
+            name=rng.choice(NAMES),
+            password=plan.password
+        ))
+        details.extend(
+            Detail(user_id=user_id, flavour=rng.randint(1, 3),
+                   size=rng.randint(1, 3), updated_at=plan.now)
+            for _ in range(plan.details)
+        )
+
+    with transaction.atomic(), explicit_timestamps(
+        Detail._meta.get_field('updated_at'),
+    ):
+        get_user_model().objects.bulk_create(users, plan.batch_size)
+        Detail.objects.bulk_create(details, plan.batch_size)
+    return len(users), 0, len(details)
+
+
+def seed_orders(plan, start, stop):
+    """Insert the orders `start` to `stop` with their line items"""
+    statuses, versions, weights = zip(*STATUS_WEIGHTS)
+    versions = dict(zip(statuses, versions))
+    orders, details = [], []
+
+    for offset in range(start, stop):
+        # One generator per order, so batches and processes do not matter
+        rng = random.Random('{}:order:{}'.format(plan.seed, offset))
+        user_id = plan.user_base + plan.user_of(offset)
+        created_at = plan.now - timedelta(
+            seconds=rng.randrange(plan.days * 24 * 3600)
+        )
+        status = rng.choices(statuses, weights)[0]
+        order_id = plan.order_base + offset
+        items = [(rng.randint(1, 3), rng.randint(1, 3), rng.randint(1, 3))
+                 for _ in range(rng.randint(1, 3))]
+        total, price_version = catalog.total(items)
+        orders.append(Order(
+            id=order_id, user_id=user_id, status=status,
+            status_version=versions[status],
+            phone='09{:09d}'.format(rng.randrange(10 ** 9)),
+            address='{} Seed Street'.format(rng.randint(1, 999)),
+            total=total, price_version=price_version,
+            created_at=created_at, updated_at=created_at
+        ))
+        details.extend(
+            Detail(order_id=order_id, user_id=user_id, flavour=flavour,
+                   size=size, quantity=quantity, updated_at=created_at)
+            for flavour, size, quantity in items
+        )
+
+    with transaction.atomic(), explicit_timestamps(
+        Order._meta.get_field('created_at'),
+        Order._meta.get_field('updated_at'),
+        Detail._meta.get_field('updated_at'),
+    ):
+        Order.objects.bulk_create(orders, plan.batch_size)
+        Detail.objects.bulk_create(details, plan.batch_size)
+    return 0, len(orders), len(details)
+
+
+def seed_in_process(seed, plan, start, stop):
+    try:
+        return seed(plan, start, stop)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    """Django command to bulk insert synthetic users and orders"""
+    help = ('Bulk insert synthetic users, orders and line items, '
+            'reproducibly for a given seed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, required=True)
+        parser.add_argument('--orders', type=int, required=True,
+                            help='Orders in total, spread over the users')
+        parser.add_argument('--details', type=int, default=0,
+                            help='Unassigned details per user')
+        parser.add_argument('--days', type=int, default=90,
+                            help='Spread orders over this many past days')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='password',
+                            help='Password of every seeded user')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--no-rollups', action='store_true',
+                            help='Do not rebuild the sales rollups')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['orders'] < 0:
+            raise CommandError('Give at least one user and no negative '
+                               'number of orders.')
+        started = time.perf_counter()
+        User = get_user_model()
+        # A fixed salt keeps the seeded rows identical between runs
+        password = make_password(options['password'],
+                                 salt='seed{}'.format(options['seed']))
+        now = timezone.now().replace(microsecond=0)
+        plan = SeedPlan(
+            users=options['users'],
+            orders=options['orders'],
+            details=options['details'],
+            seed=options['seed'],
+            days=options['days'],
+            password=password,
+            user_base=(User.objects.aggregate(id=Max('id'))['id'] or 0) + 1,
+            order_base=(Order.objects.aggregate(id=Max('id'))['id'] or 0) + 1,
+            now=now,
+            batch_size=options['batch_size']
+        )
+
+        # Users first, as every chunk of orders refers to some of them
+        steps = ((seed_users, plan.chunks(plan.users)),
+                 (seed_orders, plan.chunks(plan.orders)))
+        counts = []
+        if options['processes'] > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(
+                options['processes'],
+                mp_context=multiprocessing.get_context('fork')
+            ) as executor:
+                for seed, chunks in steps:
+                    counts.extend(executor.map(
+                        seed_in_process, *zip(*[(seed, plan, start, stop)
+                                                for start, stop in chunks])
+                    ))
+        else:
+            for seed, chunks in steps:
+                counts.extend(seed(plan, start, stop)
+                              for start, stop in chunks)
+
+        self._reset_sequences(User, Order, Detail)
+        if not options['no_rollups']:
+            call_command('rebuild_rollups',
+                         since=now - timedelta(days=options['days']),
+                         stdout=self.stdout)
+
+        users, orders, details = (sum(column) for column in zip(*counts))
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded {} users, {} orders and {} details in {:.1f}s'.format(
+                users, orders, details, time.perf_counter() - started
+            )
+        ))
+
+    def _reset_sequences(self, *models):
+        """Move id sequences past the ids inserted explicitly"""
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,303 @@
+"""
+Counters and histograms exposed in the Prometheus text format.
+
+Each process keeps its values in memory, or, when `METRICS_MULTIPROC_DIR`
+is set, in a memory mapped file of its own in that directory. The
+`/metrics` view then sums the files of every process, so any worker of
+a preforking server answers for all of them. Empty the directory when
+the server starts.
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+
+from core.constants import ORDER_STATUS
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5,
+                   5.0, 7.5, 10.0, float('inf'))
+
+_HEADER = struct.Struct('i')
+_VALUE = struct.Struct('d')
+
+
+class LocalValues(object):
+    """Values of this process, kept in a dict"""
+
+    def __init__(self):
+        self._values = {}
+
+    def add(self, key, amount):
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def items(self):
+        return list(self._values.items())
+
+
+class MmapedValues(object):
+    """
+    Values of this process in a memory mapped file, readable by the
+    others with `read_values`.
+
+    The file starts with the number of bytes used, followed by entries
+    made of the key length, the UTF-8 key padded to 8 bytes and the
+    value as a double.
+    """
+
+    def __init__(self, path, initial_size=1 << 16):
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < initial_size:
+            self._file.truncate(initial_size)
+            size = initial_size
+        self._capacity = size
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._positions = {}
+        self._used = _HEADER.unpack_from(self._map, 0)[0]
+        if not self._used:
+            self._used = 8
+            _HEADER.pack_into(self._map, 0, self._used)
+        for key, _, position in _entries(self._map, self._used):
+            self._positions[key] = position
+
+    def _grow(self, needed):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        self._map.close()
+        self._file.truncate(capacity)
+        self._map = mmap.mmap(self._file.fileno(), capacity)
+        self._capacity = capacity
+
+    def _position(self, key):
+        position = self._positions.get(key)
+        if position is None:
+            encoded = key.encode('utf-8')
+            padding = -(_HEADER.size + len(encoded)) % 8
+            entry = (_HEADER.pack(len(encoded)) + encoded +
+                     b' ' * padding + _VALUE.pack(0.0))
+            if self._used + len(entry) > self._capacity:
+                self._grow(self._used + len(entry))
+            self._map[self._used:self._used + len(entry)] = entry
+            self._used += len(entry)
+            # Publish the entry only once it is written
+            _HEADER.pack_into(self._map, 0, self._used)
+            position = self._positions[key] = self._used - _VALUE.size
+        return position
+
+    def add(self, key, amount):
+        position = self._position(key)
+        value = _VALUE.unpack_from(self._map, position)[0]
+        _VALUE.pack_into(self._map, position, value + amount)
+
+    def items(self):
+        return [(key, value)
+                for key, value, _ in _entries(self._map, self._used)]
+
+
+def _entries(data, used):
+    """Yield the key, value and value position of the entries of a file"""
+    position = 8
+    while position < used:
+        length = _HEADER.unpack_from(data, position)[0]
+        position += _HEADER.size
+        key = bytes(data[position:position + length]).decode('utf-8')
+        position += length + (-(_HEADER.size + length) % 8)
+        yield key, _VALUE.unpack_from(data, position)[0], position
+        position += _VALUE.size
+
+
+def read_values(path):
+    """Return the entries of a file written by another process"""
+    with open(path, 'rb') as values:
+        data = values.read()
+    if len(data) < 8:
+        return []
+    return [(key, value)
+            for key, value, _ in _entries(data, _HEADER.unpack_from(data)[0])]
+
+
+class Registry(object):
+    """The metrics of the application and where their values live"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+        self._values = None
+        self._pid = None
+
+    @property
+    def directory(self):
+        return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def _store(self):
+        # A process forked after the first update needs its own file
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            if self.directory:
+                self._values = MmapedValues(os.path.join(
+                    self.directory, 'metrics_{}.db'.format(self._pid)
+                ))
+            else:
+                self._values = LocalValues()
+        return self._values
+
+    def add(self, key, amount):
+        with self._lock:
+            self._store().add(key, amount)
+
+    def reset(self):
+        """Start from empty values, for tests"""
+        with self._lock:
+            self._pid = None
+
+    def collect(self):
+        """Return every value, summed over processes"""
+        with self._lock:
+            if not self.directory:
+                return self._store().items()
+        totals = {}
+        for path in glob.glob(os.path.join(self.directory, '*.db')):
+            for key, value in read_values(path):
+                totals[key] = totals.get(key, 0.0) + value
+        return list(totals.items())
+
+    def expose(self):
+        """Render every metric in the Prometheus text format"""
+        samples = {}
+        for key, value in self.collect():
+            name, suffix, labels = json.loads(key)
+            samples.setdefault(name, []).append(
+                (suffix, [tuple(label) for label in labels], value)
+            )
+        lines = []
+        for metric in self._metrics:
+            lines.append('# HELP {} {}'.format(metric.name,
+                                               metric.documentation))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+            for suffix, labels, value in metric.order(
+                samples.get(metric.name, [])
+            ):
+                lines.append('{}{}{} {}'.format(
+                    metric.name, suffix, _format_labels(labels),
+                    _format_value(value)
+                ))
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, value.replace('\\', r'\\')
+                         .replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in labels
+    ) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric(object):
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(),
+                 registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def _key(self, suffix, labels, extra=()):
+        if set(labels) != set(self.labelnames):
+            raise ValueError('{} takes the labels {}'.format(
+                self.name, ', '.join(self.labelnames)
+            ))
+        return json.dumps([
+            self.name, suffix,
+            [[name, str(labels[name])] for name in self.labelnames] +
+            list(extra)
+        ])
+
+    def order(self, samples):
+        return sorted(samples)
+
+
+class Counter(Metric):
+    """A value that only goes up"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('Counters can only be increased')
+        self.registry.add(self._key('_total', labels), amount)
+
+
+class Histogram(Metric):
+    """Counts of observations in cumulative buckets, with their sum"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None,
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, registry)
+        buckets = sorted(float(bucket) for bucket in buckets)
+        if buckets[-1] != float('inf'):
+            buckets.append(float('inf'))
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        for bucket in self.buckets:
+            if value <= bucket:
+                self.registry.add(self._key(
+                    '_bucket', labels, [['le', _format_value(bucket)]]
+                ), 1)
+        self.registry.add(self._key('_sum', labels), value)
+        self.registry.add(self._key('_count', labels), 1)
+
+    def order(self, samples):
+        """Order buckets by bound, then sum and count, per label set"""
+        bounds = {_format_value(bucket): index
+                  for index, bucket in enumerate(self.buckets)}
+        suffixes = {'_bucket': 0, '_sum': 1, '_count': 2}
+
+        def sort_key(sample):
+            suffix, labels, _ = sample
+            le = dict(labels).get('le')
+            return ([label for label in labels if label[0] != 'le'],
+                    suffixes[suffix], bounds.get(le, 0))
+        return sorted(samples, key=sort_key)
+
+
+REGISTRY = Registry()
+
+STATUS_NAMES = dict(ORDER_STATUS)
+
+REQUESTS = Counter(
+    'http_requests', 'HTTP requests by route, method and status code',
+    ['route', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ['route', 'method']
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per HTTP request',
+    ['route'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+ORDERS_CREATED = Counter('orders_created', 'Orders created')
+STATUS_TRANSITIONS = Counter(
+    'order_status_transitions', 'Order status changes by old and new status',
+    ['from_status', 'to_status']
+)
@@ -0,0 +1,276 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+from rest_framework.permissions import SAFE_METHODS
+
+from core import metrics, routers
+from core.timing import QueryCounter, RequestTimings, activate, \
+    count_queries, deactivate, stop_counting
+
+logger = logging.getLogger('core.timing')
+
+DEFAULT_REQUEST_TIMING = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 1.0,
+    'SLOW_REQUEST_MS': 500,
+    'HEADER': True,
+}
+PHASES = ('db', 'view', 'serialize', 'render')
+
+
+class HybridMiddleware(object):
+    """
+    Middleware usable by both the WSGI and the ASGI handler, so async
+    views are not pushed to a thread by the middleware chain. Subclasses
+    wrap the request in `before` and `after`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self.before(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.finish(state)
+        return self.after(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.before(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(state)
+        return self.after(request, response, state)
+
+    def before(self, request):
+        """Return the state handed to `finish` and `after`"""
+        return None
+
+    def finish(self, state):
+        """Clean up after the view, whether it raised or not"""
+
+    def after(self, request, response, state):
+        return response
+
+
+class RequestTimingMiddleware(HybridMiddleware):
+    """
+    Measure database, view, serializer and render time of sampled
+    requests, and report them in a `Server-Timing` header and a JSON
+    log line. Requests slower than `SLOW_REQUEST_MS` are logged as
+    warnings whether sampled or not.
+
+    Configured with the `REQUEST_TIMING` setting, and left out of the
+    middleware chain entirely when not enabled.
+    """
+
+    def __init__(self, get_response):
+        config = dict(DEFAULT_REQUEST_TIMING,
+                      **getattr(settings, 'REQUEST_TIMING', {}))
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.sample_rate = config['SAMPLE_RATE']
+        self.slow_seconds = config['SLOW_REQUEST_MS'] / 1000.0
+        self.header = config['HEADER']
+
+    def before(self, request):
+        start = time.perf_counter()
+        if random.random() >= self.sample_rate:
+            return start, None, None
+        timings = request._timings = RequestTimings()
+        return start, timings, activate(timings)
+
+    def finish(self, state):
+        _, timings, token = state
+        if token is not None:
+            deactivate(token)
+
+    def after(self, request, response, state):
+        start, timings, _ = state
+        total = time.perf_counter() - start
+        if timings is None:
+            if total >= self.slow_seconds:
+                self.log(request, response, total, None)
+            return response
+
+        timings.stop('view')
+        if self.header:
+            response['Server-Timing'] = self.server_timing(timings, total)
+        self.log(request, response, total, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = getattr(request, '_timings', None)
+        if timings is not None:
+            timings.start('view')
+
+    def process_template_response(self, request, response):
+        timings = getattr(request, '_timings', None)
+        if timings is not None:
+            timings.stop('view')
+            timings.start('render')
+            response.add_post_render_callback(
+                lambda response: timings.stop('render')
+            )
+        return response
+
+    def server_timing(self, timings, total):
+        metrics = [
+            '{};dur={:.2f}'.format(name, timings.durations[name] * 1000)
+            for name in PHASES if name in timings.durations
+        ]
+        if 'db' in timings.durations:
+            metrics[0] += ';desc="{} queries"'.format(timings.queries)
+        metrics.append('total;dur={:.2f}'.format(total * 1000))
+        return ', '.join(metrics)
+
+    def log(self, request, response, total, timings):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+        }
+        if timings is not None:
+            record['db_queries'] = timings.queries
+            for name in PHASES:
+                record[name + '_ms'] = round(
+                    timings.durations.get(name, 0) * 1000, 2
+                )
+        slow = total >= self.slow_seconds
+        record['slow'] = slow
+        logger.log(logging.WARNING if slow else logging.INFO,
+                   json.dumps(record))
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Count requests by route name, method and status code, and record
+    their latency and number of database queries, see core.metrics.
+    """
+
+    def before(self, request):
+        queries = QueryCounter()
+        return time.perf_counter(), queries, count_queries(queries)
+
+    def finish(self, state):
+        stop_counting(state[2])
+
+    def after(self, request, response, state):
+        start, queries, _ = state
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        metrics.REQUESTS.inc(route=route, method=request.method,
+                             status=response.status_code)
+        metrics.REQUEST_LATENCY.observe(elapsed, route=route,
+                                        method=request.method)
+        metrics.REQUEST_QUERIES.observe(queries.count, route=route)
+        return response
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Read safe requests of the views of the routed apps from a replica,
+    unless the client wrote recently, and pin clients that write to the
+    primary, see core.routers.
+
+    Configured with the `REPLICA_ROUTING` setting, and left out of the
+    middleware chain when it names no replica.
+    """
+
+    def __init__(self, get_response):
+        config = routers.get_config()
+        if not config['REPLICAS']:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.replicas = list(config['REPLICAS'])
+        self.apps = set(config['APPS'])
+        self.cookie = config['COOKIE']
+        self.seconds = config['STICKY_SECONDS']
+        self.pins = routers.PrimaryPins(config['CACHE_ALIAS'], self.seconds)
+
+    def before(self, request):
+        if (request.method not in SAFE_METHODS or
+                not self.routed(request) or self.pinned(request)):
+            return None
+        return routers.read_from(random.choice(self.replicas))
+
+    def finish(self, token):
+        if token is not None:
+            routers.stop_reading(token)
+
+    def after(self, request, response, token):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(self.cookie, '1', max_age=self.seconds,
+                                httponly=True, samesite='Lax')
+            key = token_key(request)
+            if key:
+                self.pins.pin(key)
+        return response
+
+    def routed(self, request):
+        """Whether the request goes to a view of a routed app"""
+        try:
+            match = resolve(request.path_info,
+                            getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        view = getattr(match.func, 'cls', match.func)
+        return view.__module__.partition('.')[0] in self.apps
+
+    def pinned(self, request):
+        if self.cookie in request.COOKIES:
+            return True
+        key = token_key(request)
+        return bool(key) and self.pins.is_pinned(key)
+
+
+def token_key(request):
+    """Return the key of the request's token header, if any"""
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) == 2 and parts[0].lower() == 'token':
+        return parts[1]
+    return None
+
+
+class AsyncViewsMiddleware(object):
+    """
+    Serve the views that have an `async_view`, see core.async_views,
+    with it when running under ASGI. Left out of the middleware chain
+    of the WSGI application, which keeps the sync views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not iscoroutinefunction(get_response):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        return await self.get_response(request)
+
+    async def process_view(self, request, view_func, view_args, view_kwargs):
+        async_view = getattr(view_func, 'async_view', None)
+        if async_view is not None:
+            return await async_view(request, *view_args, **view_kwargs)
@@ -0,0 +1,36 @@
+from django.db import migrations, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+BATCH_SIZE = 5000
+
+
+def backfill_timestamps(apps, schema_editor):
+    """
+    Stamp existing orders in id ranges of BATCH_SIZE, committing each
+    batch on its own so the table is never locked as a whole
+    """
+    Order = apps.get_model('core', 'Order')
+    db = schema_editor.connection.alias
+    last_id = Order.objects.using(db).aggregate(last=Max('id'))['last'] or 0
+    now = timezone.now()
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        with transaction.atomic(using=db):
+            Order.objects.using(db).filter(
+                id__gte=start,
+                id__lt=start + BATCH_SIZE,
+                created_at__isnull=True
+            ).update(created_at=now, updated_at=now)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0002_order_timestamps'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timestamps,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 2000
+
+
+def links_to_line_items(apps, schema_editor):
+    """
+    Point every detail at its order, walking the order/detail table in
+    committed batches. A detail linked to several orders is copied so
+    each order keeps its own line item.
+    """
+    Order = apps.get_model('core', 'Order')
+    Detail = apps.get_model('core', 'Detail')
+    Link = Order.detail.through
+    db = schema_editor.connection.alias
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db):
+            links = list(
+                Link.objects.using(db).filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'order_id', 'detail_id')[:BATCH_SIZE]
+            )
+            if not links:
+                return
+            last_id = links[-1][0]
+
+            details = Detail.objects.using(db).in_bulk(
+                {detail_id for _, _, detail_id in links}
+            )
+            assigned, copies = [], []
+            for _, order_id, detail_id in links:
+                detail = details[detail_id]
+                if detail.order_id is None:
+                    detail.order_id = order_id
+                    assigned.append(detail)
+                elif detail.order_id != order_id:
+                    copies.append(Detail(
+                        order_id=order_id,
+                        user_id=detail.user_id,
+                        flavour=detail.flavour,
+                        size=detail.size,
+                        quantity=detail.quantity
+                    ))
+            Detail.objects.using(db).bulk_update(assigned, ['order'])
+            Detail.objects.using(db).bulk_create(copies)
+
+
+def line_items_to_links(apps, schema_editor):
+    """Recreate the order/detail table from the line item orders"""
+    Order = apps.get_model('core', 'Order')
+    Detail = apps.get_model('core', 'Detail')
+    Link = Order.detail.through
+    db = schema_editor.connection.alias
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db):
+            details = list(
+                Detail.objects.using(db)
+                .filter(id__gt=last_id, order__isnull=False).order_by('id')
+                .values_list('id', 'order_id')[:BATCH_SIZE]
+            )
+            if not details:
+                return
+            last_id = details[-1][0]
+            Link.objects.using(db).bulk_create([
+                Link(order_id=order_id, detail_id=detail_id)
+                for detail_id, order_id in details
+            ])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_detail_order'),
+    ]
+
+    operations = [
+        migrations.RunPython(links_to_line_items, line_items_to_links),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_copy_order_detail_links'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='order',
+            name='detail',
+        ),
+        migrations.AlterField(
+            model_name='detail',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='detail', to='core.Order'),
+        ),
+    ]
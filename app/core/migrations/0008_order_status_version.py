@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_remove_order_detail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='status_version',
+            field=models.PositiveIntegerField(default=0, help_text='Number of status changes, for status subscribers'),
+        ),
+    ]
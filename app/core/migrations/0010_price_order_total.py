@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_detail_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Price',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('flavour', models.PositiveSmallIntegerField(choices=[(1, 'margarita'), (2, 'marinara'), (3, 'salami')])),
+                ('size', models.PositiveSmallIntegerField(choices=[(1, 'Small'), (2, 'Medium'), (3, 'Large')])),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=8)),
+            ],
+            options={
+                'unique_together': {('version', 'flavour', 'size')},
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='price_version',
+            field=models.PositiveIntegerField(blank=True, help_text='Price catalog version the total was computed with', null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_price_order_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the hour, in UTC')),
+                ('flavour', models.PositiveSmallIntegerField(choices=[(1, 'margarita'), (2, 'marinara'), (3, 'salami')])),
+                ('size', models.PositiveSmallIntegerField(choices=[(1, 'Small'), (2, 'Medium'), (3, 'Large')])),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Received'), (2, 'In Process'), (3, 'Out For Delivery'), (4, 'Delivered'), (5, 'Returned')])),
+                ('pizzas', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('bucket', 'flavour', 'size', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# The archived orders partitioned by status, then by range of creation
+# time with a default partition, monthly ones being added by
+# core.archive. The primary key has to include both partition keys. The
+# user foreign key and the indexes of the CreateModel are deferred to
+# the end of the migration, so they are created on this table.
+PARTITIONED_ARCHIVED_ORDERS = [
+    'DROP TABLE "core_archivedorder"',
+    '''CREATE TABLE "core_archivedorder" (
+        "id" integer NOT NULL,
+        "name" varchar(50) NOT NULL,
+        "status" smallint NOT NULL CHECK ("status" >= 0),
+        "phone" varchar(16) NOT NULL,
+        "address" text NOT NULL,
+        "total" numeric(10, 2) NOT NULL,
+        "price_version" integer NULL CHECK ("price_version" >= 0),
+        "status_version" integer NOT NULL CHECK ("status_version" >= 0),
+        "created_at" timestamp with time zone NOT NULL,
+        "updated_at" timestamp with time zone NOT NULL,
+        "archived_at" timestamp with time zone NOT NULL,
+        "user_id" integer NOT NULL,
+        PRIMARY KEY ("id", "status", "created_at")
+    ) PARTITION BY LIST ("status")''',
+    '''CREATE TABLE "core_archivedorder_s4" PARTITION OF "core_archivedorder"
+        FOR VALUES IN (4) PARTITION BY RANGE ("created_at")''',
+    '''CREATE TABLE "core_archivedorder_s4_default"
+        PARTITION OF "core_archivedorder_s4" DEFAULT''',
+    '''CREATE TABLE "core_archivedorder_s5" PARTITION OF "core_archivedorder"
+        FOR VALUES IN (5) PARTITION BY RANGE ("created_at")''',
+    '''CREATE TABLE "core_archivedorder_s5_default"
+        PARTITION OF "core_archivedorder_s5" DEFAULT''',
+]
+
+
+class PostgresRunSQL(migrations.RunSQL):
+    """RunSQL on Postgres only, other databases keep the plain table"""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state,
+                                      to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state,
+                                       to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_salesrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Received'), (2, 'In Process'), (3, 'Out For Delivery'), (4, 'Delivered'), (5, 'Returned')])),
+                ('phone', models.CharField(max_length=16, verbose_name='Phone')),
+                ('address', models.TextField(verbose_name='Address')),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_version', models.PositiveIntegerField(blank=True, null=True)),
+                ('status_version', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at'], name='archived_user_created_idx')],
+            },
+        ),
+        PostgresRunSQL(PARTITIONED_ARCHIVED_ORDERS, migrations.RunSQL.noop),
+        migrations.CreateModel(
+            name='ArchivedDetail',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('flavour', models.PositiveSmallIntegerField(choices=[(1, 'margarita'), (2, 'marinara'), (3, 'salami')])),
+                ('size', models.PositiveSmallIntegerField(choices=[(1, 'Small'), (2, 'Medium'), (3, 'Large')])),
+                ('quantity', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField()),
+                ('order', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='detail', to='core.archivedorder')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
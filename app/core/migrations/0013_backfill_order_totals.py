@@ -0,0 +1,73 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, transaction
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+CENT = Decimal('0.01')
+
+
+def backfill_order_totals(apps, schema_editor):
+    """
+    Price the live and archived orders stored before they had a total,
+    with the latest catalog prices, in committed batches of order ids.
+    Without prices yet, `manage.py backfill_totals` prices them later.
+    """
+    Price = apps.get_model('core', 'Price')
+    db = schema_editor.connection.alias
+
+    prices, version = {}, None
+    for row in Price.objects.using(db).order_by('version').values(
+        'version', 'flavour', 'size', 'amount'
+    ):
+        prices[row['flavour'], row['size']] = row['amount']
+        version = row['version']
+    if version is None:
+        return
+
+    for name, detail_name in (('Order', 'Detail'),
+                              ('ArchivedOrder', 'ArchivedDetail')):
+        Order = apps.get_model('core', name)
+        Detail = apps.get_model('core', detail_name)
+        last_id = 0
+        while True:
+            order_ids = list(
+                Order.objects.using(db)
+                .filter(id__gt=last_id, price_version__isnull=True)
+                .order_by('id').values_list('id', flat=True)[:BATCH_SIZE]
+            )
+            if not order_ids:
+                break
+            last_id = order_ids[-1]
+
+            totals = dict.fromkeys(order_ids, Decimal(0))
+            for order_id, flavour, size, quantity in (
+                Detail.objects.using(db).filter(order_id__in=order_ids)
+                .values_list('order_id', 'flavour', 'size', 'quantity')
+            ):
+                totals[order_id] += prices.get((flavour, size),
+                                               Decimal(0)) * quantity
+            by_total = defaultdict(list)
+            for order_id, total in totals.items():
+                by_total[total.quantize(CENT)].append(order_id)
+            now = timezone.now()
+            with transaction.atomic(using=db):
+                for total, ids in by_total.items():
+                    Order.objects.using(db).filter(
+                        id__in=ids, price_version__isnull=True
+                    ).update(total=total, price_version=version,
+                             updated_at=now)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_archived_orders'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_totals,
+                             migrations.RunPython.noop),
+    ]
@@ -1,9 +1,11 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
-from django.utils.translation import ugettext_lazy as _
+from django.utils.translation import gettext_lazy as _
 from django.conf import settings
-from .constants import ORDER_SIZE, ORDER_STATUS, ORDER_TITLE
+from .constants import ORDER_SIZE, ORDER_STATUS, ORDER_TITLE, \
+    ORDER_STATUS_PREDECESSORS
 
 
 class UserManager(BaseUserManager):
@@ -40,7 +42,37 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class Price(models.Model):
+    """
+    Price of a pizza in one version of the catalog. A new version only
+    needs the prices it changes, the others carry over.
+    """
+    version = models.PositiveIntegerField()
+    flavour = models.PositiveSmallIntegerField(choices=ORDER_TITLE)
+    size = models.PositiveSmallIntegerField(choices=ORDER_SIZE)
+    amount = models.DecimalField(max_digits=8, decimal_places=2)
+
+    class Meta:
+        unique_together = ('version', 'flavour', 'size')
+
+    def __str__(self):
+        return u'{flavour} {size}: {amount} (v{version})'.format(
+            flavour=self.get_flavour_display(),
+            size=self.get_size_display(),
+            amount=self.amount,
+            version=self.version
+        )
+
+
 class Detail(models.Model):
+    """Pizza line item, owned by an order once it is placed"""
+    order = models.ForeignKey(
+        'Order',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='detail'
+    )
     flavour = models.PositiveSmallIntegerField(
         choices=ORDER_TITLE,
         default=1
@@ -55,6 +87,24 @@ class Detail(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class OrderQuerySet(models.QuerySet):
+
+    def transition(self, status):
+        """
+        Move the orders to `status` with a single conditional UPDATE
+        that only matches orders in an allowed predecessor status, and
+        return the number of orders that were moved
+        """
+        return self.filter(
+            status__in=ORDER_STATUS_PREDECESSORS[status]
+        ).update(
+            status=status,
+            status_version=models.F('status_version') + 1,
+            updated_at=timezone.now()
+        )
 
 
 class Order(models.Model):
@@ -69,12 +119,34 @@ class Order(models.Model):
         choices=ORDER_STATUS,
         default=1
     )
-    detail = models.ManyToManyField('Detail', blank=False)
     phone = models.CharField(_('Phone'),
                              max_length=16,
                              help_text=_('Phone for driver to contact'))
     address = models.TextField(_('Address'),
                                help_text=_('Address for pizza delivery'))
+    total = models.DecimalField(max_digits=10, decimal_places=2,
+                                default=0)
+    price_version = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text=_('Price catalog version the total was computed with')
+    )
+    status_version = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Number of status changes, for status subscribers')
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'],
+                         name='order_user_created_idx'),
+            models.Index(fields=['status', 'created_at'],
+                         name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return u'[{name} - {status}] - {user} '.format(
@@ -82,3 +154,74 @@ class Order(models.Model):
             status=self.get_status_display(),
             user=self.user.name
         )
+
+
+class SalesRollup(models.Model):
+    """
+    Pizzas sold per hour, flavour, size and order status, kept up to
+    date as orders change so analytics do not scan orders.
+    """
+    bucket = models.DateTimeField(help_text=_('Start of the hour, in UTC'))
+    flavour = models.PositiveSmallIntegerField(choices=ORDER_TITLE)
+    size = models.PositiveSmallIntegerField(choices=ORDER_SIZE)
+    status = models.PositiveSmallIntegerField(choices=ORDER_STATUS)
+    pizzas = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('bucket', 'flavour', 'size', 'status')
+
+
+class ArchivedOrder(models.Model):
+    """
+    Delivered or returned order moved out of the live orders by
+    `manage.py archive_orders`, with its id. Archived orders are read
+    only and only read by history requests.
+    """
+    id = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=50)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    status = models.PositiveSmallIntegerField(choices=ORDER_STATUS)
+    phone = models.CharField(_('Phone'), max_length=16)
+    address = models.TextField(_('Address'))
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    price_version = models.PositiveIntegerField(null=True, blank=True)
+    status_version = models.PositiveIntegerField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'],
+                         name='archived_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return u'[{name} - {status}] - {user} (archived)'.format(
+            name=self.name,
+            status=self.get_status_display(),
+            user=self.user.name
+        )
+
+
+class ArchivedDetail(models.Model):
+    """Line item of an archived order, with its id"""
+    id = models.IntegerField(primary_key=True)
+    # Without a constraint, which a partitioned archive cannot take
+    order = models.ForeignKey(
+        ArchivedOrder,
+        on_delete=models.CASCADE,
+        related_name='detail',
+        db_constraint=False
+    )
+    flavour = models.PositiveSmallIntegerField(choices=ORDER_TITLE)
+    size = models.PositiveSmallIntegerField(choices=ORDER_SIZE)
+    quantity = models.PositiveIntegerField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    updated_at = models.DateTimeField()
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+CENT = Decimal('0.01')
+BATCH_SIZE = 2000
+
+
+def load_prices(prices):
+    """
+    Return the latest price of each flavour and size in the `prices`
+    queryset, and the latest catalog version
+    """
+    latest, version = {}, None
+    for row in prices.order_by('version').values(
+        'version', 'flavour', 'size', 'amount'
+    ):
+        latest[row['flavour'], row['size']] = row['amount']
+        version = row['version']
+    return latest, version
+
+
+class PriceCatalog(object):
+    """
+    In-memory lookup of the current price of every flavour and size.
+
+    The catalog is loaded on first use, reloaded when a price changes
+    in this process and at least every `PRICE_CATALOG_TTL` seconds to
+    pick up changes made by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prices = None
+        self._version = None
+        self._loaded_at = 0
+
+    def _load(self):
+        from core.models import Price
+
+        return load_prices(Price.objects.all())
+
+    def _current(self):
+        ttl = getattr(settings, 'PRICE_CATALOG_TTL', 60)
+        with self._lock:
+            if (self._prices is None or
+                    time.monotonic() - self._loaded_at >= ttl):
+                self._prices, self._version = self._load()
+                self._loaded_at = time.monotonic()
+            return self._prices, self._version
+
+    def invalidate(self):
+        """Reload the catalog on next use"""
+        with self._lock:
+            self._prices = None
+
+    @property
+    def version(self):
+        return self._current()[1]
+
+    def price(self, flavour, size):
+        """Return the unit price of a pizza, zero when it has none"""
+        return self._current()[0].get((flavour, size), Decimal(0))
+
+    def total(self, items):
+        """
+        Return the total of `(flavour, size, quantity)` items together
+        with the catalog version it was computed with
+        """
+        prices, version = self._current()
+        total = sum(
+            (prices.get((flavour, size), Decimal(0)) * quantity
+             for flavour, size, quantity in items),
+            Decimal(0)
+        )
+        return total.quantize(CENT), version
+
+
+catalog = PriceCatalog()
+
+
+def reprice_order(order_id):
+    """Recompute and store the total of an order from its line items"""
+    from core.models import Detail, Order
+
+    total, version = catalog.total(
+        Detail.objects.filter(order_id=order_id).values_list(
+            'flavour', 'size', 'quantity'
+        )
+    )
+    # Bumps updated_at as well, which the order's ETag is made of
+    Order.objects.filter(pk=order_id).update(total=total,
+                                             price_version=version,
+                                             updated_at=timezone.now())
+    return total
+
+
+def backfill_totals(orders, prices, version, batch_size=BATCH_SIZE):
+    """
+    Price the orders of the `orders` queryset stored without a catalog
+    version, with `prices` of catalog `version`. Orders are priced in
+    id ranges committed one by one, so the table is never locked as a
+    whole. Return the number of orders priced.
+    """
+    model, db = orders.model, orders.db
+    details = model._meta.get_field('detail').related_model
+    orders = orders.filter(price_version__isnull=True).order_by('id')
+    count, last_id = 0, 0
+    while True:
+        order_ids = list(orders.filter(id__gt=last_id).values_list(
+            'id', flat=True
+        )[:batch_size])
+        if not order_ids:
+            return count
+        totals = dict.fromkeys(order_ids, Decimal(0))
+        for order_id, flavour, size, quantity in details.objects.using(
+            db
+        ).filter(order_id__in=order_ids).values_list(
+            'order_id', 'flavour', 'size', 'quantity'
+        ):
+            totals[order_id] += prices.get((flavour, size),
+                                           Decimal(0)) * quantity
+        # One UPDATE per distinct total
+        by_total = defaultdict(list)
+        for order_id, total in totals.items():
+            by_total[total.quantize(CENT)].append(order_id)
+        now = timezone.now()
+        with transaction.atomic(using=db):
+            for total, ids in by_total.items():
+                model.objects.using(db).filter(
+                    id__in=ids, price_version__isnull=True
+                ).update(total=total, price_version=version, updated_at=now)
+        count += len(order_ids)
+        last_id = order_ids[-1]
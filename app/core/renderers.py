@@ -0,0 +1,61 @@
+"""
+JSON rendering with orjson, when it is installed.
+
+`dumps` encodes like the stdlib json module configured as DRF's
+JSONRenderer is, compact and not ASCII escaped, in a fraction of the
+time. Types orjson does not know, datetimes included, are handed to the
+`default` of the stdlib encoder being replaced, so they look the same.
+Without orjson, or for data orjson refuses such as integers of more
+than 64 bits, the stdlib module is used.
+"""
+import json
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | \
+        orjson.OPT_PASSTHROUGH_DATACLASS
+
+# What JavaScript reads as line breaks, escaped by JSONRenderer too
+LINE_SEPARATORS = (('\u2028'.encode(), b'\\u2028'),
+                   ('\u2029'.encode(), b'\\u2029'))
+
+
+def dumps(data, default):
+    """Return `data` as compact UTF-8 JSON, escaping JS line separators"""
+    ret = None
+    if orjson is not None:
+        try:
+            ret = orjson.dumps(data, default=default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    if ret is None:
+        ret = json.dumps(data, default=default, ensure_ascii=False,
+                         separators=(',', ':')).encode()
+    for separator, escaped in LINE_SEPARATORS:
+        if separator in ret:
+            ret = ret.replace(separator, escaped)
+    return ret
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson. Indented output, asked for by
+    `?format=json` with `indent` or by the browsable API, and settings
+    other than the compact Unicode defaults are left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact or \
+                self.get_indent(accepted_media_type,
+                                renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        return dumps(data, self.encoder_class().default)
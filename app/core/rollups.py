@@ -0,0 +1,116 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timezone
+
+from django.db.models import F
+
+
+def bucket_for(timestamp):
+    """Return the start of the UTC hour a timestamp falls in"""
+    return timestamp.astimezone(timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+
+
+def order_sales(order_ids, details=None):
+    """
+    Return the pizzas of the given orders keyed by
+    `(bucket, flavour, size, status)`. Pass `details=ArchivedDetail`
+    for archived orders.
+    """
+    from core.models import Detail
+
+    sales = Counter()
+    for created_at, status, flavour, size, quantity in (
+        (details or Detail).objects.filter(order_id__in=order_ids).values_list(
+            'order__created_at', 'order__status', 'flavour', 'size',
+            'quantity'
+        )
+    ):
+        sales[bucket_for(created_at), flavour, size, status] += quantity
+    return sales
+
+
+def item_sales(order, items):
+    """
+    Return the sales of a new order from its `(flavour, size,
+    quantity)` items, without querying them back
+    """
+    sales = Counter()
+    bucket = bucket_for(order.created_at)
+    for flavour, size, quantity in items:
+        sales[bucket, flavour, size, order.status] += quantity
+    return sales
+
+
+def apply_sales(sales, sign=1):
+    """
+    Add `sales` to the rollups, or subtract them with `sign=-1`. Rows
+    are upserted in key order so concurrent writers do not deadlock.
+    """
+    from core.models import SalesRollup
+
+    deltas = sorted(
+        (key, quantity * sign) for key, quantity in sales.items()
+        if quantity
+    )
+    if not deltas:
+        return
+    SalesRollup.objects.bulk_create([
+        SalesRollup(bucket=bucket, flavour=flavour, size=size,
+                    status=status)
+        for (bucket, flavour, size, status), _ in deltas
+    ], ignore_conflicts=True)
+    for (bucket, flavour, size, status), delta in deltas:
+        SalesRollup.objects.filter(
+            bucket=bucket, flavour=flavour, size=size, status=status
+        ).update(pizzas=F('pizzas') + delta)
+
+
+def move_sales(order_ids, old_status, status):
+    """
+    Move the pizzas of orders that were just moved from `old_status`
+    to `status`
+    """
+    moved = Counter()
+    for (bucket, flavour, size, _), quantity in (
+        order_sales(order_ids).items()
+    ):
+        moved[bucket, flavour, size, status] += quantity
+        moved[bucket, flavour, size, old_status] -= quantity
+    apply_sales(moved)
+
+
+def status_sales(moves):
+    """
+    Return the change to the rollups of moving orders out of their
+    current status, `moves` mapping order ids to their new status. Call
+    it before the orders are moved.
+    """
+    from core.models import Detail
+
+    moved = Counter()
+    for order_id, created_at, old_status, flavour, size, quantity in (
+        Detail.objects.filter(order_id__in=moves).values_list(
+            'order_id', 'order__created_at', 'order__status', 'flavour',
+            'size', 'quantity'
+        )
+    ):
+        bucket = bucket_for(created_at)
+        moved[bucket, flavour, size, moves[order_id]] += quantity
+        moved[bucket, flavour, size, old_status] -= quantity
+    return moved
+
+
+@contextmanager
+def track_sales(order_ids):
+    """
+    Apply to the rollups whatever the wrapped block changes in the
+    line items or status of the given orders. Run it inside the
+    transaction that makes the change.
+    """
+    before = order_sales(order_ids)
+    yield
+    after = order_sales(order_ids)
+    after.subtract(before)
+    apply_sales(after)
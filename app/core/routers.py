@@ -0,0 +1,79 @@
+"""
+Read replica routing.
+
+ReplicaRoutingMiddleware picks a replica for each safe request of the
+views of `APPS`, and ReplicaRouter sends that request's reads there.
+Everything else, writes included, goes to the primary.
+
+A client that wrote is pinned to the primary for `STICKY_SECONDS`, so
+it reads its own writes while the replicas catch up. The pin is both a
+cookie and a cache entry keyed by the client's token, for API clients
+that do not keep cookies.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+DEFAULT_REPLICA_ROUTING = {
+    'REPLICAS': [],
+    'APPS': ('order', 'user'),
+    # Read on the primary, so a token works as soon as it is issued
+    'PRIMARY_MODELS': ('authtoken.token',),
+    'STICKY_SECONDS': 10,
+    'CACHE_ALIAS': 'default',
+    'COOKIE': 'primary_pin',
+}
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_config():
+    return dict(DEFAULT_REPLICA_ROUTING,
+                **getattr(settings, 'REPLICA_ROUTING', {}))
+
+
+def read_from(alias):
+    """Send the reads of the current request to `alias`"""
+    return _read_alias.set(alias)
+
+
+def stop_reading(token):
+    _read_alias.reset(token)
+
+
+class PrimaryPins(object):
+    """Tokens of the clients that wrote recently, in a Django cache"""
+    prefix = 'primary-pin:'
+
+    def __init__(self, alias, seconds):
+        self.cache = caches[alias]
+        self.seconds = seconds
+
+    def pin(self, token):
+        self.cache.set(self.prefix + token, True, self.seconds)
+
+    def is_pinned(self, token):
+        return bool(self.cache.get(self.prefix + token))
+
+
+class ReplicaRouter(object):
+    """Route reads to the replica chosen for the current request"""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or model._meta.label_lower in \
+                get_config()['PRIMARY_MODELS']:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Never the database an instance was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *get_config()['REPLICAS']}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
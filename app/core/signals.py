@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from core import metrics
+from core.models import Order, Price
+from core.pricing import catalog
+from core.timing import observe_query
+
+# Sent once the transaction that changed the status of an order commits,
+# with `order_id`, `old_status`, `status` and the new `version`.
+order_status_changed = Signal()
+
+
+def send_order_status_changed(order_id, old_status, status, version):
+    """Send `order_status_changed` when the current transaction commits"""
+    transaction.on_commit(lambda: order_status_changed.send(
+        sender=Order,
+        order_id=order_id,
+        old_status=old_status,
+        status=status,
+        version=version
+    ))
+
+
+@receiver(connection_created)
+def install_query_observer(sender, connection, **kwargs):
+    """Let the request middleware count the queries of every connection"""
+    if observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(observe_query)
+
+
+@receiver([post_save, post_delete], sender=Price)
+def refresh_price_catalog(sender, **kwargs):
+    """Reload the price catalog after a price changes"""
+    catalog.invalidate()
+
+
+@receiver(post_save, sender=Order)
+def count_created_order(sender, created, **kwargs):
+    """Count new orders once they are committed"""
+    if created:
+        transaction.on_commit(metrics.ORDERS_CREATED.inc)
+
+
+@receiver(order_status_changed)
+def count_status_transition(sender, old_status, status, **kwargs):
+    """Count status changes by old and new status"""
+    metrics.STATUS_TRANSITIONS.inc(
+        from_status=metrics.STATUS_NAMES[old_status],
+        to_status=metrics.STATUS_NAMES[status]
+    )
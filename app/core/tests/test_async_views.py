@@ -0,0 +1,217 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import concurrency, constants
+from core.models import Order
+from order.views import OrderRetrieveUpdateStatusView
+from user.authentication import get_token_cache
+
+
+class AsyncViewsTests(TransactionTestCase):
+    """
+    Test the async views served by the async handler answer like the
+    DRF views they replace. The bounded pool has connections of its own,
+    so the data is committed.
+    """
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com', 'testpass', name='Mahsa'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.order = Order.objects.create(
+            user=self.user, phone='9395679312', address='address',
+            status=constants.IN_PROCESS, status_version=1
+        )
+        self.auth = 'Token ' + self.token.key
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+
+    def call(self, path, method='get', data=None, headers=None):
+        headers = dict({'Authorization': self.auth}, **(headers or {}))
+        send = async_to_sync(getattr(AsyncClient(), method))
+        if data is not None:
+            return send(path, data, content_type='application/json',
+                        headers=headers)
+        return send(path, headers=headers)
+
+    def assertSameResponse(self, response, expected):
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content),
+                         json.loads(expected.content))
+
+    def test_order_status(self):
+        """Test the status matches the DRF view, validators included"""
+        url = reverse('order:retrieve-update-order-status',
+                      args=[self.order.id])
+
+        res = self.call(url)
+
+        expected = self.client.get(url)
+        self.assertSameResponse(res, expected)
+        self.assertEqual(res['ETag'], expected['ETag'])
+        self.assertEqual(res['Last-Modified'], expected['Last-Modified'])
+        self.assertEqual(json.loads(res.content)['status'], 'In Process')
+
+    def test_served_by_async_view(self):
+        """Test the async handler does not call the DRF view for reads"""
+        url = reverse('order:retrieve-update-order-status',
+                      args=[self.order.id])
+
+        with patch.object(OrderRetrieveUpdateStatusView, 'retrieve',
+                          side_effect=AssertionError):
+            res = self.call(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_order_status_not_modified(self):
+        """Test an unchanged status is answered with 304"""
+        url = reverse('order:retrieve-update-order-status',
+                      args=[self.order.id])
+        etag = self.client.get(url)['ETag']
+
+        res = self.call(url, headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_order_status_not_found(self):
+        """Test a missing order gets the DRF 404 body"""
+        url = reverse('order:retrieve-update-order-status', args=[0])
+
+        res = self.call(url)
+
+        self.assertSameResponse(res, self.client.get(url))
+
+    def test_order_status_update_falls_back(self):
+        """Test a status update is handed to the DRF view"""
+        url = reverse('order:retrieve-update-order-status',
+                      args=[self.order.id])
+
+        res = self.call(url, method='put',
+                        data={'status': constants.OUT_FOR_DELIVERY})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, constants.OUT_FOR_DELIVERY)
+
+    def test_authentication_required(self):
+        """Test missing and invalid tokens are refused like DRF does"""
+        url = reverse('user:me')
+
+        for auth in ('', 'Token invalid', 'Token two words'):
+            res = self.call(url, headers={'Authorization': auth})
+
+            expected = APIClient().get(url, HTTP_AUTHORIZATION=auth)
+            self.assertSameResponse(res, expected)
+            self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    def test_throttled_like_drf(self):
+        """Test the async views check the throttles of the DRF view"""
+        url = reverse('order:retrieve-update-order-status',
+                      args=[self.order.id])
+        rates = dict(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'],
+                     order_status='2/min')
+
+        with override_settings(REST_FRAMEWORK=dict(
+            settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=rates
+        )):
+            statuses = [self.call(url).status_code for _ in range(2)]
+            res = self.call(url)
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 2)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '30')
+        self.assertIn('throttled', json.loads(res.content)['detail'])
+
+    def test_list_throttled_once(self):
+        """Test the async list takes one token, like the DRF view"""
+        url = reverse('order:order-list')
+        rates = dict(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'],
+                     orders='2/min')
+
+        with override_settings(REST_FRAMEWORK=dict(
+            settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=rates
+        )):
+            statuses = [self.call(url).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 2 +
+                         [status.HTTP_429_TOO_MANY_REQUESTS])
+
+    def test_inactive_user_refused(self):
+        """Test a cached token of a deactivated user is refused"""
+        url = reverse('user:me')
+        self.call(url)
+        self.user.is_active = False
+        self.user.save()
+        get_token_cache().clear()
+
+        res = self.call(url)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile(self):
+        """Test the profile matches the DRF view"""
+        url = reverse('user:me')
+
+        res = self.call(url)
+
+        self.assertSameResponse(res, self.client.get(url))
+
+    def test_order_list(self):
+        """Test the order list matches the DRF view"""
+        url = reverse('order:order-list')
+
+        res = self.call(url)
+
+        self.assertSameResponse(res, self.client.get(url))
+        self.assertEqual(json.loads(res.content)['results'][0]['id'],
+                         self.order.id)
+
+    def test_browsable_api_falls_back(self):
+        """Test HTML is still rendered by the DRF view"""
+        url = reverse('user:me')
+
+        res = self.call(url, headers={'Accept': 'text/html'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('text/html', res['Content-Type'])
+
+
+class RunSyncTests(TransactionTestCase):
+    """Test offloading blocking work to the bounded pool"""
+
+    def test_pool_bounds_concurrency(self):
+        """Test no more jobs run at once than the pool has threads"""
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def job():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        async def run_all():
+            await asyncio.gather(*[concurrency.run_sync(job)
+                                   for _ in range(6)])
+
+        with patch.object(concurrency, '_executor', ThreadPoolExecutor(2)):
+            async_to_sync(run_all)()
+
+        self.assertEqual(peak[0], 2)
@@ -1,8 +1,17 @@
+import json
+from io import StringIO
 from unittest.mock import patch
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.bench import percentile, summarize
+from core.management.commands import seed_data
+from core.models import Detail, Order, SalesRollup
 
 
 class CommandTests(TestCase):
@@ -21,3 +30,185 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+
+class BenchCommandTests(TestCase):
+    """Test the API benchmark"""
+
+    def test_bench_reports_json(self):
+        """Test a run reports every operation and cleans up after itself"""
+        out = StringIO()
+        call_command('bench', users=2, orders=2, details=1, requests=60,
+                     workers=1, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['count'], 60)
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(report['run']['database'], connection.vendor)
+        self.assertEqual(set(report['operations']),
+                         {'create', 'list', 'details', 'token', 'poll',
+                          'update'})
+        for operation in report['operations'].values():
+            self.assertIsNotNone(operation['latency_ms']['p99'])
+            self.assertGreater(operation['queries_per_request'], 0)
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(SalesRollup.objects.exclude(pizzas=0).exists())
+
+    def test_bench_mix(self):
+        """Test the mix restricts the operations replayed"""
+        out = StringIO()
+        call_command('bench', '--mix=poll=1,update=1', users=1, orders=1,
+                     requests=10, workers=1, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertLessEqual(set(report['operations']), {'poll', 'update'})
+
+    def test_bench_not_throttled(self):
+        """Test the in-process run is not cut short by the throttles"""
+        rates = dict(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'],
+                     token='1/min')
+        out = StringIO()
+        with override_settings(REST_FRAMEWORK=dict(
+            settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=rates
+        )):
+            call_command('bench', '--mix=token=1', users=1, orders=1,
+                         requests=5, workers=1, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(report['throttled'], 0)
+
+    def test_summarize_throttled(self):
+        """Test throttled requests are not counted as errors"""
+        summary = summarize([('token', 200, 0.1, 1), ('token', 429, 0.1, 0),
+                             ('token', 500, 0.1, 1)])
+
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(summary['throttled'], 1)
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+
+class BenchThrottleCommandTests(TestCase):
+    """Test the throttle check microbenchmark"""
+
+    def test_reports_cost_per_check(self):
+        """Test each store and the DRF throttle are timed"""
+        out = StringIO()
+        call_command('bench_throttle', checks=2000, clients=10, threads=2,
+                     cache='default', stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            [(result['store'], result['level'])
+             for result in report['results']],
+            [('local', 'store'), ('cache', 'store'),
+             ('configured', 'throttle')]
+        )
+        for result in report['results']:
+            self.assertGreater(result['us_per_check'], 0)
+
+
+class BenchConnectionsCommandTests(TransactionTestCase):
+    """Test the WSGI and ASGI connection capacity benchmark"""
+
+    def test_reports_each_handler_and_level(self):
+        """Test every handler serves every connection without errors"""
+        out = StringIO()
+        call_command('bench_connections', '--connections=1,4', users=2,
+                     orders=1, requests=2, client_delay=1, threads=2,
+                     stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            [(result['handler'], result['connections'])
+             for result in report['results']],
+            [('wsgi', 1), ('asgi', 1), ('wsgi', 4), ('asgi', 4)]
+        )
+        for result in report['results']:
+            self.assertEqual(result['count'], result['connections'] * 2)
+            self.assertEqual(result['errors'], 0)
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class SeedDataCommandTests(TestCase):
+    """Test the synthetic data generator"""
+
+    def seed(self, **options):
+        call_command('seed_data', stdout=StringIO(), **options)
+
+    def snapshot(self):
+        """Return the seeded rows without their ids and timestamps"""
+        users = list(get_user_model().objects.order_by('id').values_list(
+            'name', 'password'
+        ))
+        orders = list(Order.objects.order_by('id').values_list(
+            'status', 'status_version', 'phone', 'total'
+        ))
+        details = list(Detail.objects.order_by('id').values_list(
+            'order__status', 'flavour', 'size', 'quantity'
+        ))
+        return users, orders, details
+
+    def test_seed_data(self):
+        """Test users, orders and line items are inserted"""
+        self.seed(users=3, orders=10, details=2, batch_size=2)
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertEqual(
+            sorted(Order.objects.values_list('user__email', flat=True)
+                   .distinct().order_by()),
+            sorted(get_user_model().objects.values_list('email',
+                                                        flat=True))
+        )
+        self.assertEqual(Order.objects.count(), 10)
+        self.assertEqual(Detail.objects.filter(order=None).count(), 6)
+        self.assertFalse(Order.objects.filter(detail=None).exists())
+        self.assertTrue(get_user_model().objects.first().check_password(
+            'password'
+        ))
+        self.assertEqual(
+            sum(SalesRollup.objects.values_list('pizzas', flat=True)),
+            sum(Detail.objects.exclude(order=None).values_list(
+                'quantity', flat=True
+            ))
+        )
+
+    def test_seed_is_deterministic(self):
+        """Test the same seed gives the same rows in any batch size"""
+        self.seed(users=4, orders=9, seed=7, batch_size=3)
+        first = self.snapshot()
+        get_user_model().objects.all().delete()
+
+        self.seed(users=4, orders=9, seed=7, batch_size=1)
+
+        self.assertEqual(self.snapshot(), first)
+
+    def test_seed_orders_in_batches(self):
+        """Test orders of a few users are split in bounded batches"""
+        with patch.object(seed_data, 'seed_orders',
+                          wraps=seed_data.seed_orders) as seed_orders:
+            self.seed(users=1, orders=7, batch_size=3)
+
+        self.assertEqual(
+            [call.args[1:] for call in seed_orders.call_args_list],
+            [(0, 3), (3, 6), (6, 7)]
+        )
+        self.assertEqual(Order.objects.count(), 7)
+
+    def test_ids_continue_after_seed(self):
+        """Test new rows get ids after the seeded ones"""
+        self.seed(users=2, orders=2, no_rollups=True)
+
+        user = get_user_model().objects.create_user('new@mahsa.com', 'p')
+
+        self.assertGreater(user.id, get_user_model().objects.exclude(
+            id=user.id
+        ).latest('id').id)
@@ -0,0 +1,173 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, \
+    override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import constants
+from core.metrics import REGISTRY, Counter, Histogram, MmapedValues, \
+    Registry, read_values
+
+METRICS_URL = reverse('metrics')
+ORDER_URL = reverse('order:order-list')
+
+
+def status_url(order_id):
+    """Return order status URL"""
+    return reverse('order:retrieve-update-order-status', args=[order_id])
+
+
+def samples(text):
+    """Return the samples of an exposition by name and labels"""
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            values[name] = float(value)
+    return values
+
+
+class MetricsApiTests(TestCase):
+    """Test the metrics recorded for the API"""
+
+    def setUp(self):
+        REGISTRY.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def get_metrics(self):
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res['Content-Type'],
+                         'text/plain; version=0.0.4; charset=utf-8')
+        return samples(res.content.decode())
+
+    def test_request_metrics(self):
+        """Test requests are counted and timed by route name"""
+        self.client.get(ORDER_URL)
+        self.client.get(ORDER_URL)
+        self.client.get('/nowhere')
+
+        values = self.get_metrics()
+
+        self.assertEqual(values[
+            'http_requests_total{route="order:order-list",method="GET",'
+            'status="200"}'
+        ], 2)
+        self.assertEqual(values[
+            'http_requests_total{route="unmatched",method="GET",'
+            'status="404"}'
+        ], 1)
+        self.assertEqual(values[
+            'http_request_duration_seconds_count{route="order:order-list",'
+            'method="GET"}'
+        ], 2)
+        self.assertEqual(values[
+            'http_request_db_queries_bucket{route="order:order-list",'
+            'le="+Inf"}'
+        ], 2)
+        self.assertGreater(values[
+            'http_request_db_queries_sum{route="order:order-list"}'
+        ], 0)
+
+
+class OrderMetricsTests(TransactionTestCase):
+    """Test the metrics of the order pipeline"""
+
+    def setUp(self):
+        REGISTRY.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_order_metrics(self):
+        """Test committed orders and status transitions are counted"""
+        res = self.client.post(ORDER_URL, {
+            'name': 'pizza', 'phone': '9395679312', 'address': 'address',
+        })
+        self.client.put(status_url(res.data['id']),
+                        {'status': constants.IN_PROCESS})
+
+        values = samples(self.client.get(METRICS_URL).content.decode())
+
+        self.assertEqual(values['orders_created_total'], 1)
+        self.assertEqual(values[
+            'order_status_transitions_total{from_status="Received",'
+            'to_status="In Process"}'
+        ], 1)
+
+
+class RegistryTests(TestCase):
+    """Test the metrics registry"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_histogram_exposition(self):
+        """Test histograms expose cumulative buckets, sum and count"""
+        registry = Registry()
+        histogram = Histogram('latency', 'Latency', ['route'],
+                              registry=registry, buckets=(1, 5))
+        for value in (0.5, 2, 10):
+            histogram.observe(value, route='a')
+
+        self.assertEqual(registry.expose(), '\n'.join([
+            '# HELP latency Latency',
+            '# TYPE latency histogram',
+            'latency_bucket{route="a",le="1.0"} 1.0',
+            'latency_bucket{route="a",le="5.0"} 2.0',
+            'latency_bucket{route="a",le="+Inf"} 3.0',
+            'latency_sum{route="a"} 12.5',
+            'latency_count{route="a"} 3.0',
+        ]) + '\n')
+
+    def test_labels_checked(self):
+        """Test metrics must be given exactly their labels"""
+        counter = Counter('hits', 'Hits', ['route'], registry=Registry())
+
+        with self.assertRaises(ValueError):
+            counter.inc(path='/')
+        with self.assertRaises(ValueError):
+            counter.inc(-1, route='a')
+
+    def test_mmaped_values_grow_and_reopen(self):
+        """Test a values file grows and keeps its values when reopened"""
+        path = os.path.join(self.directory, 'metrics_1.db')
+        values = MmapedValues(path, initial_size=64)
+        for i in range(100):
+            values.add('key-{}'.format(i), i)
+        values.add('key-1', 1)
+
+        self.assertEqual(dict(read_values(path))['key-99'], 99)
+        self.assertEqual(dict(MmapedValues(path).items())['key-1'], 2)
+
+    def test_processes_aggregated(self):
+        """Test the values of every process are summed"""
+        registry = Registry()
+        counter = Counter('hits', 'Hits', registry=registry)
+
+        with override_settings(METRICS_MULTIPROC_DIR=self.directory):
+            counter.inc()
+            pid = os.fork()
+            if not pid:
+                try:
+                    counter.inc(2)
+                finally:
+                    os._exit(0)
+            os.waitpid(pid, 0)
+            counter.inc()
+
+            self.assertEqual(len(os.listdir(self.directory)), 2)
+            self.assertIn('hits_total 4.0', registry.expose())
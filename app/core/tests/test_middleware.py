@@ -0,0 +1,88 @@
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Detail, Order
+
+ORDER_URL = reverse('order:order-list')
+
+
+def timing_settings(**config):
+    return override_settings(REQUEST_TIMING=dict({'ENABLED': True}, **config))
+
+
+def server_timing(response):
+    """Return the Server-Timing metrics of a response by name"""
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    """Test the per-request timing middleware"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        order = Order.objects.create(user=self.user, phone='9395679312',
+                                     address='address')
+        Detail.objects.create(user=self.user, order=order)
+
+    def get_orders(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.get(ORDER_URL)
+
+    @timing_settings()
+    def test_server_timing_header(self):
+        """Test every phase is reported in the Server-Timing header"""
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            res = self.get_orders()
+
+        metrics = server_timing(res)
+        self.assertEqual(list(metrics),
+                         ['db', 'view', 'serialize', 'render', 'total'])
+        self.assertEqual(metrics['db']['desc'], '"2 queries"')
+        for metric in metrics.values():
+            self.assertGreaterEqual(float(metric['dur']), 0)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], ORDER_URL)
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['db_queries'], 2)
+        self.assertFalse(record['slow'])
+
+    @timing_settings(SAMPLE_RATE=0, SLOW_REQUEST_MS=0)
+    def test_unsampled_slow_request_logged(self):
+        """Test slow requests are logged even when not sampled"""
+        with self.assertLogs('core.timing', 'WARNING') as logs:
+            res = self.get_orders()
+
+        self.assertNotIn('Server-Timing', res)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertTrue(record['slow'])
+        self.assertNotIn('db_queries', record)
+
+    @timing_settings(SAMPLE_RATE=0)
+    def test_unsampled_request_not_logged(self):
+        """Test fast requests left out of the sample are not reported"""
+        with patch('core.middleware.logger') as logger:
+            res = self.get_orders()
+
+        self.assertNotIn('Server-Timing', res)
+        logger.log.assert_not_called()
+
+    def test_disabled(self):
+        """Test the middleware is left out when disabled"""
+        res = self.get_orders()
+
+        self.assertNotIn('Server-Timing', res)
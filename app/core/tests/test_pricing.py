@@ -0,0 +1,128 @@
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from core.models import Detail, Order, Price
+from core.pricing import PriceCatalog, backfill_totals, catalog
+
+
+class PriceCatalogTests(TestCase):
+    """Test the in-memory price catalog"""
+
+    def setUp(self):
+        catalog.invalidate()
+        Price.objects.create(version=1, flavour=1, size=1, amount='10.00')
+        Price.objects.create(version=1, flavour=1, size=2, amount='12.50')
+
+    def test_price_lookup(self):
+        """Test prices are looked up by flavour and size"""
+        self.assertEqual(catalog.price(1, 2), Decimal('12.50'))
+        self.assertEqual(catalog.price(2, 1), Decimal(0))
+        self.assertEqual(catalog.version, 1)
+
+    def test_later_version_overrides(self):
+        """Test a newer version replaces only the prices it lists"""
+        Price.objects.create(version=2, flavour=1, size=1, amount='11.00')
+
+        self.assertEqual(catalog.price(1, 1), Decimal('11.00'))
+        self.assertEqual(catalog.price(1, 2), Decimal('12.50'))
+        self.assertEqual(catalog.version, 2)
+
+    def test_total(self):
+        """Test the total of a list of items"""
+        total, version = catalog.total([(1, 1, 2), (1, 2, 1), (3, 3, 5)])
+
+        self.assertEqual(total, Decimal('32.50'))
+        self.assertEqual(version, 1)
+
+    def test_lookup_does_not_query(self):
+        """Test a loaded catalog answers from memory"""
+        catalog.price(1, 1)
+
+        with self.assertNumQueries(0):
+            catalog.total([(1, 1, 1)] * 100)
+
+    def test_change_refreshes_catalog(self):
+        """Test saving or deleting a price reloads the catalog"""
+        price = Price.objects.get(flavour=1, size=1)
+        catalog.price(1, 1)
+
+        price.amount = Decimal('9.00')
+        price.save()
+        self.assertEqual(catalog.price(1, 1), Decimal('9.00'))
+
+        price.delete()
+        self.assertEqual(catalog.price(1, 1), Decimal(0))
+
+    @override_settings(PRICE_CATALOG_TTL=60)
+    def test_catalog_expires(self):
+        """Test the catalog is reloaded once its TTL has passed"""
+        local = PriceCatalog()
+        with patch('core.pricing.time.monotonic', return_value=0):
+            local.price(1, 1)
+        Price.objects.filter(flavour=1, size=1).update(amount='20.00')
+
+        with patch('core.pricing.time.monotonic', return_value=59):
+            self.assertEqual(local.price(1, 1), Decimal('10.00'))
+        with patch('core.pricing.time.monotonic', return_value=60):
+            self.assertEqual(local.price(1, 1), Decimal('20.00'))
+
+
+class BackfillTotalsTests(TestCase):
+    """Test pricing the orders stored without a total"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('test@mahsa.com',
+                                                    'testpass')
+        self.orders = []
+        for quantity in (1, 2, 1):
+            order = Order.objects.create(user=user, phone='9395679312',
+                                         address='address')
+            Detail.objects.create(order=order, user=user, flavour=1, size=1,
+                                  quantity=quantity)
+            Detail.objects.create(order=order, user=user, flavour=1, size=2,
+                                  quantity=1)
+            self.orders.append(order)
+        self.priced = Order.objects.create(user=user, phone='9395679312',
+                                           address='address', total='99.00',
+                                           price_version=1)
+        Price.objects.create(version=1, flavour=1, size=1, amount='10.00')
+        Price.objects.create(version=2, flavour=1, size=2, amount='12.50')
+
+    def test_backfill_totals(self):
+        """Test unpriced orders are priced in batches, others kept"""
+        prices = {(1, 1): Decimal('10.00'), (1, 2): Decimal('12.50')}
+
+        count = backfill_totals(Order.objects.all(), prices, 2, batch_size=2)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            list(Order.objects.order_by('id').values_list(
+                'total', 'price_version'
+            )),
+            [(Decimal('22.50'), 2), (Decimal('32.50'), 2),
+             (Decimal('22.50'), 2), (Decimal('99.00'), 1)]
+        )
+        self.assertGreater(Order.objects.get(id=self.orders[0].id)
+                           .updated_at, self.orders[0].updated_at)
+
+    def test_backfill_totals_command(self):
+        """Test the command prices orders with the current catalog"""
+        out = StringIO()
+        call_command('backfill_totals', stdout=out)
+
+        self.assertIn('Priced 3 orders with catalog version 2',
+                      out.getvalue())
+        self.assertEqual(Order.objects.get(id=self.orders[1].id).total,
+                         Decimal('32.50'))
+
+    def test_backfill_totals_without_prices(self):
+        """Test the command refuses to price with an empty catalog"""
+        Price.objects.all().delete()
+
+        with self.assertRaises(CommandError):
+            call_command('backfill_totals', stdout=StringIO())
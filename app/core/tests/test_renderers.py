@@ -0,0 +1,113 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipIf
+from unittest.mock import patch
+from uuid import UUID
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.models import Order
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+PAYLOAD = {
+    'id': 7,
+    'name': 'pizza\u2028pepperoni\u2029é',
+    'total': Decimal('12.50'),
+    'created_at': datetime(2024, 5, 1, 12, 30, 15, 123456,
+                           tzinfo=timezone(timedelta(hours=3, minutes=30))),
+    'delivered_on': date(2024, 5, 2),
+    'ratio': 0.1,
+    'status': gettext_lazy('Delivered'),
+    'token': UUID('12345678123456781234567812345678'),
+    'sizes': {1: 'small', 2: 'medium'},
+    'detail': [{'flavour': 1, 'size': 2, 'quantity': 3, 'paid': True,
+                'note': None}],
+}
+
+
+@skipIf(renderers.orjson is None, 'orjson is not installed')
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the fast renderer renders like JSONRenderer"""
+
+    def assertRendersSame(self, data, accepted_media_type=None, context=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type, context),
+            JSONRenderer().render(data, accepted_media_type, context)
+        )
+
+    def test_render_same(self):
+        """Test datetimes, decimals, lazy strings and separators"""
+        self.assertRendersSame(PAYLOAD)
+        self.assertRendersSame([PAYLOAD, PAYLOAD])
+        self.assertRendersSame(None)
+
+    def test_render_indent(self):
+        """Test indented output is left to JSONRenderer"""
+        self.assertRendersSame(PAYLOAD, 'application/json; indent=2')
+        self.assertRendersSame(PAYLOAD, None, {'indent': 4})
+
+    def test_render_big_int(self):
+        """Test integers orjson refuses are rendered by the stdlib"""
+        self.assertRendersSame({'id': 2 ** 70})
+
+    def test_render_without_orjson(self):
+        """Test JSONRenderer output without orjson"""
+        with patch.object(renderers, 'orjson', None):
+            self.assertRendersSame(PAYLOAD)
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Test the fast parser parses like JSONParser"""
+
+    def parse(self, body):
+        return FastJSONParser().parse(BytesIO(body))
+
+    def test_parse(self):
+        """Test a body parses the same"""
+        body = JSONRenderer().render(PAYLOAD)
+
+        self.assertEqual(self.parse(body),
+                         JSONParser().parse(BytesIO(body)))
+
+    def test_parse_invalid(self):
+        """Test invalid JSON, NaN included, is a parse error"""
+        for body in (b'{"name": ', b'{"total": NaN}', b'[Infinity]',
+                     b'\xff'):
+            with self.assertRaises(ParseError):
+                self.parse(body)
+
+    def test_parse_other_charset(self):
+        """Test bodies in other charsets are left to JSONParser"""
+        body = '{"name": "café"}'.encode('latin-1')
+
+        self.assertEqual(
+            FastJSONParser().parse(BytesIO(body),
+                                   parser_context={'encoding': 'latin-1'}),
+            {'name': 'café'}
+        )
+
+
+class BenchRenderersCommandTests(TestCase):
+    """Test the renderer benchmark"""
+
+    def test_bench_renderers(self):
+        """Test both payloads render identically and seeds are removed"""
+        out = StringIO()
+        call_command('bench_renderers', orders=5, repeat=1, stdout=out)
+
+        results = json.loads(out.getvalue())['results']
+        self.assertEqual(results['retrieve']['payloads'], 5)
+        self.assertEqual(results['list']['payloads'], 1)
+        for result in results.values():
+            self.assertTrue(result['identical'])
+        self.assertFalse(Order.objects.exists())
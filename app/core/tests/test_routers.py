@@ -0,0 +1,151 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, \
+    override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Order
+
+ROUTING = {'REPLICAS': ['replica'], 'STICKY_SECONDS': 60}
+# A replica of its own, rather than a test mirror of the primary
+SEPARATE_REPLICA = (
+    'replica' in settings.DATABASES and
+    not settings.DATABASES['replica'].get('TEST', {}).get('MIRROR')
+)
+
+
+def status_url(order_id):
+    return reverse('order:retrieve-update-order-status', args=[order_id])
+
+
+@override_settings(REPLICA_ROUTING=ROUTING)
+class ReplicaRoutingMiddlewareTests(TestCase):
+    """Test which database the reads of a request go to"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.seen = {}
+        self.response_status = status.HTTP_200_OK
+
+    def get_response(self, request):
+        self.seen['order'] = router.db_for_read(Order)
+        self.seen['token'] = router.db_for_read(Token)
+        self.seen['write'] = router.db_for_write(Order)
+        return HttpResponse(status=self.response_status)
+
+    def send(self, request):
+        return ReplicaRoutingMiddleware(self.get_response)(request)
+
+    def test_safe_request_reads_replica(self):
+        """Test a GET of an order view reads from the replica"""
+        self.send(self.factory.get(status_url(1)))
+
+        self.assertEqual(self.seen, {'order': 'replica', 'token': 'default',
+                                     'write': 'default'})
+        self.assertEqual(router.db_for_read(Order), 'default')
+
+    def test_other_apps_read_primary(self):
+        """Test views outside the routed apps read from the primary"""
+        self.send(self.factory.get(reverse('metrics')))
+
+        self.assertEqual(self.seen['order'], 'default')
+
+    def test_write_pins_client(self):
+        """Test a write pins its token and cookie to the primary"""
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+
+        response = self.send(self.factory.post(reverse('order:order-list'),
+                                               **auth))
+
+        self.assertEqual(self.seen['order'], 'default')
+        self.assertEqual(response.cookies['primary_pin']['max-age'], 60)
+        self.send(self.factory.get(status_url(1), **auth))
+        self.assertEqual(self.seen['order'], 'default')
+        self.send(self.factory.get(status_url(1),
+                                   HTTP_AUTHORIZATION='Token other'))
+        self.assertEqual(self.seen['order'], 'replica')
+
+    def test_pin_cookie_reads_primary(self):
+        """Test a client holding the pin cookie reads from the primary"""
+        request = self.factory.get(status_url(1))
+        request.COOKIES['primary_pin'] = '1'
+
+        self.send(request)
+
+        self.assertEqual(self.seen['order'], 'default')
+
+    def test_failed_write_does_not_pin(self):
+        """Test a rejected write leaves the client on the replicas"""
+        self.response_status = status.HTTP_400_BAD_REQUEST
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+
+        response = self.send(self.factory.post(reverse('order:order-list'),
+                                               **auth))
+
+        self.assertNotIn('primary_pin', response.cookies)
+        self.send(self.factory.get(status_url(1), **auth))
+        self.assertEqual(self.seen['order'], 'replica')
+
+    @override_settings(REPLICA_ROUTING={'REPLICAS': []})
+    def test_unused_without_replicas(self):
+        """Test the middleware stays out without replicas"""
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaRoutingMiddleware(self.get_response)
+
+
+@skipUnless(SEPARATE_REPLICA,
+            'Needs a separate replica database, such as with DB_SQLITE_DIR')
+@override_settings(REPLICA_ROUTING=ROUTING)
+class ReplicaReadsTests(TransactionTestCase):
+    """Test reads against a replica that lags behind the primary"""
+    databases = {'default', 'replica'} if SEPARATE_REPLICA else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com', 'testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.order = Order.objects.create(user=self.user, phone='1',
+                                          address='address')
+
+    def client_for(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        return client
+
+    def test_reads_go_to_replica(self):
+        """Test an order missing from the replica is not found"""
+        res = self.client_for().get(status_url(self.order.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reads_own_writes(self):
+        """Test a client that wrote reads its order from the primary"""
+        writer = self.client_for()
+        res = writer.post(reverse('order:order-list'), {
+            'name': 'pizza', 'phone': '1', 'address': 'address'
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        order_id = res.data['id']
+
+        self.assertEqual(writer.get(status_url(order_id)).status_code,
+                         status.HTTP_200_OK)
+        # Pinned by token without the cookie, until the pin expires
+        self.assertEqual(self.client_for().get(status_url(order_id))
+                         .status_code, status.HTTP_200_OK)
+        cache.clear()
+        self.assertEqual(self.client_for().get(status_url(order_id))
+                         .status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.throttling import LocalBucketStore, parse_rate, refill
+
+TOKEN_URL = reverse('user:token')
+ORDER_URL = reverse('order:order-list')
+
+
+def throttle_rates(**rates):
+    """Override some throttle rates, which also empties the buckets"""
+    return override_settings(REST_FRAMEWORK=dict(
+        settings.REST_FRAMEWORK,
+        DEFAULT_THROTTLE_RATES=dict(
+            settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates
+        )
+    ))
+
+
+def status_url(order_id):
+    return reverse('order:retrieve-update-order-status', args=[order_id])
+
+
+class TokenBucketTests(TestCase):
+    """Test the token bucket arithmetic and the in-process store"""
+
+    def test_parse_rate(self):
+        """Test DRF rates become a refill rate and a capacity"""
+        self.assertEqual(parse_rate('10/s'), (10, 10))
+        self.assertEqual(parse_rate('120/min'), (2, 120))
+        self.assertEqual(parse_rate('36/hour'), (0.01, 36))
+
+    def test_refill(self):
+        """Test buckets refill with time up to their capacity"""
+        self.assertEqual(refill((0, 0), 0.5, 2, 5), ((0, 0.5), 0))
+        self.assertEqual(refill((4, 0), 10, 2, 5), ((4, 10), 0))
+        bucket, wait = refill((0.5, 0), 0, 2, 5)
+        self.assertEqual(bucket, (0.5, 0))
+        self.assertEqual(wait, 0.25)
+
+    def test_store_takes_up_to_capacity(self):
+        """Test a client gets its burst, then waits, others do not"""
+        store = LocalBucketStore(shards=4, max_size=100)
+
+        waits = [store.take('a', 1, 3) for _ in range(4)]
+
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertGreater(waits[3], 0.9)
+        self.assertEqual(store.take('b', 1, 3), 0)
+
+    def test_store_forgets_least_recent_clients(self):
+        """Test each shard keeps a bounded number of buckets"""
+        store = LocalBucketStore(shards=1, max_size=2)
+        for key in ('a', 'b', 'c'):
+            store.take(key, 1, 1)
+
+        self.assertEqual(list(store._shards[0].buckets), ['b', 'c'])
+
+
+class ThrottleApiTests(TestCase):
+    """Test the order and user views are throttled per client"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        return client
+
+    @throttle_rates(order_status='2/min')
+    def test_status_throttled_per_token(self):
+        """Test a flooding token is refused while others are served"""
+        order_id = self.client_for(self.user).post(ORDER_URL, {
+            'name': 'pizza', 'phone': '1', 'address': 'address'
+        }).data['id']
+        client = self.client_for(self.user)
+        other = self.client_for(get_user_model().objects.create_user(
+            'other@mahsa.com',
+            'password123'
+        ))
+
+        statuses = [client.get(status_url(order_id)).status_code
+                    for _ in range(3)]
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 2 +
+                         [status.HTTP_429_TOO_MANY_REQUESTS])
+        res = client.get(status_url(order_id))
+        self.assertEqual(res['Retry-After'], '30')
+        self.assertEqual(other.get(status_url(order_id)).status_code,
+                         status.HTTP_200_OK)
+        # Another scope has a bucket of its own
+        self.assertEqual(client.get(ORDER_URL).status_code,
+                         status.HTTP_200_OK)
+
+    @throttle_rates(token='3/hour')
+    def test_token_throttled_per_address(self):
+        """Test logins are throttled by client address"""
+        payload = {'email': 'test@mahsa.com', 'password': 'testpass'}
+
+        statuses = [APIClient().post(TOKEN_URL, payload).status_code
+                    for _ in range(4)]
+        res = APIClient().post(TOKEN_URL, payload,
+                               REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 3 +
+                         [status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @throttle_rates(orders=None)
+    def test_scope_without_rate_not_throttled(self):
+        """Test removing a rate turns its throttle off"""
+        client = self.client_for(self.user)
+
+        for _ in range(5):
+            self.assertEqual(client.get(ORDER_URL).status_code,
+                             status.HTTP_200_OK)
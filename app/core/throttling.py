@@ -0,0 +1,180 @@
+"""
+Token bucket throttling.
+
+Each client gets a bucket per throttle scope, holding up to a period's
+worth of requests of the scope's rate in `DEFAULT_THROTTLE_RATES` and
+refilled continuously at that rate. A request takes a token, or is
+answered 429 with the seconds until the next token in `Retry-After`.
+Clients are told apart by their token, then by their user, then by
+their address.
+
+Buckets live in process, in shards with a lock each, unless
+`THROTTLE_STORE` names a Django cache shared between workers. Checking
+a bucket is O(1) either way, see `manage.py bench_throttle`.
+"""
+import functools
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    'CACHE_ALIAS': None,
+    'SHARDS': 64,
+    'MAX_SIZE': 100000,
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Return the refill rate per second and capacity of a DRF rate such
+    as `100/min`
+    """
+    num, period = rate.split('/')
+    num = int(num)
+    return num / float(PERIODS[period[0]]), num
+
+
+def refill(bucket, now, rate, capacity):
+    """
+    Return the bucket, `(tokens, timestamp)`, after taking a token at
+    `now`, and the seconds to wait for one when there was none
+    """
+    tokens, stamp = bucket
+    tokens = min(capacity, tokens + max(now - stamp, 0) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / rate
+
+
+class _Shard(object):
+    __slots__ = ('lock', 'buckets')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+
+class LocalBucketStore(object):
+    """
+    In-process buckets spread over shards, so concurrent checks of
+    different clients rarely wait on the same lock. Each shard forgets
+    its least recently used buckets, which are full again by then.
+    """
+
+    def __init__(self, shards, max_size):
+        self._shards = [_Shard() for _ in range(shards)]
+        self.max_size = max(max_size // shards, 1)
+
+    def take(self, key, rate, capacity):
+        """Take a token and return 0, or the seconds to wait for one"""
+        now = time.monotonic()
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            buckets = shard.buckets
+            bucket, wait = refill(buckets.get(key, (capacity, now)), now,
+                                  rate, capacity)
+            buckets[key] = bucket
+            buckets.move_to_end(key)
+            if len(buckets) > self.max_size:
+                buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.buckets.clear()
+
+
+class SharedBucketStore(object):
+    """
+    Buckets in a Django cache shared between workers. Concurrent checks
+    of one client may both take the last token, so a client can exceed
+    its rate by the number of workers at most.
+    """
+    prefix = 'throttle:'
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, rate, capacity):
+        now = time.time()
+        key = self.prefix + key
+        bucket, wait = refill(self.cache.get(key, (capacity, now)), now,
+                              rate, capacity)
+        # Kept until it would be full again
+        self.cache.set(key, bucket,
+                       math.ceil((capacity - bucket[0]) / rate) + 1)
+        return wait
+
+
+_bucket_store = None
+
+
+def get_bucket_store():
+    """Return the bucket store configured by `THROTTLE_STORE`"""
+    global _bucket_store
+    if _bucket_store is None:
+        options = dict(DEFAULTS, **getattr(settings, 'THROTTLE_STORE', {}))
+        if options['CACHE_ALIAS']:
+            _bucket_store = SharedBucketStore(options['CACHE_ALIAS'])
+        else:
+            _bucket_store = LocalBucketStore(options['SHARDS'],
+                                             options['MAX_SIZE'])
+    return _bucket_store
+
+
+@receiver(setting_changed)
+def reload_bucket_store(*args, **kwargs):
+    global _bucket_store
+    if kwargs['setting'] in ('THROTTLE_STORE', 'REST_FRAMEWORK'):
+        _bucket_store = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle each client of a view to the rate of the view's
+    `throttle_scope`. Views without a scope, or whose scope has no
+    rate, are not throttled.
+    """
+    scope_attr = 'throttle_scope'
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_client(self, request):
+        token = getattr(request.auth, 'key', None)
+        if token:
+            return 'token:' + token
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return 'user:{}'.format(user.pk)
+        return 'addr:' + self.get_ident(request)
+
+    def get_rate(self, scope):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+    def allow_request(self, request, view):
+        scope = getattr(view, self.scope_attr, None)
+        rate = scope and self.get_rate(scope)
+        if not rate:
+            return True
+        self.wait_seconds = get_bucket_store().take(
+            '{}:{}'.format(scope, self.get_client(request)),
+            *parse_rate(rate)
+        )
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
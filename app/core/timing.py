@@ -0,0 +1,122 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_timings', default=None)
+_query_counter = ContextVar('query_counter', default=None)
+
+
+class RequestTimings(object):
+    """Time spent in each phase of one request, in seconds"""
+
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self._started = {}
+        self._depth = {}
+
+    def start(self, name):
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        if not depth:
+            self._started[name] = time.perf_counter()
+
+    def stop(self, name):
+        depth = self._depth.get(name, 0) - 1
+        if depth < 0:
+            return
+        self._depth[name] = depth
+        if not depth:
+            self.add(name, time.perf_counter() - self._started.pop(name))
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+
+class QueryCounter(object):
+    """Number of database queries of one request"""
+
+    def __init__(self):
+        self.count = 0
+
+
+def activate(timings):
+    """Collect timings of the current request into `timings`"""
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def count_queries(counter):
+    """Count the queries of the current request into `counter`"""
+    return _query_counter.set(counter)
+
+
+def stop_counting(token):
+    _query_counter.reset(token)
+
+
+def observe_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper installed on every connection, feeding the
+    query counter and timings of the current request.
+
+    The request is found through context variables rather than through
+    wrappers installed per request, because an async request runs its
+    queries on connections of other threads.
+    """
+    counter, timings = _query_counter.get(), _current.get()
+    if counter is None and timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if counter is not None:
+            counter.count += 1
+        if timings is not None:
+            timings.queries += 1
+            timings.add('db', time.perf_counter() - start)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to `name` for the current request.
+    Nested blocks of the same name are only counted once.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    timings.start(name)
+    try:
+        yield
+    finally:
+        timings.stop(name)
+
+
+class TimedSerializerMixin(object):
+    """Time validation and representation as the `serialize` phase"""
+
+    def run_validation(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return super().run_validation(*args, **kwargs)
+        timings.start('serialize')
+        try:
+            return super().run_validation(*args, **kwargs)
+        finally:
+            timings.stop('serialize')
+
+    def to_representation(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return super().to_representation(*args, **kwargs)
+        timings.start('serialize')
+        try:
+            return super().to_representation(*args, **kwargs)
+        finally:
+            timings.stop('serialize')
@@ -0,0 +1,8 @@
+from django.http import HttpResponse
+
+from core.metrics import CONTENT_TYPE, REGISTRY
+
+
+def metrics(request):
+    """Expose the metrics of every process in the Prometheus format"""
+    return HttpResponse(REGISTRY.expose(), content_type=CONTENT_TYPE)
@@ -0,0 +1,156 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from rest_framework.renderers import BaseRenderer
+
+from core.constants import ORDER_SIZE, ORDER_STATUS, ORDER_TITLE
+from core.renderers import dumps
+
+CHUNK_SIZE = 2000
+# Lines handed to an ASGI server at once
+LINES_PER_SEND = 500
+
+ORDER_FIELDS = ('id', 'name', 'user_id', 'status', 'phone', 'address',
+                'created_at', 'updated_at')
+CSV_HEADER = ('id', 'name', 'user_id', 'status', 'status_display', 'phone',
+              'address', 'created_at', 'updated_at', 'item_id', 'flavour',
+              'flavour_display', 'size', 'size_display', 'quantity')
+
+STATUS_NAMES = dict(ORDER_STATUS)
+FLAVOUR_NAMES = dict(ORDER_TITLE)
+SIZE_NAMES = dict(ORDER_SIZE)
+
+
+def iter_orders(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yield every order of the queryset as a dict with its line items.
+
+    Orders are read through a server-side cursor and the line items of
+    each chunk of orders are fetched with one query, so memory use
+    depends on the chunk size and not on the number of orders. Works
+    for archived orders as well.
+    """
+    details = queryset.model._meta.get_field('detail').related_model
+    rows = queryset.prefetch_related(None).order_by('id').values(
+        *ORDER_FIELDS
+    ).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        items = defaultdict(list)
+        for item in details.objects.filter(
+            order_id__in=[row['id'] for row in chunk]
+        ).order_by('id').values('id', 'order_id', 'flavour', 'size',
+                                'quantity'):
+            items[item['order_id']].append({
+                'id': item['id'],
+                'flavour': item['flavour'],
+                'flavour_display': FLAVOUR_NAMES.get(item['flavour']),
+                'size': item['size'],
+                'size_display': SIZE_NAMES.get(item['size']),
+                'quantity': item['quantity'],
+            })
+        for row in chunk:
+            row['status_display'] = STATUS_NAMES.get(row['status'])
+            row['items'] = items[row['id']]
+            yield row
+
+
+def ndjson_lines(orders):
+    """Encode orders as newline delimited JSON, one order per line"""
+    default = DjangoJSONEncoder().default
+    for order in orders:
+        yield dumps(order, default).decode() + '\n'
+
+
+class _Echo(object):
+    """File-like object handing back what the csv writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(orders):
+    """Encode orders as CSV with one row per line item"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in orders:
+        head = [order['id'], order['name'], order['user_id'],
+                order['status'], order['status_display'], order['phone'],
+                order['address'], order['created_at'].isoformat(),
+                order['updated_at'].isoformat()]
+        if not order['items']:
+            yield writer.writerow(head + [''] * 6)
+        for item in order['items']:
+            yield writer.writerow(head + [
+                item['id'], item['flavour'], item['flavour_display'],
+                item['size'], item['size_display'], item['quantity']
+            ])
+
+
+ENCODERS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
+
+
+async def aiter_lines(lines, size=LINES_PER_SEND):
+    """
+    Stream `lines` to an ASGI server, which reads a sync iterator whole
+    into memory before sending it. Lines are read in batches in the
+    thread the view ran in, whose connection holds the export's cursor.
+    """
+    read = sync_to_async(lambda: ''.join(islice(lines, size)),
+                         thread_sensitive=True)
+    while True:
+        batch = await read()
+        if not batch:
+            return
+        yield batch
+
+
+def export_response(queryset, export_format, chunk_size=CHUNK_SIZE,
+                    asynchronous=False):
+    """
+    Return a response streaming the orders in the given format, with
+    an async iterator when `asynchronous`, for ASGI servers
+    """
+    encode, content_type = ENCODERS[export_format]
+    lines = encode(iter_orders(queryset, chunk_size))
+    if asynchronous:
+        lines = aiter_lines(lines)
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = \
+        'attachment; filename="orders.{}"'.format(export_format)
+    return response
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Negotiates NDJSON exports and renders errors as one JSON line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data, cls=DjangoJSONEncoder) + '\n').encode()
+
+
+class CSVRenderer(BaseRenderer):
+    """Negotiates CSV exports and renders errors as a CSV row"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        writer = csv.writer(_Echo())
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        return (writer.writerow(data.keys()) +
+                writer.writerow(data.values())).encode()
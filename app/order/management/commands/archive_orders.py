@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.archive import CHUNK_SIZE, archive_orders
+
+
+class Command(BaseCommand):
+    """Django command to move old delivered and returned orders away"""
+    help = ('Move delivered and returned orders placed more than '
+            '--older-than days ago, with their line items, to the archive '
+            'tables, one transaction per chunk of orders')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int,
+                            help='Age in days of the orders to archive '
+                                 '(default: ORDER_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        days = options['older_than']
+        if days is None:
+            days = settings.ORDER_ARCHIVE_AFTER_DAYS
+        if days < 0 or options['chunk_size'] < 1:
+            raise CommandError('Give a positive age and chunk size.')
+        before = timezone.now() - timedelta(days=days)
+
+        orders = details = 0
+        for chunk_orders, chunk_details in archive_orders(
+            before, options['chunk_size']
+        ):
+            orders += chunk_orders
+            details += chunk_details
+            if options['verbosity'] > 1:
+                self.stdout.write('Archived {} orders so far'.format(orders))
+
+        self.stdout.write(self.style.SUCCESS(
+            'Archived {} orders and {} line items placed before {}'.format(
+                orders, details, before.isoformat()
+            )
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ArchivedOrder, Order, Price
+from core.pricing import BATCH_SIZE, backfill_totals, load_prices
+
+
+class Command(BaseCommand):
+    """Django command to price the orders stored without a total"""
+    help = ('Price the live and archived orders stored before there were '
+            'prices, from the current catalog, in batches of order ids')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        prices, version = load_prices(Price.objects.all())
+        if version is None:
+            raise CommandError('There are no prices to price orders with.')
+
+        count = sum(
+            backfill_totals(model.objects.all(), prices, version,
+                            options['batch_size'])
+            for model in (Order, ArchivedOrder)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Priced {} orders with catalog version {}'.format(count, version)
+        ))
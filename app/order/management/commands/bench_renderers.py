@@ -0,0 +1,90 @@
+import json
+import uuid
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import bench
+from core.models import Detail, Order
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+from order.management.commands.bench_serializers import best_of
+from order.serializers import OrderDetailRetrieveSerializer
+
+
+class Command(BaseCommand):
+    """Django command to compare the JSON renderers and parsers"""
+    help = ('Seed orders, then time rendering and parsing their '
+            'OrderDetailRetrieveSerializer payloads, one by one and as a '
+            'list, with the DRF JSON renderer and parser and with the '
+            'configured fast ones, and report both as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs of each, the fastest is reported')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded data')
+
+    def handle(self, *args, **options):
+        orders, repeat = options['orders'], options['repeat']
+        if orders < 1 or repeat < 1:
+            raise CommandError('Give a positive number of orders and repeat.')
+
+        run_id = uuid.uuid4().hex[:8]
+        account, = bench.seed(run_id, 1, orders, 0)
+        user_id = get_user_model().objects.get(email=account.email).pk
+        try:
+            data = OrderDetailRetrieveSerializer(
+                Order.objects.filter(user_id=user_id).order_by('-id')
+                .prefetch_related(Prefetch(
+                    'detail', queryset=Detail.objects.order_by('id')
+                )),
+                many=True
+            ).data
+        finally:
+            if not options['keep']:
+                bench.cleanup(run_id)
+
+        results = {
+            'retrieve': self.compare(list(data), repeat),
+            'list': self.compare([data], repeat),
+        }
+
+        self.stdout.write(json.dumps({
+            'run': {'id': run_id, 'orders': orders, 'repeat': repeat,
+                    'orjson': orjson is not None},
+            'results': results,
+        }, indent=2))
+
+    def compare(self, items, repeat):
+        """Time rendering and parsing `items` with both pairs"""
+        result = {'payloads': len(items)}
+        rendered = {}
+        for key, renderer in (('drf', JSONRenderer()),
+                              ('fast', FastJSONRenderer())):
+            rendered[key], seconds = best_of(
+                repeat, lambda: [renderer.render(item) for item in items]
+            )
+            result['render_{}_ms'.format(key)] = seconds * 1000
+        parsed = {}
+        for key, parser in (('drf', JSONParser()), ('fast', FastJSONParser())):
+            parsed[key], seconds = best_of(
+                repeat, lambda: [parser.parse(BytesIO(body))
+                                 for body in rendered['drf']]
+            )
+            result['parse_{}_ms'.format(key)] = seconds * 1000
+        result.update({
+            'render_speedup': result['render_drf_ms'] /
+            result['render_fast_ms'],
+            'parse_speedup': result['parse_drf_ms'] / result['parse_fast_ms'],
+            'bytes': sum(map(len, rendered['drf'])),
+            'identical': rendered['drf'] == rendered['fast'] and
+            parsed['drf'] == parsed['fast'],
+        })
+        return result
@@ -0,0 +1,89 @@
+import json
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+
+from rest_framework.renderers import JSONRenderer
+
+from core import bench
+from core.models import Detail, Order
+from order.serializers import DetailSerializer, OrderSerializer
+from order.views import DetailViewSet, OrderViewSet
+
+
+def best_of(repeat, func):
+    """Return the output of `func` and its fastest time in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func()
+        timings.append(time.perf_counter() - start)
+    return output, min(timings)
+
+
+class Command(BaseCommand):
+    """Django command to compare the list serializers and values readers"""
+    help = ('Seed orders, then time reading and rendering a page of the '
+            'order and detail lists with their serializer and with their '
+            'values() reader, and report both as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs of each, the fastest is reported')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded data')
+
+    def handle(self, *args, **options):
+        page_size, repeat = options['page_size'], options['repeat']
+        if page_size < 1 or repeat < 1:
+            raise CommandError('Give a positive page size and repeat.')
+
+        run_id = uuid.uuid4().hex[:8]
+        account, = bench.seed(run_id, 1, page_size, page_size)
+        user_id = get_user_model().objects.get(email=account.email).pk
+        renderer = JSONRenderer()
+        lists = {
+            'order': (
+                OrderSerializer, OrderViewSet.values_reader,
+                Order.objects.filter(user_id=user_id).order_by('-id')
+                .prefetch_related(Prefetch(
+                    'detail', queryset=Detail.objects.order_by('id')
+                ))
+            ),
+            'detail': (
+                DetailSerializer, DetailViewSet.values_reader,
+                Detail.objects.filter(user_id=user_id).order_by('-id')
+            ),
+        }
+        results = {}
+        try:
+            for name, (serializer_class, reader, queryset) in lists.items():
+                serialized, serializer_seconds = best_of(
+                    repeat, lambda: renderer.render(serializer_class(
+                        queryset[:page_size], many=True
+                    ).data)
+                )
+                read, reader_seconds = best_of(
+                    repeat, lambda: renderer.render(reader.represent(
+                        reader.values(queryset)[:page_size], queryset.model
+                    ))
+                )
+                results[name] = {
+                    'rows': len(json.loads(read)),
+                    'serializer_ms': serializer_seconds * 1000,
+                    'values_reader_ms': reader_seconds * 1000,
+                    'speedup': serializer_seconds / reader_seconds,
+                    'identical': serialized == read,
+                }
+        finally:
+            if not options['keep']:
+                bench.cleanup(run_id)
+
+        self.stdout.write(json.dumps({
+            'run': {'id': run_id, 'page_size': page_size, 'repeat': repeat},
+            'results': results,
+        }, indent=2))
@@ -0,0 +1,61 @@
+import argparse
+
+from django.core.management.base import BaseCommand
+
+from core.models import Order
+from order.export import CHUNK_SIZE, ENCODERS, iter_orders
+from order.utils import parse_timestamp
+
+
+def timestamp(value):
+    parsed = parse_timestamp(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(
+            '{!r} is not an ISO 8601 date or datetime'.format(value)
+        )
+    return parsed
+
+
+def statuses(value):
+    try:
+        return [int(status) for status in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            '{!r} is not a comma separated list of statuses'.format(value)
+        )
+
+
+class Command(BaseCommand):
+    """Django command to stream all orders as NDJSON or CSV"""
+    help = 'Export orders with their line items as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(ENCODERS),
+                            default='ndjson')
+        parser.add_argument('--status', type=statuses,
+                            help='Comma separated statuses to export')
+        parser.add_argument('--since', type=timestamp,
+                            help='Only orders created at or after this')
+        parser.add_argument('--until', type=timestamp,
+                            help='Only orders created before this')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--output', type=argparse.FileType('w'),
+                            help='File to write to instead of stdout')
+
+    def handle(self, *args, **options):
+        queryset = Order.objects.all()
+        if options['status']:
+            queryset = queryset.filter(status__in=options['status'])
+        if options['since']:
+            queryset = queryset.filter(created_at__gte=options['since'])
+        if options['until']:
+            queryset = queryset.filter(created_at__lt=options['until'])
+
+        encode, _ = ENCODERS[options['format']]
+        lines = encode(iter_orders(queryset, options['chunk_size']))
+        if options['output']:
+            with options['output'] as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,68 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import ArchivedOrder, Order, SalesRollup
+from core.rollups import bucket_for, order_sales
+from order.management.commands.export_orders import timestamp
+
+CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    """Django command to recompute the sales rollups from the orders"""
+    help = ('Recompute the hourly sales rollups from the live and '
+            'archived orders, reading them in chunks of order ids')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=timestamp,
+                            help='Only rebuild the hours from this one on')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def read_sales(self, model, since, chunk_size):
+        """Return the sales of the orders of `model` and their number"""
+        details = model._meta.get_field('detail').related_model
+        orders = model.objects.order_by('id')
+        if since:
+            orders = orders.filter(created_at__gte=since)
+
+        sales, count, last_id = Counter(), 0, 0
+        while True:
+            order_ids = list(orders.filter(id__gt=last_id).values_list(
+                'id', flat=True
+            )[:chunk_size])
+            if not order_ids:
+                return sales, count
+            sales.update(order_sales(order_ids, details))
+            count += len(order_ids)
+            last_id = order_ids[-1]
+
+    def handle(self, *args, **options):
+        rollups = SalesRollup.objects.all()
+        since = None
+        if options['since']:
+            since = bucket_for(options['since'])
+            rollups = rollups.filter(bucket__gte=since)
+
+        sales, count = Counter(), 0
+        for model in (Order, ArchivedOrder):
+            model_sales, model_count = self.read_sales(
+                model, since, options['chunk_size']
+            )
+            sales.update(model_sales)
+            count += model_count
+
+        objs = [
+            SalesRollup(bucket=bucket, flavour=flavour, size=size,
+                        status=status, pizzas=pizzas)
+            for (bucket, flavour, size, status), pizzas
+            in sorted(sales.items()) if pizzas
+        ]
+        with transaction.atomic():
+            rollups.delete()
+            SalesRollup.objects.bulk_create(objs, options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt {} rollups from {} orders'.format(len(sales), count)
+        ))
@@ -0,0 +1,153 @@
+import calendar
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from core.idempotency import HEADER, MAX_KEY_LENGTH, IdempotencyKeys, \
+    request_fingerprint
+from order.exceptions import IdempotencyKeyInUse, IdempotencyKeyReused
+from order.utils import parse_timestamp
+
+
+def check_validators(request, etag, last_modified):
+    """
+    Return the quoted `etag`, `last_modified` as a timestamp and the
+    response answering the request's preconditions, if they do.
+    """
+    etag = quote_etag(etag)
+    timestamp = last_modified and calendar.timegm(
+        last_modified.utctimetuple()
+    )
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    return etag, timestamp, response
+
+
+def set_validators(response, etag, timestamp):
+    if 200 <= response.status_code < 400:
+        response['ETag'] = etag
+        if timestamp:
+            response['Last-Modified'] = http_date(timestamp)
+
+
+class ConditionalGetMixin(object):
+    """
+    Answer conditional GETs of `conditional_actions` from cheap
+    validators, before the queryset is serialized.
+
+    Views return `(etag, last_modified)` from `get_validators`, or None
+    when the object does not exist or has no validators.
+    """
+    conditional_actions = ()
+
+    def get_validators(self):
+        return None
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        if self.action not in self.conditional_actions:
+            return handler(request, *args, **kwargs)
+        validators = self.get_validators()
+        if validators is None:
+            return handler(request, *args, **kwargs)
+
+        etag, timestamp, response = check_validators(request, *validators)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        set_validators(response, etag, timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+
+class QueryParamsMixin(object):
+    """Parse the common filter query parameters"""
+
+    def _params_to_ints(self, qs, param='detail'):
+        """Convert a list of string IDs to a list of integers"""
+        try:
+            return [int(str_id) for str_id in qs.split(',')]
+        except ValueError:
+            raise ValidationError({param: 'Enter a list of integers.'})
+
+    def _param_to_datetime(self, value, param):
+        """Convert an ISO 8601 date or datetime to an aware datetime"""
+        parsed = parse_timestamp(value)
+        if parsed is None:
+            raise ValidationError({param: 'Enter a valid date/time.'})
+        return parsed
+
+
+class IdempotentCreateMixin(object):
+    """
+    Replay the stored response of a creation retried with the same
+    `Idempotency-Key` header by the same user, see core.idempotency.
+    Failed creations are not stored, so their retries run again.
+    """
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({
+                HEADER: 'Enter a key of 1 to {} characters.'.format(
+                    MAX_KEY_LENGTH
+                )
+            })
+
+        keys = IdempotencyKeys()
+        cache_key = keys.cache_key(type(self).__name__, request.user.pk, key)
+        fingerprint = request_fingerprint(request)
+        entry = keys.claim(cache_key, fingerprint)
+        if entry is None:
+            try:
+                response = super().create(request, *args, **kwargs)
+            except BaseException:
+                keys.release(cache_key)
+                raise
+            if status.is_success(response.status_code):
+                keys.save(cache_key, fingerprint, response)
+            else:
+                keys.release(cache_key)
+            return response
+
+        if entry['fingerprint'] != fingerprint:
+            raise IdempotencyKeyReused()
+        if 'response' not in entry:
+            raise IdempotencyKeyInUse()
+        stored = entry['response']
+        response = Response(stored['data'], status=stored['status'],
+                            headers=stored['headers'])
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+
+class ValuesListMixin(object):
+    """
+    List through `values_reader`, an order.values.ValuesReader of the
+    list serializer, which gives the same output for a fraction of the
+    CPU of serializing model instances
+    """
+    values_reader = None
+
+    def list(self, request, *args, **kwargs):
+        reader = self.values_reader
+        if reader is None or \
+                self.get_serializer_class() is not reader.serializer_class:
+            return super().list(request, *args, **kwargs)
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                reader.represent(page, queryset.model)
+            )
+        return Response(reader.represent(queryset, queryset.model))
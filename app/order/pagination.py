@@ -0,0 +1,53 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
+
+
+class NewestFirstCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the `-id` ordering.
+
+    Every page is fetched with an indexed `id < cursor` lookup, so deep
+    pages cost the same as the first one.
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class LatestBucketCursorPagination(NewestFirstCursorPagination):
+    """Keyset pagination over rollups, latest hour first"""
+    ordering = ('-bucket', 'flavour', 'size', 'status')
+
+
+class KeysetOrderingFilter(OrderingFilter):
+    """
+    Order by the `ordering` parameter for keyset pagination. The cursor
+    seeks on the first field and skips the rows sharing its value with
+    OFFSET, so only unique or nearly unique fields are accepted, and
+    `id` is appended to break their ties. Other fields are rejected
+    rather than silently ignored.
+    """
+    tiebreaker = 'id'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or ordering[-1].lstrip('-') == self.tiebreaker:
+            return ordering
+        descending = ordering[-1].startswith('-')
+        return tuple(ordering) + (
+            ('-' if descending else '') + self.tiebreaker,
+        )
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        ordering = super().remove_invalid_fields(queryset, fields, view,
+                                                 request)
+        if len(ordering) != len(fields):
+            raise ValidationError({self.ordering_param: (
+                'Order by one of: {}.'.format(', '.join(
+                    field for field, _ in
+                    self.get_valid_fields(queryset, view,
+                                          {'request': request})
+                ))
+            )})
+        return ordering
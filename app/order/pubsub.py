@@ -0,0 +1,160 @@
+import logging
+import select
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'order_status'
+
+
+class Subscription(object):
+    """Latest status version published for one order"""
+
+    def __init__(self, lock):
+        self.condition = threading.Condition(lock)
+        self.version = -1
+        self.subscribers = 0
+
+    def wait(self, since_version, timeout):
+        """
+        Block until a version newer than `since_version` is published
+        or `timeout` seconds pass, and return whether one was
+        """
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.version > since_version, timeout
+            )
+
+
+class LocalBroker(object):
+    """
+    In-process pub/sub of order status versions.
+
+    Only orders somebody is subscribed to are tracked, and publishing
+    wakes the subscribers of that order alone.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    @contextmanager
+    def subscribe(self, order_id):
+        """
+        Track the order while the block runs. Subscribe before reading
+        the current version so a change made in between is not missed.
+        """
+        with self._lock:
+            subscription = self._subscriptions.get(order_id)
+            if subscription is None:
+                subscription = Subscription(self._lock)
+                self._subscriptions[order_id] = subscription
+            subscription.subscribers += 1
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscription.subscribers -= 1
+                if not subscription.subscribers:
+                    del self._subscriptions[order_id]
+
+    def publish(self, order_id, version):
+        """Wake the subscribers of the order"""
+        self._deliver(order_id, version)
+
+    def _deliver(self, order_id, version):
+        with self._lock:
+            subscription = self._subscriptions.get(order_id)
+            if subscription is not None:
+                subscription.version = max(subscription.version, version)
+                subscription.condition.notify_all()
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Broker sharing status versions between processes with Postgres
+    LISTEN/NOTIFY. Each process runs one listener thread that wakes its
+    local subscribers.
+    """
+    poll_interval = 5
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    @contextmanager
+    def subscribe(self, order_id):
+        self._ensure_listener()
+        with super().subscribe(order_id) as subscription:
+            yield subscription
+
+    def publish(self, order_id, version):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)',
+                           [CHANNEL, '{}:{}'.format(order_id, version)])
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name='order-status-listener',
+                    daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg2
+
+        while True:
+            try:
+                conn = psycopg2.connect(**connection.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute('LISTEN {}'.format(CHANNEL))
+                while True:
+                    if select.select([conn], [], [], self.poll_interval)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            notify = conn.notifies.pop(0)
+                            order_id, version = notify.payload.split(':')
+                            self._deliver(int(order_id), int(version))
+            except Exception:
+                logger.exception('Order status listener failed, retrying')
+                threading.Event().wait(self.poll_interval)
+
+
+_broker = None
+
+
+def get_broker():
+    """
+    Return the broker configured by `ORDER_STATUS_BROKER`. By default,
+    PostgresBroker on Postgres, so that a status change wakes the
+    subscribers of every process, and LocalBroker, which only wakes
+    those of the publishing process, on the other databases.
+    """
+    global _broker
+    if _broker is None:
+        path = getattr(settings, 'ORDER_STATUS_BROKER', None)
+        if path:
+            broker_class = import_string(path)
+        elif connection.vendor == 'postgresql':
+            broker_class = PostgresBroker
+        else:
+            broker_class = LocalBroker
+        _broker = broker_class()
+    return _broker
+
+
+@receiver(setting_changed)
+def reload_broker(*args, **kwargs):
+    global _broker
+    if kwargs['setting'] == 'ORDER_STATUS_BROKER':
+        _broker = None
@@ -1,10 +1,22 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
-from core.models import Order, Detail
-from order.validators import UniqueUpdateStatusValidator
+from core.constants import ORDER_STATUS
+from core.models import Order, Detail, SalesRollup
+from core.pricing import catalog
+from core.rollups import apply_sales, item_sales, move_sales, \
+    status_sales, track_sales
+from core.signals import send_order_status_changed
+from core.timing import TimedSerializerMixin
+from order.exceptions import StatusConflict
+from order.validators import UniqueUpdateStatusValidator, \
+    validate_status_transition
 
 
-class DetailSerializer(serializers.ModelSerializer):
+class DetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for detail objects"""
 
     class Meta:
@@ -22,7 +34,7 @@ class DetailSerializer(serializers.ModelSerializer):
         return obj.get_quantity_display()
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serialize a order"""
     detail = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -33,38 +45,142 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = (
             'id', 'name', 'detail', 'status',
-            'phone', 'address'
+            'phone', 'address', 'total', 'created_at', 'updated_at'
         )
-        read_only_fields = ('id',)
+        read_only_fields = ('id', 'total', 'created_at', 'updated_at')
 
     def get_status(self, obj):
         return obj.get_status_display()
 
+    def validate_detail(self, details):
+        """
+        Only accept details of the requesting user that are not line
+        items of another order yet
+        """
+        request = self.context.get('request')
+        order_id = getattr(self.instance, 'id', None)
+        for detail in details:
+            if request is not None and detail.user_id != request.user.id:
+                raise serializers.ValidationError(
+                    u'Invalid pk "{pk}" - object does not exist.'.format(
+                        pk=detail.id
+                    )
+                )
+            if detail.order_id not in (None, order_id):
+                raise serializers.ValidationError(
+                    u'Detail {pk} already belongs to another order'.format(
+                        pk=detail.id
+                    )
+                )
+        return details
+
+    def create(self, validated_data):
+        """
+        Create the order and its line items in one transaction, with a
+        single bulk insert for nested `items` so the cost does not grow
+        with the number of pizzas. Existing details given in `detail`
+        become line items of the new order. The order total is priced
+        from the catalog.
+        """
+        items = validated_data.pop('items', [])
+        details = validated_data.pop('detail', [])
+        lines = [
+            (item.get('flavour', 1), item.get('size', 1),
+             item.get('quantity', 1)) for item in items
+        ] + [(detail.flavour, detail.size, detail.quantity)
+             for detail in details]
+        validated_data['total'], validated_data['price_version'] = \
+            catalog.total(lines)
+
+        with transaction.atomic():
+            order = Order.objects.create(**validated_data)
+            if items:
+                Detail.objects.bulk_create([
+                    Detail(order=order, user=order.user, **item)
+                    for item in items
+                ])
+            if details:
+                Detail.objects.filter(
+                    id__in=[detail.id for detail in details]
+                ).update(order=order, updated_at=timezone.now())
+            apply_sales(item_sales(order, lines))
+
+        return order
+
+    def update(self, instance, validated_data):
+        """
+        Update the order, failing if its status was changed since it
+        was validated. Line items left out of `detail` are deleted and
+        the order is repriced from the ones given.
+        """
+        details = validated_data.pop('detail', None)
+        if details is not None:
+            validated_data['total'], validated_data['price_version'] = \
+                catalog.total((detail.flavour, detail.size, detail.quantity)
+                              for detail in details)
+        with transaction.atomic():
+            current, version = Order.objects.select_for_update().filter(
+                pk=instance.pk
+            ).values_list('status', 'status_version').get()
+            if current != instance.status:
+                raise StatusConflict()
+            status = validated_data.get('status', current)
+            if status != current:
+                validated_data['status_version'] = version + 1
+                send_order_status_changed(instance.pk, current, status,
+                                          version + 1)
+            with track_sales([instance.pk]):
+                order = super().update(instance, validated_data)
+                if details is not None:
+                    detail_ids = [detail.id for detail in details]
+                    order.detail.exclude(id__in=detail_ids).delete()
+                    Detail.objects.filter(
+                        id__in=detail_ids
+                    ).update(order=order, updated_at=timezone.now())
+        return order
+
     validators = [
         UniqueUpdateStatusValidator(),
     ]
 
 
+class OrderCreateSerializer(OrderSerializer):
+    """Serialize a new order together with its nested line items"""
+    detail = serializers.PrimaryKeyRelatedField(
+        many=True,
+        required=False,
+        queryset=Detail.objects.all()
+    )
+    items = DetailSerializer(many=True, write_only=True, required=False)
+
+    class Meta(OrderSerializer.Meta):
+        fields = OrderSerializer.Meta.fields + ('items',)
+
+
 class OrderDetailRetrieveSerializer(OrderSerializer):
     """Serialize a order detail"""
     detail = DetailSerializer(many=True, read_only=True)
 
 
-class OrderStatusRetrieveSerializer(serializers.ModelSerializer):
+class OrderStatusRetrieveSerializer(TimedSerializerMixin,
+                                    serializers.ModelSerializer):
     status = serializers.SerializerMethodField()
+    version = serializers.IntegerField(source='status_version')
 
     class Meta:
         model = Order
         fields = (
             'id',
             'status',
+            'version',
         )
 
     def get_status(self, obj):
         return obj.get_status_display()
 
 
-class OrderStatusUpdateSerializer(serializers.ModelSerializer):
+class OrderStatusUpdateSerializer(TimedSerializerMixin,
+                                  serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = (
@@ -74,3 +190,117 @@ class OrderStatusUpdateSerializer(serializers.ModelSerializer):
 
     def get_status(self, obj):
         return obj.get_status_display()
+
+    def validate_status(self, value):
+        validate_status_transition(self.instance, value)
+        return value
+
+    def update(self, instance, validated_data):
+        """
+        Apply the transition with a conditional UPDATE so concurrent
+        requests cannot both move the order from the same status
+        """
+        status = validated_data['status']
+        with transaction.atomic():
+            updated = Order.objects.filter(
+                pk=instance.pk,
+                status_version=instance.status_version
+            ).transition(status)
+            if not updated:
+                raise StatusConflict()
+            move_sales([instance.pk], instance.status, status)
+        send_order_status_changed(instance.pk, instance.status, status,
+                                  instance.status_version + 1)
+        instance.status = status
+        instance.status_version += 1
+        return instance
+
+
+class OrderStatusChangeSerializer(serializers.Serializer):
+    """An order and the status to move it to"""
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=ORDER_STATUS)
+
+
+class BulkOrderStatusUpdateSerializer(TimedSerializerMixin,
+                                      serializers.Serializer):
+    """Move many orders to new statuses at once"""
+    max_orders = 500
+
+    orders = OrderStatusChangeSerializer(many=True, allow_empty=False,
+                                         max_length=max_orders)
+
+    def validate_orders(self, orders):
+        order_ids = [order['id'] for order in orders]
+        if len(set(order_ids)) != len(order_ids):
+            raise serializers.ValidationError(
+                u'Each order can only be given once'
+            )
+        return orders
+
+    def create(self, validated_data):
+        """
+        Read the current statuses of the orders with one locking query
+        and move the orders allowed to with one conditional UPDATE per
+        new status, in one transaction. Return a result per order, in
+        the order given: its new status and version, or an error.
+        """
+        changes = validated_data['orders']
+        results = {}
+        moves = {}
+        with transaction.atomic():
+            current = {
+                order_id: (status, version)
+                for order_id, status, version in (
+                    Order.objects.select_for_update().filter(
+                        id__in=[change['id'] for change in changes]
+                    ).order_by('id').values_list('id', 'status',
+                                                 'status_version')
+                )
+            }
+            for change in changes:
+                order_id, status = change['id'], change['status']
+                if order_id not in current:
+                    results[order_id] = {'id': order_id,
+                                         'error': u'Not found.',
+                                         'code': 'not_found'}
+                    continue
+                old_status, version = current[order_id]
+                try:
+                    validate_status_transition(Order(status=old_status),
+                                               status)
+                except serializers.ValidationError as exc:
+                    results[order_id] = {'id': order_id,
+                                         'error': exc.detail[0],
+                                         'code': 'invalid'}
+                    continue
+                moves[order_id] = status
+                results[order_id] = {'id': order_id, 'status': status,
+                                     'version': version + 1}
+
+            if moves:
+                sales = status_sales(moves)
+                groups = defaultdict(list)
+                for order_id, status in moves.items():
+                    groups[status].append(order_id)
+                for status, order_ids in sorted(groups.items()):
+                    updated = Order.objects.filter(
+                        id__in=order_ids
+                    ).transition(status)
+                    if updated != len(order_ids):
+                        raise StatusConflict()
+                apply_sales(sales)
+            for order_id, status in moves.items():
+                old_status, version = current[order_id]
+                send_order_status_changed(order_id, old_status, status,
+                                          version + 1)
+        return [results[change['id']] for change in changes]
+
+
+class SalesRollupSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serialize the pizzas sold in one hour"""
+
+    class Meta:
+        model = SalesRollup
+        fields = ('bucket', 'flavour', 'size', 'status', 'pizzas')
+        read_only_fields = fields
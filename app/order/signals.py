@@ -0,0 +1,10 @@
+from django.dispatch import receiver
+
+from core.signals import order_status_changed
+from order.pubsub import get_broker
+
+
+@receiver(order_status_changed)
+def publish_status_change(sender, order_id, version, **kwargs):
+    """Wake the subscribers waiting for the order"""
+    get_broker().publish(order_id, version)
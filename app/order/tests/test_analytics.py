@@ -0,0 +1,190 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Detail, Order, SalesRollup
+from core.rollups import bucket_for
+
+ORDER_URL = reverse('order:order-list')
+ANALYTICS_URL = reverse('order:sales-analytics')
+
+
+def order_url(order_id):
+    """Return order detail URL"""
+    return reverse('order:order-detail', args=[order_id])
+
+
+def status_url(order_id):
+    """Return order status URL"""
+    return reverse('order:retrieve-update-order-status', args=[order_id])
+
+
+def detail_url(detail_id):
+    """Return detail detail URL"""
+    return reverse('order:detail-detail', args=[detail_id])
+
+
+def rollups():
+    """Return the non empty rollups as comparable tuples"""
+    return sorted(
+        SalesRollup.objects.filter(pizzas__gt=0).values_list(
+            'bucket', 'flavour', 'size', 'status', 'pizzas'
+        )
+    )
+
+
+class SalesRollupTests(TestCase):
+    """Test the sales rollups follow the orders"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, items):
+        res = self.client.post(ORDER_URL, {
+            'name': 'pizza',
+            'phone': '9395679312',
+            'address': 'address',
+            'items': items,
+        }, format='json')
+        return Order.objects.get(id=res.data['id'])
+
+    def assertRebuildMatches(self):
+        """Assert rebuilding the rollups does not change them"""
+        incremental = rollups()
+        call_command('rebuild_rollups', chunk_size=1, stdout=StringIO())
+        self.assertEqual(rollups(), incremental)
+
+    def test_create_order_adds_pizzas(self):
+        """Test a new order adds its pizzas to its hour"""
+        order = self.create_order([
+            {'flavour': 1, 'size': 2, 'quantity': 2},
+            {'flavour': 1, 'size': 2, 'quantity': 1},
+            {'flavour': 3, 'size': 1, 'quantity': 1},
+        ])
+
+        bucket = bucket_for(order.created_at)
+        self.assertEqual(rollups(), [
+            (bucket, 1, 2, 1, 3),
+            (bucket, 3, 1, 1, 1),
+        ])
+        self.assertRebuildMatches()
+
+    def test_status_change_moves_pizzas(self):
+        """Test a status change moves the pizzas of the order"""
+        order = self.create_order([{'flavour': 2, 'size': 3,
+                                    'quantity': 2}])
+
+        res = self.client.put(status_url(order.id), {'status': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(rollups(), [
+            (bucket_for(order.created_at), 2, 3, 2, 2),
+        ])
+        self.assertRebuildMatches()
+
+    def test_order_edits_update_rollups(self):
+        """Test editing line items or the order keeps the rollups right"""
+        order = self.create_order([{'flavour': 1, 'size': 1},
+                                   {'flavour': 2, 'size': 2}])
+        first, second = order.detail.order_by('id')
+
+        self.client.put(detail_url(first.id),
+                        {'flavour': 1, 'size': 1, 'quantity': 4})
+        self.assertRebuildMatches()
+        self.client.delete(detail_url(second.id))
+        self.assertRebuildMatches()
+        self.client.patch(order_url(order.id), {'status': 2},
+                          format='json')
+        self.assertRebuildMatches()
+        self.assertEqual(rollups(), [
+            (bucket_for(order.created_at), 1, 1, 2, 4),
+        ])
+
+        self.client.delete(order_url(order.id))
+        self.assertEqual(rollups(), [])
+
+    def test_rebuild_since(self):
+        """Test rebuilding from an hour on leaves earlier hours alone"""
+        order = self.create_order([{'flavour': 1, 'size': 1}])
+        earlier = bucket_for(order.created_at) - timedelta(hours=2)
+        SalesRollup.objects.create(bucket=earlier, flavour=1, size=1,
+                                   status=1, pizzas=7)
+        SalesRollup.objects.filter(
+            bucket=bucket_for(order.created_at)
+        ).update(pizzas=100)
+
+        call_command('rebuild_rollups',
+                     since=timezone.now() - timedelta(hours=1),
+                     stdout=StringIO())
+
+        self.assertEqual(rollups(), [
+            (earlier, 1, 1, 1, 7),
+            (bucket_for(order.created_at), 1, 1, 1, 1),
+        ])
+
+
+class SalesAnalyticsApiTests(TestCase):
+    """Test the sales analytics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.now = bucket_for(timezone.now())
+        for hours, flavour, pizzas in ((0, 1, 3), (1, 2, 5), (2, 1, 4)):
+            SalesRollup.objects.create(
+                bucket=self.now - timedelta(hours=hours), flavour=flavour,
+                size=1, status=1, pizzas=pizzas
+            )
+
+    def test_staff_required(self):
+        """Test only staff can read the analytics"""
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(ANALYTICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_and_filter(self):
+        """Test listing the rollups, latest first, with filters"""
+        self.user.is_staff = True
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(ANALYTICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['pizzas'] for r in res.data['results']],
+                         [3, 5, 4])
+
+        res = self.client.get(ANALYTICS_URL, {
+            'flavour': '1',
+            'since': (self.now - timedelta(minutes=150)).isoformat(),
+        })
+        self.assertEqual([r['pizzas'] for r in res.data['results']],
+                         [3, 4])
+
+        res = self.client.get(ANALYTICS_URL, {'size': 'x'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_count_is_constant(self):
+        """Test the analytics do not read the orders"""
+        self.user.is_staff = True
+        self.client.force_authenticate(self.user)
+        Detail.objects.create(user=self.user)
+
+        with self.assertNumQueries(1):
+            self.client.get(ANALYTICS_URL)
@@ -0,0 +1,195 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import constants
+from core.models import ArchivedDetail, ArchivedOrder, Detail, Order, \
+    SalesRollup
+
+ORDER_URL = reverse('order:order-list')
+EXPORT_URL = reverse('order:order-export')
+
+
+def order_url(order_id):
+    """Return order detail URL"""
+    return reverse('order:order-detail', args=[order_id])
+
+
+def sample_order(user, days_ago=0, items=((1, 1, 1),), **params):
+    """Create and return an order placed `days_ago` with line items"""
+    defaults = {
+        'name': 'pizza',
+        'phone': '9395679312',
+        'address': 'address',
+    }
+    defaults.update(params)
+    order = Order.objects.create(user=user, **defaults)
+    for flavour, size, quantity in items:
+        Detail.objects.create(order=order, user=user, flavour=flavour,
+                              size=size, quantity=quantity)
+    if days_ago:
+        Order.objects.filter(id=order.id).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+    return order
+
+
+def rollups():
+    """Return the non empty rollups as comparable tuples"""
+    return sorted(
+        SalesRollup.objects.filter(pizzas__gt=0).values_list(
+            'bucket', 'flavour', 'size', 'status', 'pizzas'
+        )
+    )
+
+
+def archive(**options):
+    out = StringIO()
+    call_command('archive_orders', stdout=out, **options)
+    return out.getvalue()
+
+
+class ArchiveCommandTests(TestCase):
+    """Test moving old final orders to the archive"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+
+    def test_archive_old_final_orders(self):
+        """Test only old delivered and returned orders are archived"""
+        delivered = sample_order(self.user, 40, items=((2, 3, 2), (1, 1, 1)),
+                                 status=constants.DELIVERED)
+        returned = sample_order(self.user, 31, status=constants.RETURNED)
+        recent = sample_order(self.user, 5, status=constants.DELIVERED)
+        pending = sample_order(self.user, 40, status=constants.IN_PROCESS)
+
+        out = archive(older_than=30, chunk_size=1)
+
+        self.assertIn('Archived 2 orders and 3 line items', out)
+        self.assertEqual(
+            sorted(Order.objects.values_list('id', flat=True)),
+            [recent.id, pending.id]
+        )
+        self.assertFalse(Detail.objects.filter(
+            order_id__in=[delivered.id, returned.id]
+        ).exists())
+        archived = ArchivedOrder.objects.get(id=delivered.id)
+        self.assertEqual(archived.status, constants.DELIVERED)
+        self.assertEqual(
+            sorted(archived.detail.values_list('flavour', 'size',
+                                               'quantity')),
+            [(1, 1, 1), (2, 3, 2)]
+        )
+        self.assertEqual(ArchivedDetail.objects.count(), 3)
+
+    def test_archive_default_age(self):
+        """Test orders are archived after ORDER_ARCHIVE_AFTER_DAYS"""
+        with self.settings(ORDER_ARCHIVE_AFTER_DAYS=10):
+            old = sample_order(self.user, 11, status=constants.DELIVERED)
+            sample_order(self.user, 9, status=constants.DELIVERED)
+
+            archive()
+
+        self.assertEqual(list(ArchivedOrder.objects.values_list(
+            'id', flat=True
+        )), [old.id])
+
+    def test_rollups_count_archived_orders(self):
+        """Test rebuilding the rollups still counts archived orders"""
+        sample_order(self.user, 40, items=((2, 3, 2),),
+                     status=constants.DELIVERED)
+        sample_order(self.user, items=((2, 3, 1),))
+        call_command('rebuild_rollups', stdout=StringIO())
+        before = rollups()
+
+        archive()
+        call_command('rebuild_rollups', chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(rollups(), before)
+
+
+class OrderHistoryApiTests(TestCase):
+    """Test reading archived orders through the order API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.old = sample_order(self.user, 40, items=((3, 2, 4),),
+                                status=constants.DELIVERED)
+        self.live = sample_order(self.user)
+        other = get_user_model().objects.create_user(
+            'other@mahsa.com',
+            'password123'
+        )
+        self.other = sample_order(other, 40, status=constants.DELIVERED)
+        archive()
+
+    def test_list_live_orders_only(self):
+        """Test listing orders leaves the archive out"""
+        res = self.client.get(ORDER_URL)
+
+        self.assertEqual([order['id'] for order in res.data['results']],
+                         [self.live.id])
+
+    def test_list_history(self):
+        """Test the history lists the user's archived orders"""
+        res = self.client.get(ORDER_URL, {'history': 'true'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([order['id'] for order in res.data['results']],
+                         [self.old.id])
+        self.assertEqual(res.data['results'][0]['status'],
+                         constants.DELIVERED)
+
+    def test_retrieve_archived_order(self):
+        """Test retrieving an archived order falls back to the archive"""
+        res = self.client.get(order_url(self.old.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['id'], self.old.id)
+        self.assertEqual(res.data['detail'],
+                         [{'id': res.data['detail'][0]['id'], 'flavour': 3,
+                           'size': 2, 'quantity': 4}])
+        self.assertIn('ETag', res)
+
+    def test_retrieve_archived_order_of_other_user(self):
+        """Test the archive is limited to the user's orders"""
+        res = self.client.get(order_url(self.other.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_archived_order_read_only(self):
+        """Test archived orders cannot be changed or deleted"""
+        res = self.client.patch(order_url(self.old.id), {'name': 'new'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = self.client.delete(order_url(self.old.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(ArchivedOrder.objects.filter(id=self.old.id)
+                        .exists())
+
+    def test_export_history(self):
+        """Test the history can be exported with its line items"""
+        res = self.client.get(EXPORT_URL, {'history': 'true'})
+
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        order = json.loads(lines[0])
+        self.assertEqual(order['id'], self.old.id)
+        self.assertEqual(order['items'][0]['flavour_display'], 'salami')
@@ -0,0 +1,169 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import constants
+from core.models import Detail, Order
+
+DETAIL_URL = reverse('order:detail-list')
+
+
+def status_url(order_id):
+    """Return order status URL"""
+    return reverse('order:retrieve-update-order-status', args=[order_id])
+
+
+def order_url(order_id):
+    """Return order detail URL"""
+    return reverse('order:order-detail', args=[order_id])
+
+
+def sample_order(user, **params):
+    """Create and return a sample order"""
+    defaults = {
+        'name': 'pizza',
+        'phone': '9395679312',
+        'address': 'address',
+    }
+    defaults.update(params)
+
+    return Order.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified support of the order endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_status_not_modified(self):
+        """Test an unchanged status costs one query and no body"""
+        order = sample_order(self.user)
+        res = self.client.get(status_url(order.id))
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(status_url(order.id),
+                                  HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['ETag'], etag)
+
+    def test_status_modified(self):
+        """Test a status change invalidates the ETag"""
+        order = sample_order(self.user)
+        etag = self.client.get(status_url(order.id))['ETag']
+
+        self.client.put(status_url(order.id),
+                        {'status': constants.IN_PROCESS})
+        res = self.client.get(status_url(order.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], 'In Process')
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_status_if_modified_since(self):
+        """Test Last-Modified can be used to revalidate"""
+        order = sample_order(self.user)
+        last_modified = self.client.get(status_url(order.id))['Last-Modified']
+
+        res = self.client.get(status_url(order.id),
+                              HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_order_not_modified(self):
+        """Test an unchanged order is not serialized again"""
+        order = sample_order(self.user)
+        Detail.objects.create(user=self.user, order=order)
+        etag = self.client.get(order_url(order.id))['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(order_url(order.id),
+                                  HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_order_line_item_change(self):
+        """Test editing a line item changes the order ETag"""
+        order = sample_order(self.user)
+        detail = Detail.objects.create(user=self.user, order=order)
+        etag = self.client.get(order_url(order.id))['ETag']
+
+        self.client.put(
+            reverse('order:update-order-details', args=[detail.id]),
+            {'flavour': 1, 'size': 1, 'quantity': 3}
+        )
+        res = self.client.get(order_url(order.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['detail'][0]['quantity'], 3)
+
+    def test_other_user_order_not_found(self):
+        """Test validators do not leak orders of other users"""
+        user2 = get_user_model().objects.create_user(
+            'other@mahsa.com',
+            'password123'
+        )
+        order = sample_order(user2)
+
+        res = self.client.get(order_url(order.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_list_not_modified(self):
+        """Test an unchanged detail page is answered with 304"""
+        Detail.objects.create(user=self.user)
+        etag = self.client.get(DETAIL_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(DETAIL_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_list_changes(self):
+        """Test new details and other pages get a fresh ETag"""
+        Detail.objects.create(user=self.user)
+        etag = self.client.get(DETAIL_URL)['ETag']
+
+        res = self.client.get(DETAIL_URL, {'assigned_only': 1},
+                              HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        Detail.objects.create(user=self.user)
+        res = self.client.get(DETAIL_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_detail_list_status_changes(self):
+        """Test status changes of their orders change a filtered list"""
+        moved_out = sample_order(self.user, status=constants.IN_PROCESS)
+        moved_in = sample_order(self.user, status=constants.RECEIVED)
+        kept = sample_order(self.user, status=constants.IN_PROCESS)
+        details = {
+            order.id: Detail.objects.create(user=self.user, order=order).id
+            for order in (moved_out, moved_in, kept)
+        }
+        params = {'status': constants.IN_PROCESS}
+        etag = self.client.get(DETAIL_URL, params)['ETag']
+
+        Order.objects.filter(id=moved_out.id).transition(
+            constants.OUT_FOR_DELIVERY
+        )
+        Order.objects.filter(id=moved_in.id).transition(constants.IN_PROCESS)
+        res = self.client.get(DETAIL_URL, params, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [detail['id'] for detail in res.data['results']],
+            [details[kept.id], details[moved_in.id]]
+        )
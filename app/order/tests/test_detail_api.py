@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -46,7 +48,7 @@ class PrivateDetailApiTests(TestCase):
         detail = Detail.objects.all().order_by('-id')
         serializer = DetailSerializer(detail, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_detail_limited_to_user(self):
         """Test that pizza detail returned are for the authenticated user"""
@@ -62,8 +64,8 @@ class PrivateDetailApiTests(TestCase):
         res = self.client.get(DETAIL_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['flavour'], detail.flavour)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['flavour'], detail.flavour)
 
     def test_create_detail_successful(self):
         """Test creating a new pizza detail"""
@@ -100,8 +102,8 @@ class PrivateDetailApiTests(TestCase):
 
         serializer1 = DetailSerializer(detail1)
         serializer2 = DetailSerializer(detail2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_retrieve_detail_assigned_unique(self):
         """Test filtering pizza detail by assigned returns unique items"""
@@ -128,4 +130,39 @@ class PrivateDetailApiTests(TestCase):
 
         res = self.client.get(DETAIL_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_detail(self):
+        """Test filtering line items by flavour, size and order status"""
+        order = Order.objects.create(user=self.user, name='pizza',
+                                     phone='09395679309', address='address',
+                                     status=2)
+        small = Detail.objects.create(user=self.user, order=order,
+                                      flavour=1, size=1, quantity=1)
+        large = Detail.objects.create(user=self.user, order=order,
+                                      flavour=2, size=3, quantity=1)
+        unassigned = Detail.objects.create(user=self.user, flavour=1,
+                                           size=3, quantity=1)
+
+        for params, expected in (
+            ({'flavour': '1'}, [unassigned.id, small.id]),
+            ({'size': '3'}, [unassigned.id, large.id]),
+            ({'status': '2'}, [large.id, small.id]),
+            ({'status': '2', 'size': '1,2'}, [small.id]),
+            ({'status': '1'}, []),
+            ({'assigned_only': 1, 'flavour': '1'}, [small.id]),
+        ):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(DETAIL_URL, params)
+
+            self.assertEqual([d['id'] for d in res.data['results']],
+                             expected)
+            for query in ctx.captured_queries:
+                self.assertNotIn('DISTINCT', query['sql'].upper())
+
+    def test_filter_detail_invalid_params(self):
+        """Test malformed filters are rejected"""
+        for params in ({'flavour': 'a'}, {'size': '1,b'}, {'status': 'x'}):
+            res = self.client.get(DETAIL_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,186 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import constants
+from core.models import Detail, Order
+
+EXPORT_URL = reverse('order:order-export')
+
+
+def sample_order(user, items=((1, 1, 1),), **params):
+    """Create and return a sample order with line items"""
+    defaults = {
+        'name': 'pizza',
+        'phone': '9395679312',
+        'address': 'address',
+    }
+    defaults.update(params)
+    order = Order.objects.create(user=user, **defaults)
+    for flavour, size, quantity in items:
+        Detail.objects.create(order=order, user=user, flavour=flavour,
+                              size=size, quantity=quantity)
+    return order
+
+
+def read_stream(res):
+    """Return the body of a streaming response"""
+    return b''.join(res.streaming_content).decode()
+
+
+class ExportApiTests(TestCase):
+    """Test the streaming order export endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_login_required(self):
+        """Test that exporting requires authentication"""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_ndjson(self):
+        """Test orders stream as one JSON document per line"""
+        order = sample_order(self.user, items=((2, 3, 2), (1, 1, 1)),
+                             status=constants.IN_PROCESS)
+        sample_order(self.user)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = read_stream(res).splitlines()
+        self.assertEqual(len(lines), 2)
+        first = json.loads(lines[0])
+        self.assertEqual(first['id'], order.id)
+        self.assertEqual(first['status_display'], 'In Process')
+        self.assertEqual(
+            [(i['flavour_display'], i['size_display'], i['quantity'])
+             for i in first['items']],
+            [('marinara', 'Large', 2), ('margarita', 'Small', 1)]
+        )
+
+    def test_export_async_under_asgi(self):
+        """Test ASGI servers get an async stream they do not buffer"""
+        token = Token.objects.create(user=self.user)
+        sample_order(self.user, items=((2, 3, 2), (1, 1, 1)))
+        sample_order(self.user)
+
+        async def export():
+            res = await AsyncClient().get(EXPORT_URL, headers={
+                'Authorization': 'Token ' + token.key
+            })
+            return res, b''.join([part async for part in
+                                  res.streaming_content])
+
+        res, content = async_to_sync(export)()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.is_async)
+        lines = content.decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(len(json.loads(lines[0])['items']), 2)
+
+    def test_export_csv(self):
+        """Test orders stream as CSV with one row per line item"""
+        order = sample_order(self.user, items=((2, 3, 2), (3, 2, 1)))
+        empty = sample_order(self.user, items=())
+
+        res = self.client.get(EXPORT_URL, {'format': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(read_stream(res))))
+        self.assertEqual([row['id'] for row in rows],
+                         [str(order.id), str(order.id), str(empty.id)])
+        self.assertEqual(rows[1]['flavour_display'], 'salami')
+        self.assertEqual(rows[0]['status_display'], 'Received')
+        self.assertEqual(rows[2]['item_id'], '')
+
+    def test_export_filters(self):
+        """Test the export honours status and date filters"""
+        now = timezone.now()
+        old = sample_order(self.user)
+        Order.objects.filter(id=old.id).update(
+            created_at=now - timedelta(days=3))
+        delivered = sample_order(self.user, status=constants.DELIVERED)
+        sample_order(self.user)
+
+        res = self.client.get(EXPORT_URL, {
+            'status': constants.DELIVERED,
+            'since': (now - timedelta(days=1)).isoformat(),
+        })
+
+        ids = [json.loads(line)['id']
+               for line in read_stream(res).splitlines()]
+        self.assertEqual(ids, [delivered.id])
+
+    def test_export_limited_to_user(self):
+        """Test users only export their own orders and staff export all"""
+        user2 = get_user_model().objects.create_user(
+            'other@mahsa.com',
+            'password123'
+        )
+        sample_order(user2)
+        sample_order(self.user)
+
+        res = self.client.get(EXPORT_URL)
+        self.assertEqual(len(read_stream(res).splitlines()), 1)
+
+        self.user.is_staff = True
+        res = self.client.get(EXPORT_URL)
+        self.assertEqual(len(read_stream(res).splitlines()), 2)
+
+
+class ExportCommandTests(TestCase):
+    """Test the export_orders management command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+
+    def test_export_orders_csv(self):
+        """Test exporting filtered orders as CSV"""
+        sample_order(self.user, status=constants.RETURNED)
+        received = sample_order(self.user)
+
+        out = io.StringIO()
+        call_command('export_orders', '--format', 'csv', '--status', '1',
+                     stdout=out)
+
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([row['id'] for row in rows], [str(received.id)])
+
+    def test_export_in_chunks(self):
+        """Test line items are fetched once per chunk of orders"""
+        for _ in range(5):
+            sample_order(self.user, items=((1, 1, 1), (2, 2, 2)))
+
+        with self.assertNumQueries(4):
+            out = io.StringIO()
+            call_command('export_orders', chunk_size=2, stdout=out)
+
+        orders = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(orders), 5)
+        self.assertTrue(all(len(order['items']) == 2 for order in orders))
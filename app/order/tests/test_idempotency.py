@@ -0,0 +1,157 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.idempotency import IdempotencyKeys
+from core.models import Detail, Order
+
+ORDER_URL = reverse('order:order-list')
+DETAIL_URL = reverse('order:detail-list')
+
+ORDER_PAYLOAD = {
+    'name': 'pizza',
+    'phone': '9395679312',
+    'address': 'address',
+    'items': [{'flavour': 2, 'size': 3, 'quantity': 2}],
+}
+
+
+class IdempotencyKeyTests(TestCase):
+    """Test retried creations with an Idempotency-Key"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def post(self, url, payload, key, client=None):
+        return (client or self.client).post(url, payload, format='json',
+                                            HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_order_created_once(self):
+        """Test a retry gets the first response without a new order"""
+        first = self.post(ORDER_URL, ORDER_PAYLOAD, 'key-1')
+
+        retry = self.post(ORDER_URL, ORDER_PAYLOAD, 'key-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Detail.objects.count(), 1)
+
+    def test_retried_detail_created_once(self):
+        """Test line item creation is idempotent too"""
+        payload = {'flavour': 1, 'size': 2, 'quantity': 1}
+
+        first = self.post(DETAIL_URL, payload, 'key-1')
+        retry = self.post(DETAIL_URL, payload, 'key-1')
+
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Detail.objects.count(), 1)
+
+    def test_keys_scoped_per_user_and_view(self):
+        """Test other users and endpoints do not share keys"""
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user(
+            'other@mahsa.com',
+            'password123'
+        ))
+
+        self.post(ORDER_URL, ORDER_PAYLOAD, 'key-1')
+        self.post(ORDER_URL, ORDER_PAYLOAD, 'key-1', client=other)
+        self.post(DETAIL_URL, {'flavour': 1, 'size': 2, 'quantity': 1},
+                  'key-1')
+
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(Detail.objects.filter(order=None).count(), 1)
+
+    def test_key_reused_for_other_request(self):
+        """Test a key sent with a different payload is rejected"""
+        self.post(ORDER_URL, ORDER_PAYLOAD, 'key-1')
+
+        res = self.post(ORDER_URL, dict(ORDER_PAYLOAD, name='other'),
+                        'key-1')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_creation_not_stored(self):
+        """Test a rejected creation runs again when retried"""
+        res = self.post(ORDER_URL, dict(ORDER_PAYLOAD, phone=''), 'key-1')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.post(ORDER_URL, dict(ORDER_PAYLOAD, phone=''), 'key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('Idempotent-Replayed', res)
+
+    @override_settings(IDEMPOTENCY_KEYS={'WAIT_SECONDS': 0})
+    def test_key_in_flight_conflicts(self):
+        """Test a retry of a request still running is told to wait"""
+        self.post(ORDER_URL, ORDER_PAYLOAD, 'key-1')
+        # Back to the claim the first request held while it ran
+        key = IdempotencyKeys().cache_key('OrderViewSet', self.user.pk,
+                                          'key-1')
+        cache.set(key, {'fingerprint': cache.get(key)['fingerprint']})
+
+        res = self.post(ORDER_URL, ORDER_PAYLOAD, 'key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_invalid_key(self):
+        """Test overlong keys are rejected"""
+        res = self.post(ORDER_URL, ORDER_PAYLOAD, 'k' * 256)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+
+class ConcurrentIdempotencyKeyTests(TransactionTestCase):
+    """Test concurrent requests sharing an Idempotency-Key"""
+
+    def test_concurrent_duplicates_run_once(self):
+        """Test duplicates in flight wait for one creation"""
+        cache.clear()
+        user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        barrier = threading.Barrier(4)
+        responses = []
+
+        def create():
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                responses.append(client.post(
+                    ORDER_URL, ORDER_PAYLOAD, format='json',
+                    HTTP_IDEMPOTENCY_KEY='key-1'
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([res.status_code for res in responses],
+                         [status.HTTP_201_CREATED] * 4)
+        self.assertEqual(len({res.data['id'] for res in responses}), 1)
+        self.assertEqual(Order.objects.count(), 1)
@@ -1,6 +1,11 @@
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -69,7 +74,7 @@ class PrivateOrderApiTests(TestCase):
         orders = Order.objects.all().order_by('-id')
         serializer = OrderSerializer(orders, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_order_limited_to_user(self):
         """Test retrieving orders for user"""
@@ -85,8 +90,8 @@ class PrivateOrderApiTests(TestCase):
         orders = Order.objects.filter(user=self.user)
         serializer = OrderSerializer(orders, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_order_detail(self):
         """Test viewing a recipe detail"""
@@ -197,6 +202,205 @@ class PrivateOrderApiTests(TestCase):
         serializer1 = OrderSerializer(order1)
         serializer2 = OrderSerializer(order2)
         serializer3 = OrderSerializer(order3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+    def test_create_order_with_nested_items(self):
+        """Test creating an order and its details in one request"""
+        detail = sample_detail(user=self.user, flavour=3, size=3, quantity=1)
+        payload = {
+            'detail': [detail.id],
+            'items': [
+                {'flavour': 1, 'size': 2, 'quantity': 2},
+                {'flavour': 2, 'size': 3, 'quantity': 1},
+            ],
+            'name': 'pizza',
+            'phone': '9396579302',
+            'address': 'address'
+        }
+        res = self.client.post(ORDER_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('items', res.data)
+        order = Order.objects.get(id=res.data['id'])
+        details = order.detail.all()
+        self.assertEqual(details.count(), 3)
+        self.assertIn(detail, details)
+        self.assertEqual(
+            sorted(details.values_list('flavour', 'size', 'quantity')),
+            [(1, 2, 2), (2, 3, 1), (3, 3, 1)]
+        )
+        self.assertTrue(all(d.user == self.user for d in details))
+        self.assertEqual(sorted(res.data['detail']),
+                         sorted(d.id for d in details))
+
+    def test_create_order_with_only_nested_items(self):
+        """Test creating an order from nested items alone"""
+        payload = {
+            'items': [{'flavour': 2, 'size': 1, 'quantity': 4}],
+            'name': 'pizza',
+            'phone': '9396579302',
+            'address': 'address'
+        }
+        res = self.client.post(ORDER_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(id=res.data['id'])
+        self.assertEqual(list(order.detail.values_list('quantity',
+                                                       flat=True)), [4])
+
+    def test_create_order_invalid_item_rolls_back(self):
+        """Test an invalid nested item creates neither order nor details"""
+        payload = {
+            'items': [
+                {'flavour': 1, 'size': 2, 'quantity': 2},
+                {'flavour': 9, 'size': 3, 'quantity': 1},
+            ],
+            'name': 'pizza',
+            'phone': '9396579302',
+            'address': 'address'
+        }
+        res = self.client.post(ORDER_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Detail.objects.exists())
+
+    def test_order_timestamps(self):
+        """Test orders record when they were created and updated"""
+        order = sample_order(user=self.user)
+        created_at = order.created_at
+
+        order.name = 'pasta'
+        order.save()
+
+        self.assertIsNotNone(created_at)
+        self.assertEqual(order.created_at, created_at)
+        self.assertGreater(order.updated_at, created_at)
+
+    def test_filter_order_by_time_range(self):
+        """Test returning orders created between since and until"""
+        now = timezone.now()
+        old = sample_order(user=self.user)
+        recent = sample_order(user=self.user)
+        Order.objects.filter(id=old.id).update(
+            created_at=now - timedelta(days=2))
+        Order.objects.filter(id=recent.id).update(
+            created_at=now - timedelta(minutes=30))
+
+        res = self.client.get(ORDER_URL, {
+            'since': (now - timedelta(hours=1)).isoformat(),
+            'until': now.isoformat(),
+        })
+        ids = [o['id'] for o in res.data['results']]
+        self.assertEqual(ids, [recent.id])
+
+        res = self.client.get(ORDER_URL, {
+            'until': (now - timedelta(days=1)).date().isoformat(),
+        })
+        ids = [o['id'] for o in res.data['results']]
+        self.assertEqual(ids, [old.id])
+
+    def test_filter_order_by_status(self):
+        """Test returning orders in the given statuses"""
+        received = sample_order(user=self.user, status=1)
+        in_process = sample_order(user=self.user, status=2)
+        sample_order(user=self.user, status=4)
+
+        res = self.client.get(ORDER_URL, {'status': '1,2'})
+
+        ids = [o['id'] for o in res.data['results']]
+        self.assertEqual(ids, [in_process.id, received.id])
+
+    def test_filter_order_by_line_items(self):
+        """Test orders with a matching line item are listed once"""
+        order1 = sample_order(user=self.user)
+        order1.detail.add(sample_detail(user=self.user, flavour=1, size=2),
+                          sample_detail(user=self.user, flavour=1, size=2),
+                          sample_detail(user=self.user, flavour=2, size=1))
+        order2 = sample_order(user=self.user)
+        order2.detail.add(sample_detail(user=self.user, flavour=1, size=1),
+                          sample_detail(user=self.user, flavour=2, size=2))
+        ids = list(order1.detail.values_list('id', flat=True))
+
+        for params, expected in (
+            ({'flavour': '1'}, [order2.id, order1.id]),
+            ({'flavour': '1', 'size': '2'}, [order1.id]),
+            ({'size': '1,2', 'status': '1'}, [order2.id, order1.id]),
+            ({'detail': ','.join(map(str, ids)), 'size': '2'}, [order1.id]),
+            ({'flavour': '3'}, []),
+        ):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(ORDER_URL, params)
+
+            self.assertEqual([o['id'] for o in res.data['results']],
+                             expected)
+            sql = ctx.captured_queries[0]['sql'].upper()
+            self.assertIn('EXISTS', sql)
+            self.assertNotIn('DISTINCT', sql)
+
+    def test_filter_order_invalid_params(self):
+        """Test malformed filters are rejected"""
+        for params in ({'since': 'yesterday'}, {'until': '2020-13-01'},
+                       {'status': 'a,b'}, {'flavour': 'large'}):
+            res = self.client.get(ORDER_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_order_with_other_order_detail(self):
+        """Test a line item of another order cannot be reused"""
+        order = sample_order(user=self.user)
+        detail = sample_detail(user=self.user)
+        order.detail.add(detail)
+        payload = {
+            'detail': [detail.id],
+            'name': 'pizza',
+            'phone': '9396579302',
+            'address': 'address'
+        }
+
+        res = self.client.post(ORDER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        detail.refresh_from_db()
+        self.assertEqual(detail.order, order)
+
+    def test_create_order_with_other_user_detail(self):
+        """Test details of another user cannot be ordered"""
+        user2 = get_user_model().objects.create_user(
+            'other@mahsa.com',
+            'password123'
+        )
+        detail = sample_detail(user=user2)
+        payload = {
+            'detail': [detail.id],
+            'name': 'pizza',
+            'phone': '9396579302',
+            'address': 'address'
+        }
+
+        res = self.client.post(ORDER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_order_deletes_dropped_details(self):
+        """Test line items removed from an order do not linger"""
+        order = sample_order(user=self.user)
+        kept = sample_detail(user=self.user)
+        dropped = sample_detail(user=self.user)
+        order.detail.add(kept, dropped)
+
+        self.client.patch(detail_url(order.id), {'detail': [kept.id]})
+
+        self.assertEqual(list(order.detail.all()), [kept])
+        self.assertFalse(Detail.objects.filter(id=dropped.id).exists())
+
+    def test_delete_order_deletes_details(self):
+        """Test deleting an order deletes its line items"""
+        order = sample_order(user=self.user)
+        order.detail.add(sample_detail(user=self.user))
+
+        self.client.delete(detail_url(order.id))
+
+        self.assertFalse(Detail.objects.exists())
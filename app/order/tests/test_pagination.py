@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Order, Detail
+
+ORDER_URL = reverse('order:order-list')
+DETAIL_URL = reverse('order:detail-list')
+
+
+def sample_order(user, **params):
+    """Create and return a sample order"""
+    defaults = {
+        'name': 'pizza',
+        'phone': '9395679312',
+        'address': 'address',
+    }
+    defaults.update(params)
+
+    return Order.objects.create(user=user, **defaults)
+
+
+class CursorPaginationTests(TestCase):
+    """Test keyset pagination of the order and detail listings"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, params):
+        """Follow `next` links and return every page"""
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append(res.data['results'])
+            if not res.data['next']:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_orders_paginated_newest_first(self):
+        """Test orders are split into pages ordered by descending id"""
+        orders = [sample_order(self.user) for _ in range(5)]
+
+        pages = self.walk(ORDER_URL, {'page_size': 2})
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        ids = [o['id'] for page in pages for o in page]
+        self.assertEqual(ids, [o.id for o in reversed(orders)])
+
+    def test_deep_page_does_not_offset_scan(self):
+        """Test later pages seek by id instead of using OFFSET"""
+        for _ in range(5):
+            sample_order(self.user)
+        res = self.client.get(ORDER_URL, {'page_size': 2})
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(res.data['next'])
+
+        order_sql = [q['sql'] for q in ctx.captured_queries
+                     if 'FROM "core_order"' in q['sql']]
+        self.assertTrue(order_sql)
+        self.assertTrue(all('OFFSET' not in sql for sql in order_sql))
+
+    def test_page_size_is_capped(self):
+        """Test the page size parameter cannot exceed the maximum"""
+        Order.objects.bulk_create([
+            Order(user=self.user, phone='9395679312', address='address')
+            for _ in range(510)
+        ])
+
+        res = self.client.get(ORDER_URL, {'page_size': 1000})
+
+        self.assertEqual(len(res.data['results']), 500)
+
+    def test_detail_filter_across_pages(self):
+        """Test the detail filter keeps working with pagination"""
+        details, matching = [], []
+        for _ in range(3):
+            order = sample_order(self.user)
+            details.append(Detail.objects.create(user=self.user, order=order))
+            matching.append(order.id)
+            sample_order(self.user)
+
+        detail_ids = ','.join(str(detail.id) for detail in details)
+        pages = self.walk(ORDER_URL, {'detail': detail_ids, 'page_size': 2})
+
+        ids = [o['id'] for page in pages for o in page]
+        self.assertEqual(ids, sorted(matching, reverse=True))
+
+    def test_assigned_only_across_pages(self):
+        """Test the assigned_only filter keeps working with pagination"""
+        order = sample_order(self.user)
+        assigned = []
+        for _ in range(3):
+            detail = Detail.objects.create(user=self.user)
+            order.detail.add(detail)
+            assigned.append(detail.id)
+            Detail.objects.create(user=self.user)
+
+        pages = self.walk(DETAIL_URL, {'assigned_only': 1, 'page_size': 2})
+
+        ids = [d['id'] for page in pages for d in page]
+        self.assertEqual(ids, sorted(assigned, reverse=True))
+
+    def test_ordering_ties_broken_by_id(self):
+        """Test orders with the same creation time are paged by id"""
+        orders = [sample_order(self.user) for _ in range(5)]
+        Order.objects.update(created_at=orders[0].created_at)
+
+        pages = self.walk(ORDER_URL, {'ordering': '-created_at',
+                                      'page_size': 2})
+
+        ids = [o['id'] for page in pages for o in page]
+        self.assertEqual(ids, [o.id for o in reversed(orders)])
+
+    def test_ordering_by_other_fields_rejected(self):
+        """Test orderings the cursor cannot seek on are rejected"""
+        for ordering in ('name', 'created_at,total', 'unknown'):
+            res = self.client.get(ORDER_URL, {'ordering': ordering})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('ordering', res.data)
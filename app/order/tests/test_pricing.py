@@ -0,0 +1,114 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Detail, Order, Price
+from core.pricing import catalog
+
+ORDER_URL = reverse('order:order-list')
+
+
+def order_url(order_id):
+    """Return order detail URL"""
+    return reverse('order:order-detail', args=[order_id])
+
+
+def detail_url(detail_id):
+    """Return detail detail URL"""
+    return reverse('order:detail-detail', args=[detail_id])
+
+
+class OrderTotalTests(TestCase):
+    """Test orders store the total of their line items"""
+
+    def setUp(self):
+        catalog.invalidate()
+        Price.objects.create(version=1, flavour=1, size=1, amount='10.00')
+        Price.objects.create(version=1, flavour=2, size=3, amount='15.25')
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, **params):
+        payload = {
+            'name': 'pizza',
+            'phone': '9395679312',
+            'address': 'address',
+        }
+        payload.update(params)
+        return self.client.post(ORDER_URL, payload, format='json')
+
+    def test_create_order_total(self):
+        """Test a new order is priced from its items and details"""
+        detail = Detail.objects.create(user=self.user, flavour=2, size=3)
+
+        res = self.create_order(
+            detail=[detail.id],
+            items=[{'flavour': 1, 'size': 1, 'quantity': 2}]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(res.data['total']), Decimal('35.25'))
+        order = Order.objects.get(id=res.data['id'])
+        self.assertEqual(order.total, Decimal('35.25'))
+        self.assertEqual(order.price_version, 1)
+
+    def test_total_is_read_only(self):
+        """Test clients cannot set the total"""
+        res = self.create_order(total='1.00', items=[{'flavour': 1}])
+
+        self.assertEqual(Decimal(res.data['total']), Decimal('10.00'))
+
+    def test_update_order_reprices(self):
+        """Test replacing the details of an order reprices it"""
+        res = self.create_order(items=[{'flavour': 1, 'size': 1}])
+        detail = Detail.objects.create(user=self.user, flavour=2, size=3,
+                                       quantity=2)
+
+        res = self.client.patch(order_url(res.data['id']),
+                                {'detail': [detail.id]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(res.data['total']), Decimal('30.50'))
+
+    def test_edit_detail_reprices_order(self):
+        """Test changing or deleting a line item reprices its order"""
+        res = self.create_order(items=[{'flavour': 1, 'size': 1},
+                                       {'flavour': 2, 'size': 3}])
+        order = Order.objects.get(id=res.data['id'])
+        detail = order.detail.get(flavour=1)
+        updated_at = order.updated_at
+
+        self.client.put(detail_url(detail.id),
+                        {'flavour': 1, 'size': 1, 'quantity': 3})
+        order.refresh_from_db()
+        self.assertEqual(order.total, Decimal('45.25'))
+        self.assertGreater(order.updated_at, updated_at)
+
+        self.client.delete(detail_url(detail.id))
+        order.refresh_from_db()
+        self.assertEqual(order.total, Decimal('15.25'))
+
+    def test_price_change_keeps_existing_totals(self):
+        """Test orders keep the price they were created with"""
+        res = self.create_order(items=[{'flavour': 1, 'size': 1}])
+        Price.objects.create(version=2, flavour=1, size=1, amount='12.00')
+
+        second = self.create_order(items=[{'flavour': 1, 'size': 1}])
+
+        self.assertEqual(Order.objects.get(id=res.data['id']).total,
+                         Decimal('10.00'))
+        self.assertEqual(Decimal(second.data['total']), Decimal('12.00'))
+        self.assertEqual(
+            Order.objects.aggregate(revenue=Sum('total'))['revenue'],
+            Decimal('22.00')
+        )
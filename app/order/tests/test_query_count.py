@@ -0,0 +1,126 @@
+import math
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Order, Detail
+
+ORDER_URL = reverse('order:order-list')
+
+MAX_LIST_QUERIES = 2
+# The order itself, its line items and its conditional GET validators
+MAX_RETRIEVE_QUERIES = 3
+# Includes upserting the sales rollup of its one flavour and size
+MAX_CREATE_QUERIES = 8
+
+
+def detail_url(order_id):
+    """Return order detail URL"""
+    return reverse('order:order-detail', args=[order_id])
+
+
+def insert_batches(model, count):
+    """
+    Return the INSERT statements bulk_create needs for `count` rows.
+    One, except on databases that cap the parameters of a query, like
+    SQLite, which split a large insert.
+    """
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    return math.ceil(
+        count / connection.ops.bulk_batch_size(fields, [None] * count)
+    )
+
+
+def bulk_orders(user, count, details_per_order=2):
+    """Create `count` orders with their own details for the user"""
+    Order.objects.bulk_create([
+        Order(user=user, name='pizza', phone='9395679312', address='address')
+        for _ in range(count)
+    ])
+    order_ids = list(Order.objects.filter(user=user)
+                     .order_by('id').values_list('id', flat=True))
+    Detail.objects.bulk_create([
+        Detail(order_id=order_id, user=user, flavour=1, size=2, quantity=1)
+        for order_id in order_ids
+        for _ in range(details_per_order)
+    ])
+    return order_ids
+
+
+class OrderQueryCountTests(TestCase):
+    """Test that order endpoints run in a fixed number of queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def assertMaxQueries(self, limit, func, *args, **kwargs):
+        """Call func and assert it ran at most `limit` queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = func(*args, **kwargs)
+        self.assertLessEqual(
+            len(ctx.captured_queries), limit,
+            '\n'.join(q['sql'] for q in ctx.captured_queries)
+        )
+        return res
+
+    def test_list_query_count_is_constant(self):
+        """Test listing 1, 10 and 500 orders costs the same queries"""
+        for count in (1, 10, 500):
+            Order.objects.all().delete()
+            Detail.objects.all().delete()
+            bulk_orders(self.user, count)
+
+            res = self.assertMaxQueries(MAX_LIST_QUERIES,
+                                        self.client.get, ORDER_URL,
+                                        {'page_size': count})
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            orders = res.data['results']
+            self.assertEqual(len(orders), count)
+            self.assertTrue(all(len(o['detail']) == 2 for o in orders))
+
+    def test_retrieve_query_count_is_constant(self):
+        """Test retrieving an order does not query per detail"""
+        for count in (1, 10, 500):
+            order = Order.objects.create(user=self.user, phone='9395679312',
+                                         address='address')
+            Detail.objects.bulk_create([
+                Detail(order=order, user=self.user)
+                for _ in range(count)
+            ])
+
+            res = self.assertMaxQueries(MAX_RETRIEVE_QUERIES,
+                                        self.client.get,
+                                        detail_url(order.id))
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(res.data['detail']), count)
+
+    def test_create_query_count_is_constant(self):
+        """Test creating orders with 1, 10 and 500 items costs the same"""
+        for count in (1, 10, 500):
+            payload = {
+                'items': [{'flavour': 1, 'size': 2, 'quantity': 1}] * count,
+                'name': 'pizza',
+                'phone': '9396579302',
+                'address': 'address'
+            }
+
+            res = self.assertMaxQueries(
+                MAX_CREATE_QUERIES + insert_batches(Detail, count) - 1,
+                self.client.post, ORDER_URL, payload, format='json'
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(res.data['detail']), count)
@@ -0,0 +1,415 @@
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import constants
+from core.models import Detail, Order, SalesRollup
+from order.exceptions import StatusConflict
+from order.pubsub import LocalBroker, PostgresBroker, get_broker
+from order.serializers import OrderStatusUpdateSerializer
+
+
+BULK_STATUS_URL = reverse('order:bulk-update-order-status')
+# Locking the orders, reading their line items, one UPDATE per new
+# status and upserting the rollups of one flavour and size
+MAX_BULK_QUERIES = 8
+
+
+def status_url(order_id):
+    """Return order status URL"""
+    return reverse('order:retrieve-update-order-status', args=[order_id])
+
+
+def subscribe_url(order_id):
+    """Return order status subscription URL"""
+    return reverse('order:subscribe-order-status', args=[order_id])
+
+
+def detail_url(order_id):
+    """Return order detail URL"""
+    return reverse('order:order-detail', args=[order_id])
+
+
+def sample_order(user, **params):
+    """Create and return a sample order"""
+    defaults = {
+        'name': 'pizza',
+        'phone': '9395679312',
+        'address': 'address',
+    }
+    defaults.update(params)
+
+    return Order.objects.create(user=user, **defaults)
+
+
+class OrderStatusApiTests(TestCase):
+    """Test the order status endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_retrieve_status(self):
+        """Test retrieving the display name of an order status"""
+        order = sample_order(self.user, status=constants.IN_PROCESS)
+
+        res = self.client.get(status_url(order.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'id': order.id, 'status': 'In Process',
+                                    'version': 0})
+
+    def test_allowed_transition(self):
+        """Test moving an order to a following status"""
+        order = sample_order(self.user)
+
+        res = self.client.put(status_url(order.id),
+                              {'status': constants.IN_PROCESS})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        order.refresh_from_db()
+        self.assertEqual(order.status, constants.IN_PROCESS)
+
+    def test_disallowed_transition(self):
+        """Test skipping or reversing statuses is rejected"""
+        order = sample_order(self.user, status=constants.DELIVERED)
+
+        res = self.client.put(status_url(order.id),
+                              {'status': constants.RECEIVED})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        self.assertEqual(order.status, constants.DELIVERED)
+
+    def test_lost_race_conflicts(self):
+        """Test a transition from a status that just changed conflicts"""
+        order = sample_order(self.user, status=constants.OUT_FOR_DELIVERY)
+        serializer = OrderStatusUpdateSerializer(
+            order, data={'status': constants.DELIVERED}
+        )
+        self.assertTrue(serializer.is_valid())
+        Order.objects.filter(pk=order.pk).update(status=constants.RETURNED)
+
+        with self.assertRaises(StatusConflict):
+            serializer.save()
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, constants.RETURNED)
+
+    def test_transition_bumps_version(self):
+        """Test every status change increments the status version"""
+        order = sample_order(self.user)
+
+        self.client.put(status_url(order.id),
+                        {'status': constants.IN_PROCESS})
+        self.client.patch(detail_url(order.id),
+                          {'status': constants.OUT_FOR_DELIVERY})
+        self.client.patch(detail_url(order.id), {'name': 'pasta'})
+
+        order.refresh_from_db()
+        self.assertEqual(order.status_version, 2)
+
+    def test_subscribe_newer_version_returns_now(self):
+        """Test subscribing with an old version answers immediately"""
+        order = sample_order(self.user, status_version=3)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(subscribe_url(order.id),
+                                  {'since_version': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['version'], 3)
+
+    def test_subscribe_times_out_unchanged(self):
+        """Test subscribing answers 304 when nothing changes"""
+        order = sample_order(self.user)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(subscribe_url(order.id),
+                                  {'since_version': 0, 'timeout': 0.05})
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_subscribe_invalid_params(self):
+        """Test malformed subscription parameters are rejected"""
+        order = sample_order(self.user)
+
+        for params in ({'since_version': 'latest'}, {'timeout': 'soon'},
+                       {'timeout': 'nan'}, {'timeout': 'inf'},
+                       {'timeout': '-inf'}):
+            res = self.client.get(subscribe_url(order.id), params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_subscribe_negative_timeout(self):
+        """Test a negative timeout answers without waiting"""
+        order = sample_order(self.user)
+
+        res = self.client.get(subscribe_url(order.id),
+                              {'since_version': 0, 'timeout': -5})
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_edit_follows_transitions(self):
+        """Test editing an order cannot jump over statuses"""
+        order = sample_order(self.user)
+
+        res = self.client.patch(detail_url(order.id),
+                                {'status': constants.DELIVERED})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', res.data)
+
+    def test_create_must_be_received(self):
+        """Test new orders cannot start in a later status"""
+        payload = {
+            'name': 'pizza',
+            'phone': '9396579202',
+            'address': 'address',
+            'status': constants.DELIVERED,
+        }
+
+        res = self.client.post(reverse('order:order-list'), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkOrderStatusApiTests(TestCase):
+    """Test moving many orders at once"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def sample_orders(self, count, **params):
+        orders = [sample_order(self.user, **params) for _ in range(count)]
+        for order in orders:
+            Detail.objects.create(order=order, user=self.user, flavour=1,
+                                  size=2, quantity=2)
+        return orders
+
+    def rollups(self):
+        return sorted(SalesRollup.objects.filter(pizzas__gt=0).values_list(
+            'flavour', 'size', 'status', 'pizzas'
+        ))
+
+    def test_bulk_transitions(self):
+        """Test each order gets its own result, in the order given"""
+        received = self.sample_orders(2)
+        out = sample_order(self.user, status=constants.OUT_FOR_DELIVERY)
+        delivered = sample_order(self.user, status=constants.DELIVERED)
+
+        res = self.client.post(BULK_STATUS_URL, {'orders': [
+            {'id': received[1].id, 'status': constants.IN_PROCESS},
+            {'id': delivered.id, 'status': constants.RETURNED},
+            {'id': out.id, 'status': constants.RETURNED},
+            {'id': 0, 'status': constants.IN_PROCESS},
+            {'id': received[0].id, 'status': constants.IN_PROCESS},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual([result['id'] for result in results],
+                         [received[1].id, delivered.id, out.id, 0,
+                          received[0].id])
+        self.assertEqual(results[0], {'id': received[1].id,
+                                      'status': constants.IN_PROCESS,
+                                      'version': 1})
+        self.assertEqual(results[1]['code'], 'invalid')
+        self.assertEqual(results[3]['code'], 'not_found')
+        self.assertEqual(
+            dict(Order.objects.values_list('id', 'status')),
+            {received[0].id: constants.IN_PROCESS,
+             received[1].id: constants.IN_PROCESS,
+             out.id: constants.RETURNED,
+             delivered.id: constants.DELIVERED}
+        )
+
+    def test_bulk_transitions_move_sales(self):
+        """Test the rollups follow the moved orders"""
+        self.sample_orders(3)
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        self.client.post(BULK_STATUS_URL, {'orders': [
+            {'id': order_id, 'status': constants.IN_PROCESS}
+            for order_id in Order.objects.values_list('id', flat=True)[:2]
+        ]}, format='json')
+
+        self.assertEqual(self.rollups(), [
+            (1, 2, constants.RECEIVED, 2),
+            (1, 2, constants.IN_PROCESS, 4),
+        ])
+        rollups = self.rollups()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.rollups(), rollups)
+
+    def test_bulk_query_count_does_not_grow(self):
+        """Test moving many orders takes the same queries as a few"""
+        for count in (2, 30):
+            orders = self.sample_orders(count)
+            payload = {'orders': [
+                {'id': order.id, 'status': constants.IN_PROCESS}
+                for order in orders
+            ]}
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(BULK_STATUS_URL, payload,
+                                       format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(ctx.captured_queries), MAX_BULK_QUERIES)
+
+    def test_bulk_publishes_status_changes(self):
+        """Test subscribers are woken for each moved order"""
+        order = sample_order(self.user)
+        with get_broker().subscribe(order.id) as subscription:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(BULK_STATUS_URL, {'orders': [
+                    {'id': order.id, 'status': constants.IN_PROCESS},
+                ]}, format='json')
+
+            self.assertTrue(subscription.wait(0, 0))
+
+    def test_bulk_rejects_invalid_payload(self):
+        """Test duplicate, unknown statuses and empty batches fail"""
+        order = sample_order(self.user)
+
+        for orders in ([], [{'id': order.id, 'status': 9}],
+                       [{'id': order.id, 'status': constants.IN_PROCESS}] * 2):
+            res = self.client.post(BULK_STATUS_URL, {'orders': orders},
+                                   format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        self.assertEqual(order.status, constants.RECEIVED)
+
+
+class LocalBrokerTests(TestCase):
+    """Test the in-process status pub/sub"""
+
+    def test_publish_wakes_subscriber(self):
+        """Test a version published while subscribed is seen"""
+        broker = LocalBroker()
+        with broker.subscribe(1) as subscription:
+            broker.publish(1, 4)
+            broker.publish(2, 9)
+
+            self.assertTrue(subscription.wait(3, 0))
+            self.assertFalse(subscription.wait(4, 0))
+
+    def test_unsubscribed_orders_not_tracked(self):
+        """Test orders nobody waits for are not kept in memory"""
+        broker = LocalBroker()
+        with broker.subscribe(1):
+            pass
+        broker.publish(2, 1)
+
+        self.assertEqual(broker._subscriptions, {})
+
+    def test_default_broker(self):
+        """Test Postgres shares status changes between processes"""
+        for vendor, broker_class in (('sqlite', LocalBroker),
+                                     ('postgresql', PostgresBroker)):
+            with patch.object(connection, 'vendor', vendor), \
+                    override_settings(ORDER_STATUS_BROKER=None):
+                self.assertIs(type(get_broker()), broker_class)
+
+    @override_settings(ORDER_STATUS_BROKER='order.pubsub.LocalBroker')
+    def test_configured_broker(self):
+        """Test the configured broker is used on any database"""
+        with patch.object(connection, 'vendor', 'postgresql'):
+            self.assertIs(type(get_broker()), LocalBroker)
+
+
+class ConcurrentOrderStatusTests(TransactionTestCase):
+    """Test concurrent status updates of one order"""
+
+    def test_concurrent_transitions_apply_once(self):
+        """Test only one of many concurrent identical transitions wins"""
+        user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        order = sample_order(user)
+        threads_count = 8
+        barrier = threading.Barrier(threads_count)
+        results = []
+
+        def put_status():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                res = client.put(status_url(order.id),
+                                 {'status': constants.IN_PROCESS})
+                results.append(res.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=put_status)
+                   for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), threads_count)
+        self.assertEqual(results.count(status.HTTP_200_OK), 1)
+        self.assertTrue(all(
+            code in (status.HTTP_200_OK, status.HTTP_409_CONFLICT,
+                     status.HTTP_400_BAD_REQUEST)
+            for code in results
+        ))
+        order.refresh_from_db()
+        self.assertEqual(order.status, constants.IN_PROCESS)
+
+    def test_subscriber_woken_by_status_change(self):
+        """Test a waiting subscriber receives the new status"""
+        user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        order = sample_order(user)
+        responses = []
+
+        def subscribe():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                responses.append(client.get(subscribe_url(order.id), {
+                    'since_version': 0, 'timeout': 10
+                }))
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=subscribe)
+        thread.start()
+        client = APIClient()
+        client.force_authenticate(user)
+        for _ in range(500):
+            if order.id in get_broker()._subscriptions:
+                break
+            thread.join(0.01)
+        client.put(status_url(order.id), {'status': constants.IN_PROCESS})
+        thread.join(10)
+
+        self.assertEqual(responses[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(responses[0].data['status'], 'In Process')
+        self.assertEqual(responses[0].data['version'], 1)
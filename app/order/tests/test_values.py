@@ -0,0 +1,103 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from core import constants
+from core.models import Detail, Order
+from order.views import DetailViewSet, OrderViewSet
+
+ORDER_URL = reverse('order:order-list')
+DETAIL_URL = reverse('order:detail-list')
+
+
+class ValuesListTests(TestCase):
+    """Test the values() lists answer like the serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mahsa.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        for index in range(5):
+            order = Order.objects.create(
+                user=self.user, name='pizza {}'.format(index),
+                phone='9395679312', address='address',
+                status=constants.ORDER_STATUS[index][0],
+                total=Decimal('12.5') * index
+            )
+            for flavour in range(1, index % 3 + 2):
+                Detail.objects.create(order=order, user=self.user,
+                                      flavour=flavour, size=2, quantity=3)
+            Order.objects.filter(id=order.id).update(
+                created_at=timezone.now() - timedelta(days=index,
+                                                      microseconds=index)
+            )
+        Detail.objects.create(user=self.user, flavour=3, size=1, quantity=1)
+
+    def assertSameAsSerializer(self, view, url, params=None):
+        """Assert a list is byte-identical without the values reader"""
+        res = self.client.get(url, params)
+        with patch.object(view, 'values_reader', None):
+            expected = self.client.get(url, params)
+
+        self.assertEqual(res.status_code, expected.status_code)
+        self.assertEqual(res.content, expected.content)
+        return res
+
+    def test_order_list(self):
+        """Test orders list the same, line items and totals included"""
+        res = self.assertSameAsSerializer(OrderViewSet, ORDER_URL)
+
+        orders = res.data['results']
+        self.assertEqual(len(orders), 5)
+        self.assertEqual(orders[0]['total'], '50.00')
+        self.assertEqual(len(orders[0]['detail']), 2)
+
+    def test_order_list_filtered_and_paged(self):
+        """Test filters, ordering and cursors are kept"""
+        self.assertSameAsSerializer(OrderViewSet, ORDER_URL, {
+            'status': '1,2,3', 'ordering': 'created_at', 'page_size': 2
+        })
+        cursor = self.client.get(ORDER_URL, {'page_size': 2}).data['next']
+
+        self.assertSameAsSerializer(OrderViewSet, cursor)
+
+    def test_history_list(self):
+        """Test archived orders list the same"""
+        call_command('archive_orders', older_than=1, stdout=StringIO())
+
+        res = self.assertSameAsSerializer(OrderViewSet, ORDER_URL,
+                                          {'history': 'true'})
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_detail_list(self):
+        """Test line items list the same"""
+        self.assertSameAsSerializer(DetailViewSet, DETAIL_URL)
+        self.assertSameAsSerializer(DetailViewSet, DETAIL_URL,
+                                    {'assigned_only': 1})
+
+    def test_bench_serializers(self):
+        """Test the benchmark reports both lists as identical"""
+        out = StringIO()
+        call_command('bench_serializers', page_size=20, repeat=1,
+                     stdout=out)
+
+        results = json.loads(out.getvalue())['results']
+        self.assertEqual(set(results), {'order', 'detail'})
+        for result in results.values():
+            self.assertEqual(result['rows'], 20)
+            self.assertTrue(result['identical'])
+        self.assertEqual(Order.objects.count(), 5)
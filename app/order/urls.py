@@ -10,14 +10,30 @@ router.register('order', views.OrderViewSet)
 app_name = 'order'
 
 urlpatterns = [
+    # Ahead of the router, for the async version of the list
+    path('order/', views.order_list, name='order-list'),
+    path(
+        'order/status',
+        views.BulkOrderStatusUpdateView.as_view(),
+        name='bulk-update-order-status'
+    ),
     path('', include(router.urls)),
     path(
         'order/<int:pk>/status',
+        views.order_status,
+        name='retrieve-update-order-status'
+    ),
+    path(
+        'order/<int:pk>/status/subscribe',
         views.OrderRetrieveUpdateStatusView.as_view({
-            'get': 'retrieve',
-            'put': 'update'
+            'get': 'subscribe'
         }),
-        name='retrieve-update-order-status'
+        name='subscribe-order-status'
+    ),
+    path(
+        'analytics/sales',
+        views.SalesAnalyticsView.as_view(),
+        name='sales-analytics'
     ),
 
     path(
@@ -1,23 +1,47 @@
 from rest_framework import serializers
 
+from core.constants import ORDER_EDITABLE_STATUSES, \
+    ORDER_STATUS_TRANSITIONS, RECEIVED
 from core.models import Order
 
 
-class UniqueUpdateStatusValidator(object):
-    instance = None
-    status_not_permited = [3, 4, 5]
+def validate_status_transition(order, status):
+    """
+    Raise a validation error unless `order` may move to `status`
+    according to `ORDER_STATUS_TRANSITIONS`.
+    """
+    if status in ORDER_STATUS_TRANSITIONS[order.status]:
+        return
+    raise serializers.ValidationError(
+        (
+            u'An order cannot go from `{current}` to `{status}`'
+        ).format(
+            current=order.get_status_display(),
+            status=Order(status=status).get_status_display()
+        )
+    )
+
 
-    def set_context(self, serializer):
-        # Determine the existing instance, if this is an update operation.
-        self.instance = getattr(serializer, 'instance', None)
+class UniqueUpdateStatusValidator(object):
+    requires_context = True
 
-    def __call__(self, attrs):
+    def __call__(self, attrs, serializer):
         """
         It should not be possible to update an order for
-        some statutes of delivery (e.g. delivered).
+        some statutes of delivery (e.g. delivered), or to change
+        its status other than along `ORDER_STATUS_TRANSITIONS`.
         """
-        order = self.instance or Order
-        if order.status in self.status_not_permited:
+        status = attrs.get('status')
+        # The existing instance, if this is an update operation.
+        order = getattr(serializer, 'instance', None)
+        if order is None:
+            if status not in (None, RECEIVED):
+                raise serializers.ValidationError({
+                    'status': u'New orders must be `Received`'
+                })
+            return
+
+        if order.status not in ORDER_EDITABLE_STATUSES:
             raise serializers.ValidationError({
                 'Sorry':
                     (
@@ -27,3 +51,8 @@ class UniqueUpdateStatusValidator(object):
                         status=order.get_status_display()
                     )
             })
+        if status is not None and status != order.status:
+            try:
+                validate_status_transition(order, status)
+            except serializers.ValidationError as exc:
+                raise serializers.ValidationError({'status': exc.detail})
@@ -1,17 +1,43 @@
-from rest_framework import viewsets, filters
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+import hashlib
+import math
 
-from core.models import Detail, Order
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Prefetch
+from django.http import Http404
+
+from rest_framework import generics, viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+
+from core.async_views import async_api_view, json_response, render_view
+from core.concurrency import run_sync
+from core.models import ArchivedOrder, Detail, Order, SalesRollup
+from core.pricing import reprice_order
+from core.rollups import bucket_for, track_sales
 from order.serializers import OrderStatusUpdateSerializer, \
     OrderStatusRetrieveSerializer, OrderSerializer, \
-    DetailSerializer, OrderDetailRetrieveSerializer
+    DetailSerializer, OrderDetailRetrieveSerializer, OrderCreateSerializer, \
+    SalesRollupSerializer, BulkOrderStatusUpdateSerializer
+from order.export import CSVRenderer, NDJSONRenderer, export_response
+from order.mixins import ConditionalGetMixin, IdempotentCreateMixin, \
+    QueryParamsMixin, ValuesListMixin, check_validators, set_validators
+from order.pagination import KeysetOrderingFilter, \
+    LatestBucketCursorPagination, NewestFirstCursorPagination
+from order.pubsub import get_broker
+from order.values import ValuesReader
+from user.authentication import CachedTokenAuthentication
 
 
-class BaseOrderAttrViewSet(viewsets.ModelViewSet):
+class BaseOrderAttrViewSet(IdempotentCreateMixin, ConditionalGetMixin,
+                           ValuesListMixin, viewsets.ModelViewSet):
     """Base ViewSet for user owned order attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = NewestFirstCursorPagination
+    throttle_scope = 'orders'
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
@@ -20,62 +46,273 @@ class BaseOrderAttrViewSet(viewsets.ModelViewSet):
         )
         queryset = self.queryset
         if assigned_only:
+            # A test of the order column, which cannot repeat rows
             queryset = queryset.filter(order__isnull=False)
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+        return queryset.filter(user=self.request.user).order_by('-id')
+
+    def get_update_fields(self):
+        """The timestamps whose last update changes the listing"""
+        return ('updated_at',)
+
+    def get_validators(self):
+        """
+        Identify a listing by its query string and the number and last
+        update of the objects it pages through
+        """
+        summary = self.get_queryset().aggregate(count=Count('id'), **{
+            field: Max(field) for field in self.get_update_fields()
+        })
+        count = summary.pop('count')
+        query = hashlib.md5(
+            self.request.META.get('QUERY_STRING', '').encode()
+        ).hexdigest()
+        last_update = max(filter(None, summary.values()), default=None)
+        etag = 'W/"{}-{}-{}"'.format(
+            count,
+            last_update.timestamp() if last_update else 0,
+            query
+        )
+        return etag, last_update
 
     def perform_create(self, serializer):
         """Create a new object"""
         serializer.save(user=self.request.user)
 
 
-class DetailViewSet(BaseOrderAttrViewSet):
-    """Manage pizza order in the database"""
+class DetailViewSet(QueryParamsMixin, BaseOrderAttrViewSet):
+    """
+    Manage pizza order in the database. Filter with comma separated
+    `flavour`, `size` and `status`, the status of the order a line
+    item belongs to.
+    """
     queryset = Detail.objects.all()
     serializer_class = DetailSerializer
+    values_reader = ValuesReader(DetailSerializer)
+    conditional_actions = ('list',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        for param in ('flavour', 'size'):
+            if params.get(param):
+                queryset = queryset.filter(**{
+                    param + '__in': self._params_to_ints(params[param],
+                                                         param)
+                })
+        if params.get('status'):
+            queryset = queryset.filter(Exists(Order.objects.filter(
+                pk=OuterRef('order_id'),
+                status__in=self._params_to_ints(params['status'], 'status')
+            )))
+        return queryset
+
+    def get_update_fields(self):
+        """
+        Listings filtered by order status change with the orders too,
+        whose last update moves with their status
+        """
+        if self.request.query_params.get('status'):
+            return ('updated_at', 'order__updated_at')
+        return super().get_update_fields()
 
+    def perform_update(self, serializer):
+        """Update the detail and reprice the order it belongs to"""
+        order_id = serializer.instance.order_id
+        if not order_id:
+            serializer.save()
+            return
+        with transaction.atomic(), track_sales([order_id]):
+            serializer.save()
+            reprice_order(order_id)
 
-class OrderViewSet(viewsets.ModelViewSet):
-    """Manage orders in the database"""
+    def perform_destroy(self, instance):
+        """Delete the detail and reprice the order it belonged to"""
+        order_id = instance.order_id
+        if not order_id:
+            instance.delete()
+            return
+        with transaction.atomic(), track_sales([order_id]):
+            instance.delete()
+            reprice_order(order_id)
+
+
+class OrderViewSet(IdempotentCreateMixin, QueryParamsMixin,
+                   ConditionalGetMixin, ValuesListMixin,
+                   viewsets.ModelViewSet):
+    """
+    Manage orders in the database. Listing and exporting read the live
+    orders, or the archived ones with `?history=true`. Retrieving an
+    order falls back to the archive, which cannot be changed. Creations
+    may be retried with an `Idempotency-Key` header.
+    """
     serializer_class = OrderSerializer
+    values_reader = ValuesReader(OrderSerializer)
     queryset = Order.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
-    filter_backends = [filters.OrderingFilter]
+    filter_backends = [KeysetOrderingFilter]
+    # Pages are cursors over these, so only unique or nearly unique ones
+    ordering_fields = ('id', 'created_at')
+    ordering = ('-id',)
+    pagination_class = NewestFirstCursorPagination
+    throttle_scope = 'orders'
+    conditional_actions = ('retrieve',)
+    history_actions = ('list', 'retrieve', 'export')
+    archived = False
+
+    def _reads_archive(self):
+        """Whether the request reads the archived orders"""
+        return self.archived or (
+            self.action in self.history_actions and
+            self.request.query_params.get('history', '').lower()
+            in ('1', 'true')
+        )
+
+    def _orders(self):
+        if self._reads_archive():
+            return ArchivedOrder.objects.all()
+        return self.queryset
 
-    def _params_to_ints(self, qs):
-        """Convert a list of string IDs to a list of integers"""
-        return [int(str_id) for str_id in qs.split(',')]
+    def _filter_orders(self, queryset):
+        """
+        Apply the filters given in the query parameters. Orders are
+        kept when one of their line items matches all of `detail`,
+        `flavour` and `size`, tested with EXISTS so that an order is
+        listed once however many of its line items match.
+        """
+        params = self.request.query_params
+        statuses = params.get('status')
+        since = params.get('since')
+        until = params.get('until')
+        line_items = {}
+        for param, lookup in (('detail', 'id__in'), ('flavour', 'flavour__in'),
+                              ('size', 'size__in')):
+            if params.get(param):
+                line_items[lookup] = self._params_to_ints(params[param],
+                                                          param)
+        if line_items:
+            details = queryset.model._meta.get_field('detail').related_model
+            queryset = queryset.filter(Exists(details.objects.filter(
+                order=OuterRef('pk'), **line_items
+            )))
+        if statuses:
+            queryset = queryset.filter(
+                status__in=self._params_to_ints(statuses, 'status')
+            )
+        if since:
+            queryset = queryset.filter(
+                created_at__gte=self._param_to_datetime(since, 'since')
+            )
+        if until:
+            queryset = queryset.filter(
+                created_at__lt=self._param_to_datetime(until, 'until')
+            )
+        return queryset
 
     def get_queryset(self):
         """Retrieve the orders for the authenticated user"""
-        detail = self.request.query_params.get('detail')
-        queryset = self.queryset
-        if detail:
-            detail_ids = self._params_to_ints(detail)
-            queryset = queryset.filter(detail__id__in=detail_ids)
-        return queryset.filter(user=self.request.user)
+        orders = self._orders()
+        details = orders.model._meta.get_field('detail').related_model
+        return self._filter_orders(orders).filter(
+            user=self.request.user
+        ).prefetch_related(
+            Prefetch('detail', queryset=details.objects.order_by('id'))
+        )
+
+    def get_object(self):
+        """Look for an order missing from the live ones in the archive"""
+        try:
+            return super().get_object()
+        except Http404:
+            if self.action != 'retrieve' or self._reads_archive():
+                raise
+        self.archived = True
+        return super().get_object()
+
+    def get_validators(self):
+        """
+        Identify an order by its last update and the number and last
+        update of its line items
+        """
+        models = (ArchivedOrder,) if self._reads_archive() \
+            else (Order, ArchivedOrder)
+        for model in models:
+            summary = model.objects.filter(
+                pk=self.kwargs['pk'], user=self.request.user
+            ).values('updated_at').annotate(
+                items=Count('detail'),
+                items_update=Max('detail__updated_at')
+            ).values_list('updated_at', 'items', 'items_update')
+            if summary:
+                break
+        else:
+            return None
+        updated_at, items, items_update = summary[0]
+        last_update = max(updated_at, items_update or updated_at)
+        etag = 'W/"order-{}-{}-{}"'.format(
+            updated_at.timestamp(),
+            items,
+            items_update.timestamp() if items_update else 0
+        )
+        return etag, last_update
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
         if self.action == 'retrieve':
             return OrderDetailRetrieveSerializer
+        elif self.action == 'create':
+            return OrderCreateSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         """Create a new order"""
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        """Delete the order and take its pizzas out of the rollups"""
+        with transaction.atomic(), track_sales([instance.pk]):
+            instance.delete()
 
-class OrderRetrieveUpdateStatusView(viewsets.ModelViewSet):
+    @action(detail=False, renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        Stream the filtered orders with their line items as NDJSON or,
+        with `?format=csv`, as CSV. Staff users export every order.
+        Under ASGI the stream is async, which servers send as it is read.
+        """
+        queryset = self._filter_orders(self._orders())
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        return export_response(
+            queryset, request.accepted_renderer.format,
+            asynchronous=isinstance(request._request, ASGIRequest)
+        )
+
+
+class OrderRetrieveUpdateStatusView(ConditionalGetMixin,
+                                    viewsets.ModelViewSet):
     """
     View to get or update a specific order detail.
     """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     queryset = Order.objects.all()
+    throttle_scope = 'order_status'
+
+    conditional_actions = ('retrieve',)
+    subscribe_timeout = 25
+    max_subscribe_timeout = 60
+
+    def get_validators(self):
+        """Identify an order status by its version"""
+        summary = Order.objects.filter(pk=self.kwargs['pk']).values_list(
+            'status_version', 'updated_at'
+        ).first()
+        if summary is None:
+            return None
+        version, updated_at = summary
+        return status_etag(version), updated_at
 
     def get_serializer_class(self):
         method = self.request.method
@@ -83,3 +320,123 @@ class OrderRetrieveUpdateStatusView(viewsets.ModelViewSet):
         if method == 'PUT':
             serializer_class = OrderStatusUpdateSerializer
         return serializer_class
+
+    def subscribe(self, request, *args, **kwargs):
+        """
+        Long-poll the status of an order. Answer right away when its
+        version is newer than `since_version`, otherwise wait for a
+        status change for up to `timeout` seconds without touching the
+        database, answering 304 if nothing changed.
+        """
+        try:
+            since_version = int(request.query_params.get('since_version',
+                                                         -1))
+            timeout = float(request.query_params.get('timeout',
+                                                     self.subscribe_timeout))
+        except ValueError:
+            timeout = None
+        # A NaN timeout would never expire and hold the worker forever
+        if timeout is None or not math.isfinite(timeout):
+            raise ValidationError(
+                'since_version and timeout must be numbers.'
+            )
+        timeout = min(max(timeout, 0), self.max_subscribe_timeout)
+
+        with get_broker().subscribe(int(kwargs['pk'])) as subscription:
+            order = self.get_object()
+            if order.status_version <= since_version:
+                if not subscription.wait(since_version, timeout):
+                    return Response(status=status.HTTP_304_NOT_MODIFIED)
+                order = self.get_object()
+
+        return Response(self.get_serializer(order).data)
+
+
+class BulkOrderStatusUpdateView(generics.GenericAPIView):
+    """
+    Move many orders to new statuses in one request, for the kitchen
+    and dispatch consoles. Takes `{"orders": [{"id": ..., "status":
+    ...}, ...]}` and answers with a result per order: its new status
+    and version, or why it was not moved.
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    serializer_class = BulkOrderStatusUpdateSerializer
+    throttle_scope = 'order_status'
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'results': serializer.save()})
+
+
+def status_etag(version):
+    return 'W/"status-{}"'.format(version)
+
+
+order_list = OrderViewSet.as_view({'get': 'list', 'post': 'create'})
+order_status = OrderRetrieveUpdateStatusView.as_view({
+    'get': 'retrieve',
+    'put': 'update'
+})
+
+
+@async_api_view(order_list, throttle=False)
+async def async_order_list(request):
+    """
+    List the orders of the user. Authentication is answered on the
+    event loop; the cursor paginated query runs in the bounded pool.
+    """
+    return await run_sync(render_view, order_list, request)
+
+
+@async_api_view(order_status)
+async def async_order_status(request, pk):
+    """Retrieve the status of an order with an async query"""
+    order = await Order.objects.filter(pk=pk).afirst()
+    if order is None:
+        raise Http404('No Order matches the given query.')
+    etag, timestamp, response = check_validators(
+        request, status_etag(order.status_version), order.updated_at
+    )
+    if response is None:
+        response = json_response(OrderStatusRetrieveSerializer(order).data)
+    set_validators(response, etag, timestamp)
+    return response
+
+
+class SalesAnalyticsView(QueryParamsMixin, generics.ListAPIView):
+    """
+    Pizzas sold per hour, flavour, size and status, read from the
+    rollups so each hour costs the same however many orders it holds.
+    Filter with `since`, `until` and comma separated `flavour`, `size`
+    and `status`.
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+    serializer_class = SalesRollupSerializer
+    pagination_class = LatestBucketCursorPagination
+    queryset = SalesRollup.objects.filter(pizzas__gt=0)
+    throttle_scope = 'orders'
+
+    def get_queryset(self):
+        queryset = self.queryset
+        params = self.request.query_params
+        since = params.get('since')
+        until = params.get('until')
+        if since:
+            queryset = queryset.filter(
+                bucket__gte=bucket_for(self._param_to_datetime(since,
+                                                               'since'))
+            )
+        if until:
+            queryset = queryset.filter(
+                bucket__lt=self._param_to_datetime(until, 'until')
+            )
+        for param in ('flavour', 'size', 'status'):
+            if params.get(param):
+                queryset = queryset.filter(**{
+                    param + '__in': self._params_to_ints(params[param],
+                                                         param)
+                })
+        return queryset
@@ -0,0 +1,165 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+DEFAULTS = {
+    'CACHE_ALIAS': None,
+    'TTL': 60,
+    'MAX_SIZE': 10000,
+}
+
+
+class LocalTokenCache(object):
+    """Bounded in-process LRU of token key -> token with a TTL"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Callers may mutate the user, never hand out the cached instance
+        return copy.deepcopy(token)
+
+    def set(self, key, token):
+        entry = (copy.deepcopy(token), time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, token):
+        self.set(key, token)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedTokenCache(object):
+    """Token cache stored in a Django cache shared between workers"""
+    prefix = 'auth-token:'
+
+    def __init__(self, alias, ttl):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.cache.get(self.prefix + key)
+
+    def set(self, key, token):
+        self.cache.set(self.prefix + key, token, self.ttl)
+
+    async def aget(self, key):
+        return await self.cache.aget(self.prefix + key)
+
+    async def aset(self, key, token):
+        await self.cache.aset(self.prefix + key, token, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(self.prefix + key)
+
+    def clear(self):
+        """Forget every cached token, and nothing else of the cache"""
+        from rest_framework.authtoken.models import Token
+
+        # Deleted tokens are evicted as they go, see user.signals
+        keys = Token.objects.values_list('key', flat=True)
+        self.cache.delete_many([self.prefix + key for key in keys.iterator()])
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """Return the token cache configured by `TOKEN_AUTH_CACHE`"""
+    global _token_cache
+    if _token_cache is None:
+        options = dict(DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {}))
+        if options['CACHE_ALIAS']:
+            _token_cache = SharedTokenCache(options['CACHE_ALIAS'],
+                                            options['TTL'])
+        else:
+            _token_cache = LocalTokenCache(options['MAX_SIZE'],
+                                           options['TTL'])
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reload_token_cache(*args, **kwargs):
+    global _token_cache
+    if kwargs['setting'] == 'TOKEN_AUTH_CACHE':
+        _token_cache = None
+
+
+class TokenHeader(TokenAuthentication):
+    """Read the key of a token header, failing like TokenAuthentication"""
+
+    def authenticate_credentials(self, key):
+        return key
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that remembers recently seen tokens, so an
+    authenticated request does not need the token/user query.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        token = cache.get(key)
+        if token is None or not token.user.is_active:
+            user, token = super().authenticate_credentials(key)
+            cache.set(key, token)
+        return token.user, token
+
+    async def aauthenticate(self, request):
+        """
+        Authenticate a request of an async view. Cached tokens are read
+        without leaving the event loop, only a miss awaits the query.
+        """
+        key = TokenHeader().authenticate(request)
+        if key is None:
+            return None
+        cache = get_token_cache()
+        token = await cache.aget(key)
+        if token is None or not token.user.is_active:
+            model = self.get_model()
+            try:
+                token = await model.objects.select_related('user').aget(
+                    key=key
+                )
+            except model.DoesNotExist:
+                raise AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise AuthenticationFailed(_('User inactive or deleted.'))
+            await cache.aset(key, token)
+        return token.user, token
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import get_token_cache
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    """Forget a token as soon as it is deleted"""
+    get_token_cache().delete(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def evict_user_tokens(sender, instance, created, **kwargs):
+    """Forget cached tokens of a user that was changed or deactivated"""
+    if created:
+        return
+    cache = get_token_cache()
+    for key in Token.objects.filter(user=instance).values_list('key',
+                                                               flat=True):
+        cache.delete(key)
@@ -0,0 +1,144 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import LocalTokenCache, get_token_cache
+
+ME_URL = reverse('user:me')
+ORDER_URL = reverse('order:order-list')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the caching token authentication"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@mahsagolchian.com',
+            password='testpass',
+            name='name'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_cached_token_skips_query(self):
+        """Test a second request authenticates without touching the db"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is not authenticated"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token wrong')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidated(self):
+        """Test deleting a token evicts it from the cache"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ORDER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test deactivating a user evicts their token"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_invalidated(self):
+        """Test updating the profile is visible on the next request"""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'new name'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'new name')
+
+    def test_cached_user_is_not_shared(self):
+        """Test changes to an authenticated user do not leak into cache"""
+        self.client.get(ME_URL)
+
+        cached = get_token_cache().get(self.token.key)
+        cached.user.name = 'changed'
+
+        self.assertEqual(get_token_cache().get(self.token.key).user.name,
+                         'name')
+
+    @override_settings(TOKEN_AUTH_CACHE={'CACHE_ALIAS': 'default'})
+    def test_shared_cache_backend(self):
+        """Test the token cache can live in a Django cache"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE={'CACHE_ALIAS': 'default'})
+    def test_shared_cache_clear(self):
+        """Test clearing the shared cache only forgets tokens"""
+        self.client.get(ME_URL)
+        cache = caches['default']
+        cache.set('unrelated', 'kept')
+
+        get_token_cache().clear()
+
+        self.assertIsNone(get_token_cache().get(self.token.key))
+        self.assertEqual(cache.get('unrelated'), 'kept')
+
+
+class LocalTokenCacheTests(TestCase):
+    """Test the in-process token LRU"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@mahsagolchian.com',
+            password='testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def test_entries_expire(self):
+        """Test entries are dropped once their TTL has passed"""
+        cache = LocalTokenCache(max_size=10, ttl=60)
+        with patch('user.authentication.time.monotonic', return_value=0):
+            cache.set('a', self.token)
+        with patch('user.authentication.time.monotonic', return_value=59):
+            self.assertIsNotNone(cache.get('a'))
+        with patch('user.authentication.time.monotonic', return_value=60):
+            self.assertIsNone(cache.get('a'))
+
+    def test_least_recently_used_evicted(self):
+        """Test the cache never holds more than max_size entries"""
+        cache = LocalTokenCache(max_size=2, ttl=60)
+        cache.set('a', self.token)
+        cache.set('b', self.token)
+        cache.get('a')
+        cache.set('c', self.token)
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))